@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.utils.crawl_reaper import reconciliar_crawlings
+
+
+class Command(BaseCommand):
+    help = "Cierra crawlings colgados y sincroniza CrawlingProgress con BusquedaDominio"
+
+    def handle(self, *args, **options):
+        resumen = reconciliar_crawlings()
+        for nombre, total in resumen.items():
+            self.stdout.write(f"{nombre}: {total}")
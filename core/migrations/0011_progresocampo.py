@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_analisisurlindividual_alcance_analisis"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProgresoCampo",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("progress_key", models.CharField(db_index=True, max_length=255)),
+                ("campo", models.CharField(max_length=255)),
+                ("valor", models.JSONField(blank=True, null=True)),
+            ],
+            options={
+                "unique_together": {("progress_key", "campo")},
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_progresocampo"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="busquedadominio",
+            name="url_count",
+            field=models.PositiveIntegerField(
+                db_index=True, default=0, help_text="Número de URLs encontradas"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="busquedadominio",
+            name="urls",
+            field=models.TextField(
+                blank=True, help_text="Obsoleto: las URLs se guardan en DiscoveredUrl"
+            ),
+        ),
+        migrations.CreateModel(
+            name="DiscoveredUrl",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("url", models.URLField(max_length=2000)),
+                (
+                    "status_code",
+                    models.PositiveSmallIntegerField(blank=True, null=True),
+                ),
+                ("depth", models.PositiveIntegerField(blank=True, null=True)),
+                ("content_type", models.CharField(blank=True, max_length=255)),
+                ("fetched_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "busqueda",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="urls_descubiertas",
+                        to="core.busquedadominio",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        fields=["busqueda", "status_code"],
+                        name="core_discov_busqued_034700_idx",
+                    )
+                ],
+            },
+        ),
+    ]
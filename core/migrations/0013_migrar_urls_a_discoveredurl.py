@@ -0,0 +1,56 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def migrar_urls(apps, schema_editor):
+    """Pasa las URLs de los campos de texto a filas DiscoveredUrl"""
+    BusquedaDominio = apps.get_model("core", "BusquedaDominio")
+    CrawlingProgress = apps.get_model("core", "CrawlingProgress")
+    DiscoveredUrl = apps.get_model("core", "DiscoveredUrl")
+
+    # Búsquedas sin URLs guardadas pero con progreso parcial (crawling detenido)
+    progresos = dict(
+        CrawlingProgress.objects.exclude(busqueda_id=None)
+        .exclude(urls_found="")
+        .values_list("busqueda_id", "urls_found")
+    )
+
+    for busqueda in BusquedaDominio.objects.only("id", "urls").iterator():
+        if busqueda.urls:
+            urls = busqueda.urls.split("\n")
+        elif progresos.get(busqueda.id):
+            urls = progresos[busqueda.id].split("|")
+        else:
+            continue
+        urls = list(dict.fromkeys(u.strip() for u in urls if u and u.strip()))
+        DiscoveredUrl.objects.bulk_create(
+            [DiscoveredUrl(busqueda_id=busqueda.id, url=url) for url in urls],
+            batch_size=BATCH_SIZE,
+        )
+        BusquedaDominio.objects.filter(pk=busqueda.id).update(
+            urls="", url_count=len(urls)
+        )
+
+
+def restaurar_urls(apps, schema_editor):
+    """Reconstruye los campos de texto a partir de DiscoveredUrl"""
+    BusquedaDominio = apps.get_model("core", "BusquedaDominio")
+    DiscoveredUrl = apps.get_model("core", "DiscoveredUrl")
+
+    for busqueda_id in BusquedaDominio.objects.values_list("id", flat=True).iterator():
+        urls = DiscoveredUrl.objects.filter(busqueda_id=busqueda_id).order_by("id")
+        BusquedaDominio.objects.filter(pk=busqueda_id).update(
+            urls="\n".join(urls.values_list("url", flat=True))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_discoveredurl"),
+    ]
+
+    operations = [
+        migrations.RunPython(migrar_urls, restaurar_urls),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_migrar_urls_a_discoveredurl"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="crawlingprogress",
+            name="busqueda_id",
+            field=models.IntegerField(
+                blank=True,
+                db_index=True,
+                help_text="ID de BusquedaDominio relacionado",
+                null=True,
+            ),
+        ),
+    ]
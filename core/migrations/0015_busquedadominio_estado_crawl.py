@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_crawlingprogress_busqueda_id_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="busquedadominio",
+            name="blocked_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="busquedadominio",
+            name="crawl_status",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                help_text="Status de crawl_urls",
+                max_length=50,
+            ),
+        ),
+        migrations.AddField(
+            model_name="busquedadominio",
+            name="duracion_segundos",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="busquedadominio",
+            name="estado_clase",
+            field=models.CharField(blank=True, db_index=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name="busquedadominio",
+            name="estado_detalle",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+# Copia congelada de core.utils.crawl_status: la migración no debe cambiar
+# (ni romperse) cuando cambie la clasificación de la aplicación
+DOMINIOS_PROTEGIDOS = ["udemy.com", "netflix.com", "hulu.com", "disney.com"]
+
+
+def clasificar_por_heuristica(dominio, total_urls, total_seconds):
+    """Clasificación de búsquedas antiguas, sin status de crawl_urls"""
+    dominio = dominio.lower().removeprefix("www.")
+    if total_urls == 0 and total_seconds <= 2:
+        # Probablemente bloqueado (finaliza muy rápido con 0 URLs)
+        if dominio in DOMINIOS_PROTEGIDOS:
+            return "🛡️ Dominio completamente protegido", "danger"
+        return "⚠️ Posible bloqueo o error", "warning"
+    if total_urls == 0 and total_seconds > 15:
+        return "⏰ Timeout o problemas de conexión", "warning"
+    if total_urls == 0 and 3 <= total_seconds <= 15:
+        # Casos como jw.org: intenta crawling pero no encuentra sitemap
+        if "jw.org" in dominio:
+            return "🔒 Restricciones de acceso o geobloqueo", "warning"
+        if any(keyword in dominio for keyword in ["redlink", "hb."]):
+            return "🌐 Error de conexión o dominio inaccesible", "warning"
+        return "🔍 Sin sitemap encontrado", "info"
+    if total_urls > 0 and total_seconds <= 5:
+        return "✅ Éxito rápido (sitemap)", "success"
+    if total_urls > 0:
+        return "✅ Crawling exitoso", "success"
+    return "ℹ️ Finalizado", "info"
+
+
+def clasificar_finalizadas(apps, schema_editor):
+    """Calcula duración y estado de las búsquedas ya terminadas"""
+    BusquedaDominio = apps.get_model("core", "BusquedaDominio")
+
+    pendientes = BusquedaDominio.objects.filter(
+        fecha_fin__isnull=False, estado_clase=""
+    ).only("id", "dominio", "fecha", "fecha_fin", "url_count")
+    lote = []
+    for busqueda in pendientes.iterator(chunk_size=BATCH_SIZE):
+        busqueda.duracion_segundos = int(
+            (busqueda.fecha_fin - busqueda.fecha).total_seconds()
+        )
+        busqueda.estado_detalle, busqueda.estado_clase = clasificar_por_heuristica(
+            busqueda.dominio,
+            busqueda.url_count,
+            busqueda.duracion_segundos,
+        )
+        lote.append(busqueda)
+        if len(lote) >= BATCH_SIZE:
+            BusquedaDominio.objects.bulk_update(
+                lote, ["duracion_segundos", "estado_detalle", "estado_clase"]
+            )
+            lote = []
+    if lote:
+        BusquedaDominio.objects.bulk_update(
+            lote, ["duracion_segundos", "estado_detalle", "estado_clase"]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_busquedadominio_estado_crawl"),
+    ]
+
+    operations = [
+        migrations.RunPython(clasificar_finalizadas, migrations.RunPython.noop),
+    ]
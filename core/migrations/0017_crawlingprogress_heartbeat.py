@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:06
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def heartbeat_desde_updated_at(apps, schema_editor):
+    CrawlingProgress = apps.get_model("core", "CrawlingProgress")
+    CrawlingProgress.objects.update(heartbeat=models.F("updated_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0016_clasificar_busquedas_finalizadas"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="crawlingprogress",
+            name="heartbeat",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                help_text="Último latido del crawler; lo usa el reconciliador periódico",
+            ),
+        ),
+        migrations.RunPython(heartbeat_desde_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="crawlingprogress",
+            index=models.Index(
+                fields=["is_done", "heartbeat"], name="core_crawli_is_done_1eb3bb_idx"
+            ),
+        ),
+    ]
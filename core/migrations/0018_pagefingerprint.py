@@ -0,0 +1,66 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:13
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0017_crawlingprogress_heartbeat"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PageFingerprint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "url_hash",
+                    models.CharField(
+                        help_text="SHA-256 de la URL canónica",
+                        max_length=64,
+                        unique=True,
+                    ),
+                ),
+                ("url", models.URLField(max_length=2000)),
+                ("dominio", models.CharField(db_index=True, max_length=255)),
+                ("etag", models.CharField(blank=True, max_length=255)),
+                ("last_modified", models.CharField(blank=True, max_length=64)),
+                (
+                    "content_hash",
+                    models.CharField(
+                        blank=True,
+                        help_text="SHA-256 del cuerpo descargado",
+                        max_length=64,
+                    ),
+                ),
+                (
+                    "status_code",
+                    models.PositiveSmallIntegerField(blank=True, null=True),
+                ),
+                (
+                    "fetched_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        help_text="Última descarga completa",
+                    ),
+                ),
+                (
+                    "checked_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        help_text="Última comprobación (200 o 304)",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:16
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0018_pagefingerprint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SitemapEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "url_hash",
+                    models.CharField(
+                        help_text="SHA-256 de la URL canónica",
+                        max_length=64,
+                        unique=True,
+                    ),
+                ),
+                ("dominio", models.CharField(db_index=True, max_length=255)),
+                ("url", models.URLField(max_length=2000)),
+                ("lastmod", models.DateTimeField(blank=True, db_index=True, null=True)),
+                ("changefreq", models.CharField(blank=True, max_length=20)),
+                ("priority", models.FloatField(blank=True, null=True)),
+                (
+                    "sitemap_url",
+                    models.URLField(
+                        blank=True,
+                        help_text="Sitemap en el que apareció",
+                        max_length=2000,
+                    ),
+                ),
+                (
+                    "seen_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        help_text="Última vez que se vio en el sitemap",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:25
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0019_sitemapentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RobotsTxt",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("host", models.CharField(max_length=255, unique=True)),
+                (
+                    "reglas",
+                    models.JSONField(
+                        default=dict,
+                        help_text="Grupos por user-agent y líneas Sitemap:",
+                    ),
+                ),
+                (
+                    "status_code",
+                    models.PositiveSmallIntegerField(blank=True, null=True),
+                ),
+                ("fetched_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0020_robotstxt"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HostRate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("dominio", models.CharField(max_length=255, unique=True)),
+                (
+                    "tasa",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Peticiones por segundo (vacío: sin límite)",
+                        null=True,
+                    ),
+                ),
+                (
+                    "latencia",
+                    models.FloatField(
+                        blank=True, help_text="Latencia media en segundos", null=True
+                    ),
+                ),
+                (
+                    "bloqueado_hasta",
+                    models.DateTimeField(
+                        blank=True, help_text="Retry-After pendiente", null=True
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0021_hostrate"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProgresoElemento",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("progress_key", models.CharField(max_length=255)),
+                ("campo", models.CharField(max_length=255)),
+                ("posicion", models.PositiveIntegerField()),
+                ("valor", models.JSONField(blank=True, null=True)),
+            ],
+            options={
+                "unique_together": {("progress_key", "campo", "posicion")},
+            },
+        ),
+    ]
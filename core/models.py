@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 # Create your models here.
@@ -27,14 +28,33 @@ class CrawlingProgress(BaseModel):
         blank=True, help_text="URLs encontradas separadas por |"
     )
     busqueda_id = models.IntegerField(
-        null=True, blank=True, help_text="ID de BusquedaDominio relacionado"
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="ID de BusquedaDominio relacionado",
     )
     task_id = models.CharField(
         max_length=255, null=True, blank=True, help_text="ID de la tarea Celery"
     )
+    heartbeat = models.DateTimeField(
+        default=timezone.now,
+        help_text="Último latido del crawler; lo usa el reconciliador periódico",
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["is_done", "heartbeat"])]
 
-    def get_urls_list(self):
-        return self.urls_found.split("|") if self.urls_found else []
+    def get_urls_list(self, desde=0):
+        """URLs encontradas a partir de la posición ``desde``"""
+        if self.busqueda_id:
+            urls = list(
+                DiscoveredUrl.objects.filter(busqueda_id=self.busqueda_id).values_list(
+                    "url", flat=True
+                )[desde:]
+            )
+            if urls:
+                return urls
+        return self.urls_found.split("|")[desde:] if self.urls_found else []
 
     def add_url(self, url):
         urls = self.get_urls_list()
@@ -54,14 +74,77 @@ class BusquedaDominio(BaseModel):
         null=True, blank=True, help_text="Hora de finalización del crawling"
     )
     urls = models.TextField(
-        help_text="Lista de URLs encontradas, separadas por salto de línea"
+        blank=True,
+        help_text="Obsoleto: las URLs se guardan en DiscoveredUrl",
+    )
+    url_count = models.PositiveIntegerField(
+        default=0, db_index=True, help_text="Número de URLs encontradas"
     )
     guardado = models.BooleanField(
         default=False, help_text="Indica si el dominio ha sido marcado como guardado"
     )
+    # Resultado final del crawling, calculado una vez en finalizar()
+    crawl_status = models.CharField(
+        max_length=50, blank=True, db_index=True, help_text="Status de crawl_urls"
+    )
+    blocked_count = models.PositiveIntegerField(default=0)
+    duracion_segundos = models.IntegerField(null=True, blank=True)
+    estado_detalle = models.CharField(max_length=255, blank=True)
+    estado_clase = models.CharField(max_length=20, blank=True, db_index=True)
+
+    def finalizar(self, crawl_status="", blocked_count=0, fecha_fin=None):
+        """Marca la búsqueda como terminada y guarda su clasificación"""
+        from core.utils.crawl_status import clasificar_crawl
+
+        # url_count se incrementa con F() durante el crawling
+        self.refresh_from_db(fields=["url_count"])
+        self.fecha_fin = fecha_fin or timezone.now()
+        self.crawl_status = crawl_status
+        self.blocked_count = blocked_count
+        self.duracion_segundos = int((self.fecha_fin - self.fecha).total_seconds())
+        self.estado_detalle, self.estado_clase = clasificar_crawl(
+            self.dominio,
+            crawl_status,
+            self.url_count,
+            self.duracion_segundos,
+            blocked_count,
+        )
+        self.save(
+            update_fields=[
+                "fecha_fin",
+                "crawl_status",
+                "blocked_count",
+                "duracion_segundos",
+                "estado_detalle",
+                "estado_clase",
+            ]
+        )
 
-    def get_urls(self):
-        return self.urls.split("\n") if self.urls else []
+    def get_urls(self, desde=0):
+        """URLs encontradas a partir de la posición ``desde``"""
+        return list(self.urls_descubiertas.values_list("url", flat=True)[desde:])
+
+    def guardar_urls(self, urls, detalles=None):
+        """Reemplaza las URLs encontradas (inserción masiva) y su contador.
+
+        ``detalles`` es un dict opcional ``{url: {"status_code", "depth",
+        "content_type"}}``.
+        """
+        detalles = detalles or {}
+        urls = list(dict.fromkeys(u.strip() for u in urls if u and u.strip()))
+        self.urls_descubiertas.all().delete()
+        DiscoveredUrl.objects.bulk_create(
+            [
+                DiscoveredUrl(busqueda=self, url=url, **detalles.get(url, {}))
+                for url in urls
+            ],
+            batch_size=DiscoveredUrl.BATCH_SIZE,
+        )
+        self.urls = ""
+        self.url_count = len(urls)
+        BusquedaDominio.objects.filter(pk=self.pk).update(
+            urls="", url_count=self.url_count
+        )
 
     def __str__(self):
         return (
@@ -71,6 +154,113 @@ class BusquedaDominio(BaseModel):
         )
 
 
+class DiscoveredUrl(models.Model):
+    """URL encontrada durante el crawling de una búsqueda (una fila por URL)"""
+
+    BATCH_SIZE = 1000
+
+    busqueda = models.ForeignKey(
+        BusquedaDominio, on_delete=models.CASCADE, related_name="urls_descubiertas"
+    )
+    url = models.URLField(max_length=2000)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    depth = models.PositiveIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=255, blank=True)
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [models.Index(fields=["busqueda", "status_code"])]
+
+    def __str__(self):
+        return self.url
+
+
+class PageFingerprint(models.Model):
+    """Validadores HTTP y hash del contenido de una página ya crawleada.
+
+    Permite recrawlear un dominio con peticiones condicionales
+    (``If-None-Match`` / ``If-Modified-Since``) y detectar qué páginas
+    cambiaron desde la última visita.
+    """
+
+    url_hash = models.CharField(
+        max_length=64, unique=True, help_text="SHA-256 de la URL canónica"
+    )
+    url = models.URLField(max_length=2000)
+    dominio = models.CharField(max_length=255, db_index=True)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    content_hash = models.CharField(
+        max_length=64, blank=True, help_text="SHA-256 del cuerpo descargado"
+    )
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    fetched_at = models.DateTimeField(
+        default=timezone.now, help_text="Última descarga completa"
+    )
+    checked_at = models.DateTimeField(
+        default=timezone.now, help_text="Última comprobación (200 o 304)"
+    )
+
+    def __str__(self):
+        return self.url
+
+
+class SitemapEntry(models.Model):
+    """Entrada ``<url>`` del sitemap de un dominio (loc, lastmod, changefreq, priority)"""
+
+    url_hash = models.CharField(
+        max_length=64, unique=True, help_text="SHA-256 de la URL canónica"
+    )
+    dominio = models.CharField(max_length=255, db_index=True)
+    url = models.URLField(max_length=2000)
+    lastmod = models.DateTimeField(null=True, blank=True, db_index=True)
+    changefreq = models.CharField(max_length=20, blank=True)
+    priority = models.FloatField(null=True, blank=True)
+    sitemap_url = models.URLField(
+        max_length=2000, blank=True, help_text="Sitemap en el que apareció"
+    )
+    seen_at = models.DateTimeField(
+        default=timezone.now, help_text="Última vez que se vio en el sitemap"
+    )
+
+    def __str__(self):
+        return self.url
+
+
+class RobotsTxt(models.Model):
+    """Reglas de robots.txt ya parseadas de un host (ver core/utils/robots.py)"""
+
+    host = models.CharField(max_length=255, unique=True)
+    reglas = models.JSONField(
+        default=dict, help_text="Grupos por user-agent y líneas Sitemap:"
+    )
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.host
+
+
+class HostRate(models.Model):
+    """Tasa de peticiones aprendida por dominio (ver core/utils/rate_limiter.py)"""
+
+    dominio = models.CharField(max_length=255, unique=True)
+    tasa = models.FloatField(
+        null=True, blank=True, help_text="Peticiones por segundo (vacío: sin límite)"
+    )
+    latencia = models.FloatField(
+        null=True, blank=True, help_text="Latencia media en segundos"
+    )
+    bloqueado_hasta = models.DateTimeField(
+        null=True, blank=True, help_text="Retry-After pendiente"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.dominio
+
+
 class UrlGuardada(BaseModel):
     """Modelo para almacenar URLs individuales guardadas por el usuario"""
 
@@ -146,3 +336,36 @@ class AnalisisUrlIndividual(BaseModel):
             if self.usuario
             else f"{self.url} - {self.tipo_analisis} ({self.fecha:%Y-%m-%d %H:%M})"
         )
+
+
+class ProgresoCampo(BaseModel):
+    """Campo individual de un documento de progreso (backend "db" del store)"""
+
+    progress_key = models.CharField(max_length=255, db_index=True)
+    campo = models.CharField(max_length=255)
+    valor = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ["progress_key", "campo"]
+
+    def __str__(self):
+        return f"{self.progress_key}.{self.campo}"
+
+
+class ProgresoElemento(models.Model):
+    """Elemento de un campo lista del progreso (backend "db" del store).
+
+    Las listas se guardan fila a fila: ``extend`` solo inserta lo nuevo y
+    ``get(desde=n)`` filtra por ``posicion`` en SQL.
+    """
+
+    progress_key = models.CharField(max_length=255)
+    campo = models.CharField(max_length=255)
+    posicion = models.PositiveIntegerField()
+    valor = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ["progress_key", "campo", "posicion"]
+
+    def __str__(self):
+        return f"{self.progress_key}.{self.campo}[{self.posicion}]"
@@ -85,7 +85,7 @@ def get_blocked_domains_stats():
 
     for search in recent_searches:
         domain = search.dominio
-        url_count = len(search.get_urls())
+        url_count = search.url_count
 
         if domain not in domain_results:
             domain_results[domain] = {"searches": 0, "total_urls": 0}
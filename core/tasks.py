@@ -3,12 +3,12 @@ from celery import shared_task
 
 @shared_task(bind=True)
 def tarea_analisis_dominio(self, dominio):
-    from core.views.analisis_views import buscar_sitemap, procesar_sitemap
+    from core.utils.sitemap_resolver import leer_urls_sitemap, resolver_sitemap
     from django.utils import timezone
     from core.utils.task_progress import set_task_progress
 
     resultados = []
-    sitemap_url, sitemap_content = buscar_sitemap(dominio)
+    sitemap_url = resolver_sitemap(dominio)
     progreso = {
         "dominio": dominio,
         "status": "IN_PROGRESS",
@@ -18,11 +18,11 @@ def tarea_analisis_dominio(self, dominio):
         "timestamp": str(timezone.now()),
     }
     set_task_progress(self.request.id, progreso)
-    if sitemap_url and sitemap_content:
+    if sitemap_url:
         try:
-            urls = procesar_sitemap(sitemap_content, f"https://{dominio}", max_urls=100)
+            urls = leer_urls_sitemap(sitemap_url, dominio)
             if urls:
-                for url in urls:
+                for i, url in enumerate(urls, 1):
                     resultados.append(
                         {
                             "url": url,
@@ -30,10 +30,12 @@ def tarea_analisis_dominio(self, dominio):
                             "detalles": f"Encontrado en sitemap: {url}",
                         }
                     )
-                    # Actualizar progreso parcial
+                    # Actualizar progreso parcial (por lotes: el sitemap ya no
+                    # se corta en 100 URLs)
                     progreso["urls"].append(url)
                     progreso["total"] = len(progreso["urls"])
-                    set_task_progress(self.request.id, progreso)
+                    if i % 100 == 0:
+                        set_task_progress(self.request.id, progreso)
                 total_encontradas = len(urls)
                 progreso["status"] = "SUCCESS"
                 set_task_progress(self.request.id, progreso)
@@ -74,3 +76,117 @@ def tarea_analisis_dominio(self, dominio):
             "total_urls": 1,
             "timestamp": str(timezone.now()),
         }
+
+
+@shared_task(bind=True)
+def tarea_crawl_dominio(
+    self,
+    busqueda_id,
+    base_url,
+    limite_urls=None,
+    progress_key=None,
+    recrawl_de=None,
+    solo_lastmod=False,
+):
+    """Crawlea un dominio fuera del ciclo request/response.
+
+    Va publicando el progreso por lotes en ``CrawlingProgress``; si el registro
+    se marca como terminado (botón detener) el crawling se corta en el
+    siguiente volcado.
+
+    Con ``recrawl_de`` (id de una búsqueda anterior del dominio) recrawlea sus
+    URLs con peticiones condicionales y solo descarga las páginas cambiadas.
+    Con ``solo_lastmod`` solo visita las URLs del sitemap cuyo ``<lastmod>`` es
+    posterior a la última visita.
+    """
+    from core.models import BusquedaDominio, CrawlingProgress
+    from core.utils.crawl_status import STATUS_ERROR
+    from core.utils.progress_buffer import ProgresoIncremental
+    from core.utils.progress_store import get_progress_store
+    from core.views_app import crawl_urls, mensaje_resultado_crawl
+
+    busqueda = BusquedaDominio.objects.get(id=busqueda_id)
+    progreso = ProgresoIncremental(progress_key) if progress_key else None
+    if progreso:
+        # Renueva el latido: la tarea pudo esperar en la cola de Celery
+        progreso.iniciar()
+
+    def registrar_url(url, detalles):
+        # Vuelca el progreso por lotes; False detiene el crawling
+        return progreso.registrar(url, **detalles) if progreso else True
+
+    print(f"[CRAWL] Tarea {self.request.id}: iniciando crawling de {base_url}")
+    try:
+        semillas = []
+        if recrawl_de:
+            semillas = BusquedaDominio.objects.get(id=recrawl_de).get_urls()
+        resultado_crawl = crawl_urls(
+            base_url,
+            max_urls=limite_urls,
+            on_url=registrar_url,
+            solo_cambios=bool(recrawl_de),
+            semillas=semillas,
+            solo_lastmod=solo_lastmod,
+            latido=progreso.latido if progreso else None,
+        )
+    except Exception as e:
+        # Cerrar búsqueda y progreso: si no, seguirían abiertos hasta que el
+        # reconciliador los diera por abandonados
+        print(f"[CRAWL] ❌ Error en la tarea {self.request.id}: {e}")
+        if progreso:
+            progreso.flush(final=True)
+            get_progress_store().update(progress_key, error=str(e)[:200])
+        busqueda.finalizar(STATUS_ERROR)
+        raise
+    if isinstance(resultado_crawl, dict):
+        urls = resultado_crawl["urls"]
+        status = resultado_crawl["status"]
+        blocked_count = resultado_crawl.get("blocked_count", 0)
+    else:
+        urls, status, blocked_count = resultado_crawl, "legacy", 0
+
+    if progreso:
+        progreso.flush(final=True)
+    if not progreso or progreso.count != len(urls):
+        # URLs que no pasaron por on_url (fallback a sitemap): una sola inserción
+        busqueda.guardar_urls(urls)
+        if progreso:
+            CrawlingProgress.objects.filter(progress_key=progress_key).update(
+                count=len(urls)
+            )
+            # Solo se agregan las URLs que no pasaron por on_url: los clientes
+            # con cursor (since / Last-Event-ID) reciben únicamente las nuevas.
+            # Con búsqueda las lee leer_progreso de DiscoveredUrl
+            store = get_progress_store()
+            store.update(progress_key, count=len(urls))
+            if not progreso.busqueda_id:
+                store.extend(progress_key, "urls", urls[progreso.count :])
+    busqueda.finalizar(status, blocked_count)
+
+    mensaje, message_class = mensaje_resultado_crawl(busqueda.dominio, resultado_crawl)
+    return {
+        "busqueda_id": busqueda_id,
+        "dominio": busqueda.dominio,
+        "status": status,
+        "mensaje": mensaje,
+        "message_class": message_class,
+        "total_urls": len(urls),
+        "blocked_count": blocked_count,
+        "cambios": (
+            resultado_crawl.get("cambios")
+            if isinstance(resultado_crawl, dict)
+            else None
+        ),
+    }
+
+
+@shared_task
+def tarea_reconciliar_crawlings():
+    """Cierra crawlings colgados y sincroniza progresos con búsquedas.
+
+    Se programa con Celery beat (``CELERY_BEAT_SCHEDULE``) cada
+    ``CRAWL_REAPER_INTERVAL`` segundos.
+    """
+    from core.utils.crawl_reaper import reconciliar_crawlings
+
+    return reconciliar_crawlings()
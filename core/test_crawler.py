@@ -0,0 +1,1074 @@
+import asyncio
+import gzip
+import io
+import itertools
+import json
+import threading
+from datetime import timezone as dt_timezone
+from pathlib import Path
+from unittest import mock
+
+import httpx
+import requests
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from django.utils import timezone
+
+from core.models import (
+    BusquedaDominio,
+    CrawlingProgress,
+    PageFingerprint,
+    ProgresoCampo,
+    ProgresoElemento,
+    SitemapEntry,
+)
+from core.tasks import tarea_crawl_dominio
+from core.utils.async_crawler import crawl_urls_async
+from core.utils.block_detection import detect_blocking, puntuar_bloqueo
+from core.utils import http_client
+from core.utils.crawl_reaper import reconciliar_crawlings
+from core.utils.crawl_scheduler import CrawlRechazado, CrawlScheduler
+from core.utils.frontier import CrawlFrontier
+from core.utils.host_lease import TurnosMemoria, TurnosRedis
+from core.utils.link_extractor import BACKENDS, extraer_enlaces
+from core.utils.page_fingerprints import HuellasDominio
+from core.utils.progress_buffer import ProgresoIncremental, solicitar_detencion
+from core.utils.progress_store import (
+    DatabaseProgressStore,
+    MemoryProgressStore,
+    RedisProgressStore,
+    get_progress_store,
+    leer_progreso,
+)
+from core.utils.progress_stream import FlujoProgreso
+from core.utils.rate_limiter import (
+    LimitadorHost,
+    cargar_limitador,
+    guardar_limitador,
+    parse_retry_after,
+)
+from core.utils.robots import ReglasRobots, obtener_reglas
+from core.utils.sitemap_entries import (
+    entradas_a_recrawlear,
+    entradas_guardadas,
+    guardar_entradas,
+    parse_entradas_sitemap,
+)
+from core.utils.sitemap_resolver import resolver_sitemap, urls_sitemap_dominio
+from core.utils.sitemap_stream import LectorSitemap
+from core.utils.url_canon import canonicalizar_url, clave_canonica, url_absoluta
+
+FIXTURES_HTML = Path(__file__).resolve().parent / "fixtures" / "html"
+FIXTURES_BLOQUEOS = Path(__file__).resolve().parent / "fixtures" / "bloqueos"
+
+RELLENO = "<p>" + "contenido de prueba " * 10 + "</p>"
+
+PAGINAS = {
+    "/": '<a href="/a">A</a><a href="/b">B</a><a href="https://otro.com/x">X</a>',
+    "/a": '<a href="/b">B</a><a href="/c">C</a><a href="mailto:x@ejemplo.com">M</a>',
+    "/b": '<a href="/a/?utm_source=x#top">A</a><a href="http://www.ejemplo.com/c">C</a>',
+    "/c": "",
+}
+
+
+def sitio_de_prueba(request):
+    path = request.url.path
+    if path in PAGINAS:
+        return httpx.Response(200, html=f"<html>{PAGINAS[path]}{RELLENO}</html>")
+    return httpx.Response(404, text="no encontrado")
+
+
+class AsyncCrawlerTest(SimpleTestCase):
+    def crawl(self, handler, **kwargs):
+        return asyncio.run(
+            crawl_urls_async(
+                "https://ejemplo.com",
+                crawl_delay=0,
+                transport=httpx.MockTransport(handler),
+                **kwargs,
+            )
+        )
+
+    def test_crawl_concurrente_encuentra_todas_las_paginas(self):
+        resultado = self.crawl(sitio_de_prueba, concurrency=3)
+        self.assertEqual(resultado["status"], "success")
+        self.assertEqual(
+            sorted(resultado["urls"]),
+            [
+                "https://ejemplo.com/",
+                "https://ejemplo.com/a",
+                "https://ejemplo.com/b",
+                "https://ejemplo.com/c",
+            ],
+        )
+        self.assertEqual(resultado["blocked_count"], 0)
+        self.assertEqual(resultado["sitemap_urls"], 0)
+
+    def test_respeta_max_urls(self):
+        resultado = self.crawl(sitio_de_prueba, concurrency=4, max_urls=2)
+        self.assertEqual(len(resultado["urls"]), 2)
+
+    def test_on_url_false_detiene_el_crawling(self):
+        vistas = []
+
+        def on_url(url, detalles):
+            vistas.append((url, detalles["depth"], detalles["status_code"]))
+            return False
+
+        resultado = self.crawl(sitio_de_prueba, concurrency=1, on_url=on_url)
+        self.assertEqual(resultado["status"], "stopped")
+        self.assertEqual(vistas, [("https://ejemplo.com/", 0, 200)])
+        self.assertEqual(resultado["urls"], ["https://ejemplo.com/"])
+
+    def test_bloqueo_403_usa_sitemap(self):
+        def bloqueado(request):
+            return httpx.Response(403, text="Forbidden")
+
+        with mock.patch(
+            "core.views_app.try_sitemap_fallback",
+            return_value=["https://ejemplo.com/s1", "https://ejemplo.com/s2"],
+        ):
+            resultado = self.crawl(bloqueado, concurrency=2)
+        self.assertEqual(resultado["status"], "blocked_fallback_sitemap")
+        self.assertEqual(resultado["sitemap_urls"], 2)
+        self.assertEqual(len(resultado["urls"]), 2)
+
+    @override_settings(CRAWL_PROGRESS_FLUSH_MS=10)
+    def test_latido_periodico_sin_urls_nuevas(self):
+        latidos = []
+
+        async def lento(request):
+            await asyncio.sleep(0.05)
+            return sitio_de_prueba(request)
+
+        def latido():
+            latidos.append(1)
+            # El usuario detiene el crawling mientras las descargas siguen lentas
+            return len(latidos) < 3
+
+        resultado = self.crawl(lento, concurrency=1, latido=latido)
+        self.assertEqual(resultado["status"], "stopped")
+        self.assertGreaterEqual(len(latidos), 3)
+        self.assertLess(len(resultado["urls"]), 4)
+
+    @override_settings(CRAWL_MAX_BYTES_PAGINA=64 * 1024)
+    def test_no_descarga_binarios_ni_paginas_enormes(self):
+        peticiones = []
+
+        def sitio(request):
+            peticiones.append((request.method, request.url.path))
+            if request.url.path == "/":
+                return httpx.Response(
+                    200,
+                    html='<a href="/manual.pdf">PDF</a><a href="/video">V</a>'
+                    f'<a href="/enorme">E</a>{RELLENO}',
+                )
+            if request.url.path == "/manual.pdf":
+                return httpx.Response(
+                    200, headers={"Content-Type": "application/pdf"}, content=b""
+                )
+            if request.url.path == "/video":
+                return httpx.Response(
+                    200, headers={"Content-Type": "video/mp4"}, content=b"\0" * 10
+                )
+            if request.url.path != "/enorme":
+                return httpx.Response(404)
+
+            async def bloques():
+                for _ in range(100):
+                    yield b"<p>" + b"x" * 16 * 1024
+
+            # Sin Content-Length: se corta al superar el máximo
+            return httpx.Response(
+                200, headers={"Content-Type": "text/html"}, content=bloques()
+            )
+
+        resultado = self.crawl(sitio, concurrency=1)
+        self.assertEqual(
+            sorted(resultado["urls"]),
+            [
+                "https://ejemplo.com/",
+                "https://ejemplo.com/enorme",
+                "https://ejemplo.com/manual.pdf",
+                "https://ejemplo.com/video",
+            ],
+        )
+        # El PDF se descarta con HEAD, sin llegar a pedirlo con GET
+        self.assertIn(("HEAD", "/manual.pdf"), peticiones)
+        self.assertNotIn(("GET", "/manual.pdf"), peticiones)
+
+
+class RecrawlCondicionalTest(TestCase):
+    def setUp(self):
+        self.version = {"/a": "v1"}
+        self.condicionales = []
+
+    def sitio_con_etags(self, request):
+        path = request.url.path
+        if path not in PAGINAS:
+            return httpx.Response(404, text="no encontrado")
+        etag = f'"{path}-{self.version.get(path, "v1")}"'
+        if request.headers.get("if-none-match"):
+            self.condicionales.append(path)
+            if request.headers["if-none-match"] == etag:
+                return httpx.Response(304, headers={"ETag": etag})
+        html = f"<html>{PAGINAS[path]}{RELLENO}{self.version.get(path, '')}</html>"
+        return httpx.Response(200, html=html, headers={"ETag": etag})
+
+    def crawl(self, **kwargs):
+        huellas = HuellasDominio("ejemplo.com")
+        resultado = asyncio.run(
+            crawl_urls_async(
+                "https://ejemplo.com",
+                crawl_delay=0,
+                concurrency=1,
+                transport=httpx.MockTransport(self.sitio_con_etags),
+                huellas=huellas,
+                **kwargs,
+            )
+        )
+        huellas.guardar()
+        return resultado
+
+    def test_solo_descarga_paginas_cambiadas(self):
+        primero = self.crawl()
+        self.assertEqual(primero["cambios"]["nueva"], 4)
+        self.assertEqual(self.condicionales, [])
+        self.assertEqual(
+            PageFingerprint.objects.filter(dominio="ejemplo.com").count(), 4
+        )
+
+        self.version["/a"] = "v2"
+        segundo = self.crawl(solo_cambios=True)
+        self.assertEqual(
+            segundo["cambios"], {"nueva": 0, "cambiada": 1, "sin_cambios": 3}
+        )
+        self.assertEqual(len(segundo["urls"]), 4)
+        self.assertEqual(len(self.condicionales), 4)
+        huella = PageFingerprint.objects.get(url="https://ejemplo.com/a")
+        self.assertEqual(huella.etag, '"/a-v2"')
+
+
+SITEMAP_LASTMOD = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://ejemplo.com/a</loc><lastmod>2020-01-01</lastmod></url>
+  <url>
+    <loc>https://ejemplo.com/b</loc><lastmod>2999-01-01T10:00:00+02:00</lastmod>
+    <changefreq>Daily</changefreq><priority>0.2</priority>
+  </url>
+  <url><loc>https://ejemplo.com/c</loc><priority>0.9</priority></url>
+  <url><loc>https://ejemplo.com/sin-lastmod</loc></url>
+</urlset>"""
+
+
+class SitemapLastmodTest(TestCase):
+    def test_recrawl_solo_urls_con_lastmod_nuevo(self):
+        entradas, hijos = parse_entradas_sitemap(SITEMAP_LASTMOD)
+        self.assertEqual(hijos, [])
+        self.assertEqual(entradas[1]["changefreq"], "daily")
+        self.assertEqual(
+            entradas[1]["lastmod"].isoformat(), "2999-01-01T10:00:00+02:00"
+        )
+        self.assertEqual(entradas[0]["lastmod"].tzinfo, dt_timezone.utc)
+        self.assertEqual(guardar_entradas("www.ejemplo.com", entradas), 4)
+
+        huellas = HuellasDominio("ejemplo.com")
+        for path in ("/a", "/b", "/sin-lastmod"):
+            huellas.registrar(f"https://ejemplo.com{path}", 200, {}, b"x")
+        huellas.guardar()
+
+        self.assertEqual(
+            [e["loc"] for e in entradas_guardadas("ejemplo.com")],
+            [
+                "https://ejemplo.com/c",
+                "https://ejemplo.com/b",
+                "https://ejemplo.com/a",
+                "https://ejemplo.com/sin-lastmod",
+            ],
+        )
+        # /a cambió antes de la visita y /sin-lastmod no declara fecha
+        pendientes = entradas_a_recrawlear("ejemplo.com")
+        self.assertEqual(
+            [e["loc"] for e in pendientes],
+            ["https://ejemplo.com/c", "https://ejemplo.com/b"],
+        )
+
+        visitadas = []
+
+        def sitio(request):
+            visitadas.append(request.url.path)
+            return sitio_de_prueba(request)
+
+        resultado = asyncio.run(
+            crawl_urls_async(
+                "https://ejemplo.com",
+                crawl_delay=0,
+                concurrency=1,
+                transport=httpx.MockTransport(sitio),
+                entradas_sitemap=pendientes,
+                seguir_enlaces=False,
+            )
+        )
+        self.assertEqual(visitadas[1:], ["/c", "/b"])
+        self.assertEqual(
+            resultado["urls"], ["https://ejemplo.com/c", "https://ejemplo.com/b"]
+        )
+
+
+def sitemap_xml(urls):
+    filas = "".join(f"<url><loc>{url}</loc></url>" for url in urls)
+    return (
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        f"{filas}</urlset>"
+    ).encode()
+
+
+class LectorSitemapTest(SimpleTestCase):
+    def respuesta(self, url, **kwargs):
+        contenido = self.sitemaps.get(url)
+        return mock.Mock(
+            status_code=200 if contenido else 404,
+            raw=io.BytesIO(contenido or b""),
+        )
+
+    def setUp(self):
+        hijos = [f"https://ejemplo.com/s{i}.xml.gz" for i in range(3)]
+        self.sitemaps = {
+            hijo: gzip.compress(
+                sitemap_xml(f"https://ejemplo.com/{i}/{n}" for n in range(400))
+            )
+            for i, hijo in enumerate(hijos)
+        }
+        self.indice = (
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            + "".join(f"<sitemap><loc>{hijo}</loc></sitemap>" for hijo in hijos)
+            + "</sitemapindex>"
+        ).encode()
+        patcher = mock.patch(
+            "core.utils.sitemap_stream.http_get", side_effect=self.respuesta
+        )
+        self.http_get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sigue_hijos_gzip_en_paralelo_sin_limite_de_urls(self):
+        lector = LectorSitemap(concurrencia=3)
+        urls = [e["loc"] for e in lector.entradas("", contenido=self.indice)]
+        self.assertEqual(len(urls), 1200)
+        self.assertEqual(len(set(urls)), 1200)
+        self.assertEqual(lector.hijos, 3)
+
+        lector = LectorSitemap(max_hijos=2, concurrencia=2)
+        self.assertEqual(len(list(lector.entradas("", contenido=self.indice))), 800)
+
+    def test_cerrar_el_generador_detiene_la_lectura(self):
+        entradas = LectorSitemap(concurrencia=1).entradas("", contenido=self.indice)
+        primeras = list(itertools.islice(entradas, 10))
+        entradas.close()
+        self.assertEqual(len(primeras), 10)
+        self.assertEqual(primeras[0]["sitemap_url"], "https://ejemplo.com/s0.xml.gz")
+
+
+class SitemapResolverTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pedidas = []
+        self.respuestas = {
+            "https://ejemplo.com/robots.txt": (
+                200,
+                b"User-agent: *\nSitemap: https://ejemplo.com/roto.xml\n",
+            ),
+            "https://ejemplo.com/sitemap.xml": (
+                200,
+                sitemap_xml(["https://ejemplo.com/a", "https://otro.com/x"]),
+            ),
+            "https://ejemplo.com/sitemap.txt": (200, b"https://ejemplo.com/t\n"),
+        }
+
+    def http_get(self, url, **kwargs):
+        self.pedidas.append(url)
+        status, contenido = self.respuestas.get(url, (404, b""))
+        return mock.Mock(
+            status_code=status,
+            raw=io.BytesIO(contenido),
+            text=contenido.decode(),
+        )
+
+    def parchear(self):
+        for modulo in ("robots", "sitemap_resolver", "sitemap_stream"):
+            patcher = mock.patch(
+                f"core.utils.{modulo}.http_get", side_effect=self.http_get
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_primer_candidato_valido_y_cache_por_dominio(self):
+        self.parchear()
+        self.assertEqual(
+            resolver_sitemap("https://www.ejemplo.com/"),
+            "https://ejemplo.com/sitemap.xml",
+        )
+        self.assertEqual(urls_sitemap_dominio("ejemplo.com"), ["https://ejemplo.com/a"])
+        # La ubicación sale de la caché: solo se descarga el sitemap
+        self.assertEqual(self.pedidas[-1:], ["https://ejemplo.com/sitemap.xml"])
+        self.assertEqual(SitemapEntry.objects.filter(dominio="ejemplo.com").count(), 1)
+
+        del self.respuestas["https://ejemplo.com/sitemap.xml"]
+        self.assertEqual(urls_sitemap_dominio("ejemplo.com"), ["https://ejemplo.com/t"])
+        self.assertEqual(
+            resolver_sitemap("ejemplo.com"), "https://ejemplo.com/sitemap.txt"
+        )
+
+    def test_recuerda_dominios_sin_sitemap(self):
+        self.respuestas = {}
+        self.parchear()
+        self.assertIsNone(resolver_sitemap("vacio.com"))
+        pedidas = len(self.pedidas)
+        self.assertEqual(urls_sitemap_dominio("vacio.com"), [])
+        self.assertEqual(len(self.pedidas), pedidas)
+
+
+ROBOTS_TXT = """
+User-agent: *
+Disallow: /privado/
+Allow: /privado/publico$
+Crawl-delay: 0.01
+
+User-agent: otrobot
+User-agent: PrestaLab
+Disallow: /b
+Allow: /*.pdf$
+Sitemap: https://ejemplo.com/mapa.xml
+"""
+
+
+class RobotsTest(TestCase):
+    def test_reglas_por_user_agent_y_comodines(self):
+        reglas = ReglasRobots.desde_texto(ROBOTS_TXT)
+        self.assertEqual(reglas.sitemaps, ["https://ejemplo.com/mapa.xml"])
+        self.assertFalse(reglas.permitido("https://ejemplo.com/privado/x", "bot"))
+        self.assertTrue(reglas.permitido("https://ejemplo.com/privado/publico", "bot"))
+        self.assertFalse(
+            reglas.permitido("https://ejemplo.com/privado/publico?a=1", "bot")
+        )
+        self.assertEqual(reglas.crawl_delay("bot"), 0.01)
+        # El grupo de PrestaLab sustituye al de "*"
+        self.assertTrue(
+            reglas.permitido("https://ejemplo.com/privado/x", "PrestaLab/1.0")
+        )
+        self.assertFalse(reglas.permitido("https://ejemplo.com/b/1", "PrestaLab/1.0"))
+        self.assertTrue(
+            reglas.permitido("https://ejemplo.com/b/doc.pdf", "PrestaLab/1.0")
+        )
+        self.assertIsNone(reglas.crawl_delay("PrestaLab/1.0"))
+
+    def test_descarga_una_vez_por_host(self):
+        respuesta = mock.Mock(status_code=200, text=ROBOTS_TXT)
+        with mock.patch("core.utils.robots.http_get", return_value=respuesta) as get:
+            obtener_reglas("ejemplo.com")
+            reglas = obtener_reglas("Ejemplo.com")
+        get.assert_called_once()
+        self.assertFalse(reglas.permitido("https://ejemplo.com/b"))
+
+    def test_frontera_no_pide_urls_prohibidas(self):
+        pedidas = []
+
+        def sitio(request):
+            pedidas.append(request.url.path)
+            if request.url.path == "/robots.txt":
+                return httpx.Response(200, text="User-agent: *\nDisallow: /b\n")
+            return sitio_de_prueba(request)
+
+        resultado = asyncio.run(
+            crawl_urls_async(
+                "https://ejemplo.com",
+                crawl_delay=0,
+                transport=httpx.MockTransport(sitio),
+            )
+        )
+        self.assertNotIn("/b", pedidas)
+        self.assertEqual(
+            sorted(resultado["urls"]),
+            ["https://ejemplo.com/", "https://ejemplo.com/a", "https://ejemplo.com/c"],
+        )
+        self.assertEqual(resultado["robots_bloqueadas"], 1)
+
+
+class LimitadorHostTest(TestCase):
+    def test_aimd_y_retry_after(self):
+        limitador = LimitadorHost(tasa=1.0)
+        for _ in range(4):
+            limitador.registrar(200, 0.1)
+        self.assertEqual(limitador.tasa, 2.0)
+        # Respuestas rápidas: turnos sin espera dentro de la ráfaga
+        self.assertEqual(limitador.reservar(), 0)
+
+        limitador.registrar(429, 0.1, retry_after=parse_retry_after("30"))
+        self.assertEqual(limitador.tasa, 1.0)
+        self.assertGreater(limitador.reservar(), 29)
+        # Pico de latencia: también reduce
+        limitador._ultima_reduccion = 0
+        limitador.registrar(200, 5.0)
+        self.assertEqual(limitador.tasa, 0.5)
+
+        limitador.fijar_crawl_delay(10)
+        self.assertEqual(limitador.tasa, 0.1)
+
+    def test_persiste_la_tasa_aprendida(self):
+        self.assertEqual(cargar_limitador("ejemplo.com").tasa, 1.0)
+        limitador = LimitadorHost(tasa=3.0, latencia=0.2, espera_inicial=60)
+        guardar_limitador("ejemplo.com", limitador)
+        cargado = cargar_limitador("Ejemplo.com")
+        self.assertEqual((cargado.tasa, cargado.latencia), (3.0, 0.2))
+        self.assertGreater(cargado.espera_pendiente(), 50)
+
+
+@override_settings(CRAWL_HOST_RATE_GLOBAL=2.0, CRAWL_HOST_RAFAGA_GLOBAL=2)
+class TurnosHostTest(SimpleTestCase):
+    def test_presupuesto_compartido_por_host(self):
+        turnos = TurnosMemoria()
+        esperas = [turnos.reservar("ejemplo.com") for _ in range(4)]
+        # Ráfaga de 2 sin espera y luego un turno cada 0,5 s
+        self.assertEqual(esperas[:2], [0, 0])
+        self.assertAlmostEqual(esperas[2], 0.5, places=1)
+        self.assertAlmostEqual(esperas[3], 1.0, places=1)
+        self.assertEqual(turnos.reservar("otro.com"), 0)
+
+    def test_redis_caido_no_frena_el_crawling(self):
+        import redis
+
+        client = mock.Mock()
+        script = client.register_script.return_value
+        script.side_effect = redis.ConnectionError("caído")
+        turnos = TurnosRedis(client=client)
+        self.assertEqual(turnos.reservar("ejemplo.com"), 0)
+        self.assertEqual(turnos.reservar("ejemplo.com"), 0)
+        # No se reintenta Redis en cada petición
+        self.assertEqual(script.call_count, 1)
+
+        script.side_effect = None
+        script.return_value = 1500
+        turnos._sin_redis_hasta = 0
+        self.assertEqual(turnos.reservar("ejemplo.com"), 1.5)
+        self.assertEqual(
+            script.call_args.kwargs,
+            {"keys": ["host_turno:ejemplo.com"], "args": [500, 500]},
+        )
+
+
+class DetectBlockingTest(SimpleTestCase):
+    def test_corpus_de_bloqueos(self):
+        casos = json.loads((FIXTURES_BLOQUEOS / "casos.json").read_text())
+        for caso in casos:
+            with self.subTest(fixture=caso["fixture"], status=caso["status"]):
+                resp = httpx.Response(
+                    caso["status"],
+                    headers=caso["headers"],
+                    content=(FIXTURES_BLOQUEOS / caso["fixture"]).read_bytes(),
+                )
+                self.assertEqual(detect_blocking(resp)[0], caso["bloqueado"])
+
+    @override_settings(CRAWL_BLOQUEO_MAX_KB=1)
+    def test_solo_inspecciona_el_inicio_del_cuerpo(self):
+        relleno = b"<p>" + b"x" * 2048 + b"</p>"
+        puntos, _ = puntuar_bloqueo(200, {}, relleno + b"window._cf_chl_opt={}")
+        self.assertEqual(puntos, 0)
+        puntos, motivos = puntuar_bloqueo(200, {}, b"window._CF_CHL_OPT={}" + relleno)
+        self.assertEqual(motivos, ["desafío de Cloudflare"])
+        # Frases genéricas en una página larga: no cuentan
+        self.assertEqual(puntuar_bloqueo(200, {}, b"Access Denied" + relleno)[0], 0)
+        self.assertEqual(puntuar_bloqueo(403, {}, b"Access Denied" + relleno)[0], 5)
+
+
+class CrawlFrontierTest(SimpleTestCase):
+    def test_fifo_sin_duplicados(self):
+        frontier = CrawlFrontier(["https://a.com"])
+        self.assertTrue(frontier.push("https://a.com/1", 1))
+        self.assertFalse(frontier.push("https://a.com"))
+        self.assertIn("https://a.com/1", frontier)
+        self.assertEqual(frontier.pop(), ("https://a.com", 0))
+        self.assertEqual(frontier.pop(), ("https://a.com/1", 1))
+        # Una URL ya visitada no vuelve a encolarse
+        self.assertFalse(frontier.push("https://a.com/1", 2))
+        self.assertFalse(frontier)
+
+    def test_max_size(self):
+        frontier = CrawlFrontier(max_size=1)
+        self.assertTrue(frontier.push("https://a.com/1"))
+        self.assertFalse(frontier.push("https://a.com/2"))
+        self.assertEqual(len(frontier), 1)
+
+    def test_prioridad_profundidad_y_sitemap(self):
+        frontier = CrawlFrontier(priorizar=True)
+        frontier.push("https://a.com/profunda", 3)
+        frontier.push("https://a.com/enlace", 1)
+        frontier.push("https://a.com/sitemap", 1, from_sitemap=True)
+        frontier.push("https://a.com/top", 1, from_sitemap=True, prioridad=0.9)
+        frontier.push("https://a.com", 0)
+        orden = [frontier.pop()[0] for _ in range(len(frontier))]
+        self.assertEqual(
+            orden,
+            [
+                "https://a.com",
+                "https://a.com/top",
+                "https://a.com/sitemap",
+                "https://a.com/enlace",
+                "https://a.com/profunda",
+            ],
+        )
+
+
+class UrlCanonTest(SimpleTestCase):
+    def test_canonicalizar_url(self):
+        self.assertEqual(
+            canonicalizar_url(
+                "HTTPS://Ejemplo.com:443/ruta/?b=2&utm_source=x&a=1&fbclid=y#frag"
+            ),
+            "https://ejemplo.com/ruta/?b=2&a=1",
+        )
+        self.assertEqual(canonicalizar_url("http://ejemplo.com"), "http://ejemplo.com/")
+        self.assertEqual(
+            canonicalizar_url("http://ejemplo.com:8080/x/"),
+            "http://ejemplo.com:8080/x/",
+        )
+        # Los valores de la query no se recodifican
+        self.assertEqual(
+            canonicalizar_url("https://a.com/b?q=a+b%2Fc&r=%7E&utm_medium=z"),
+            "https://a.com/b?q=a+b%2Fc&r=%7E",
+        )
+
+    def test_clave_ignora_esquema_y_www(self):
+        self.assertEqual(
+            clave_canonica("http://www.ejemplo.com/a/"),
+            clave_canonica("https://ejemplo.com/a#top"),
+        )
+        self.assertEqual(
+            clave_canonica("https://a.com/p?b=2&a=1"),
+            clave_canonica("https://a.com/p/?a=1&b=2"),
+        )
+
+    def test_url_absoluta_conserva_la_url_original(self):
+        self.assertEqual(
+            url_absoluta("https://a.com/x/", "../Ruta/?b=2&a=1#frag"),
+            "https://a.com/Ruta/?b=2&a=1",
+        )
+
+    def test_reglas_por_dominio(self):
+        reglas = {"tienda.com": {"force_https": True, "keep_params": ["page"]}}
+        with self.settings(URL_CANONICAL_RULES=reglas):
+            self.assertEqual(
+                canonicalizar_url("http://www.tienda.com/p?page=2&sesion=abc"),
+                "https://www.tienda.com/p?page=2",
+            )
+        self.assertEqual(
+            canonicalizar_url(
+                "http://www.tienda.com/p/",
+                {"strip_www": True, "trailing_slash": "strip"},
+            ),
+            "http://tienda.com/p",
+        )
+
+
+class HttpClientTest(SimpleTestCase):
+    def tearDown(self):
+        http_client.cerrar_sesiones()
+
+    def test_reutiliza_sesion_por_host(self):
+        s1 = http_client.get_session("https://ejemplo.com/a")
+        s2 = http_client.get_session("https://ejemplo.com/b")
+        s3 = http_client.get_session("https://otro.com/")
+        self.assertIs(s1, s2)
+        self.assertIsNot(s1, s3)
+
+    def test_recicla_sesion_al_agotar_keepalive(self):
+        with self.settings(HTTP_KEEPALIVE_MAX_REQUESTS=2), mock.patch.object(
+            requests.Session, "close"
+        ) as close:
+            s1 = http_client.get_session("https://ejemplo.com/")
+            http_client.get_session("https://ejemplo.com/")
+            s3 = http_client.get_session("https://ejemplo.com/")
+        self.assertIsNot(s1, s3)
+        # Otro hilo podría seguir usando s1: no se cierra
+        close.assert_not_called()
+
+    def test_limite_de_sesiones(self):
+        with self.settings(HTTP_MAX_SESSIONS=2), mock.patch.object(
+            requests.Session, "close"
+        ) as close:
+            for host in ("a.com", "b.com", "c.com"):
+                http_client.get_session(f"https://{host}/")
+        self.assertEqual(list(http_client._sesiones), ["b.com", "c.com"])
+        close.assert_not_called()
+
+    def test_head_async_reserva_turno_del_host(self):
+        def sitio(request):
+            return httpx.Response(200, headers={"Content-Type": "application/pdf"})
+
+        async def descargar():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(sitio)) as c:
+                await http_client.http_get_pagina_async(c, "https://a.com/doc.pdf")
+
+        with mock.patch(
+            "core.utils.http_client.esperar_turno_host_async"
+        ) as turno, self.assertRaises(http_client.DescargaDescartada):
+            asyncio.run(descargar())
+        turno.assert_awaited_once_with("https://a.com/doc.pdf")
+
+
+class LinkExtractorTest(SimpleTestCase):
+    def test_extrae_enlaces_canonical_hreflang_y_base(self):
+        content = (FIXTURES_HTML / "blog.html").read_bytes()
+        pagina = extraer_enlaces(content, backend="lxml")
+        self.assertEqual(pagina["base_href"], "https://ejemplo.com/blog/")
+        self.assertEqual(pagina["canonical"], "https://ejemplo.com/blog/novedades")
+        self.assertEqual(
+            pagina["hreflang"],
+            {
+                "en": "https://ejemplo.com/en/blog/news",
+                "pt-br": "https://ejemplo.com/pt/blog/novidades",
+            },
+        )
+        self.assertIn("articulo-1", pagina["links"])
+
+    def test_backends_equivalentes_en_fixtures(self):
+        for fixture in sorted(FIXTURES_HTML.glob("*.html")):
+            content = fixture.read_bytes()
+            resultados = [backend().extraer(content) for backend in BACKENDS.values()]
+            for resultado in resultados[1:]:
+                self.assertEqual(resultado, resultados[0], fixture.name)
+
+
+class CrawlSchedulerTest(SimpleTestCase):
+    def setUp(self):
+        self.liberar = threading.Event()
+        self.scheduler = CrawlScheduler(
+            max_workers=1, max_queue=1, max_por_usuario=2, max_por_dominio=1
+        )
+
+    def tearDown(self):
+        self.liberar.set()
+        self.scheduler._executor.shutdown(wait=True)
+
+    def test_cuotas_y_backpressure(self):
+        self.scheduler.enviar(self.liberar.wait, "u1", ["a.com"])
+        with self.assertRaises(CrawlRechazado):
+            self.scheduler.enviar(self.liberar.wait, "u2", ["a.com"])
+        self.scheduler.enviar(self.liberar.wait, "u1", ["b.com"])
+        with self.assertRaises(CrawlRechazado):
+            self.scheduler.enviar(self.liberar.wait, "u1", ["c.com"])
+        with self.assertRaises(CrawlRechazado) as ctx:
+            self.scheduler.enviar(self.liberar.wait, "u3", ["d.com"])
+        self.assertGreater(ctx.exception.retry_after, 0)
+        stats = self.scheduler.estadisticas()
+        self.assertEqual(stats["en_curso"] + stats["en_cola"], 2)
+
+    def test_lote_cuenta_cada_dominio(self):
+        with self.assertRaises(CrawlRechazado):
+            self.scheduler.enviar_lote(
+                [(self.liberar.wait, d) for d in ("a.com", "b.com", "c.com")], "u1"
+            )
+        ids = self.scheduler.enviar_lote(
+            [(self.liberar.wait, d) for d in ("a.com", "b.com")], "u1"
+        )
+        self.assertEqual(len(ids), 2)
+        stats = self.scheduler.estadisticas()
+        self.assertEqual((stats["en_curso"] + stats["en_cola"]), 2)
+        self.assertEqual(stats["por_dominio"], {"a.com": 1, "b.com": 1})
+        with self.assertRaises(CrawlRechazado):
+            self.scheduler.enviar(self.liberar.wait, "u2", ["c.com"])
+
+    def test_libera_cupos_al_terminar(self):
+        self.liberar.set()
+        self.scheduler.enviar(lambda: None, "u1", ["a.com"])
+        self.scheduler._executor.shutdown(wait=True)
+        stats = self.scheduler.estadisticas()
+        self.assertEqual(stats["en_curso"] + stats["en_cola"], 0)
+        self.assertEqual(stats["por_dominio"], {})
+
+
+class ProgressStoreTest(TestCase):
+    def comprobar_store(self, store):
+        store.set("k", {"count": 0, "done": False, "urls": [], "results": {}})
+        store.update("k", count=2, last="https://a.com/b")
+        store.append("k", "urls", "https://a.com/")
+        store.append("k", "urls", "https://a.com/b")
+        self.assertEqual(store.incr("k", "completed"), 1)
+        store.set_resultado("k", "a.com", {"status": "running"})
+        store.set_resultado("k", "b.com", {"status": "success"})
+        store.set_resultado("k", "a.com", {"status": "error"})
+        documento = store.get("k")
+        self.assertEqual(documento["count"], 2)
+        self.assertFalse(documento["done"])
+        self.assertEqual(documento["urls"], ["https://a.com/", "https://a.com/b"])
+        self.assertEqual(documento["completed"], 1)
+        self.assertEqual(
+            documento["results"],
+            {"a.com": {"status": "error"}, "b.com": {"status": "success"}},
+        )
+        parcial = store.get("k", desde=1)
+        self.assertEqual(parcial["urls"], ["https://a.com/b"])
+        self.assertEqual(parcial["count"], 2)
+        self.assertEqual(len(store.get("k")["urls"]), 2)
+        store.delete("k")
+        self.assertIsNone(store.get("k"))
+
+    def test_backend_memoria(self):
+        self.comprobar_store(MemoryProgressStore())
+
+    def test_backend_base_de_datos(self):
+        self.comprobar_store(DatabaseProgressStore())
+
+    def test_base_de_datos_extend_solo_inserta_lo_nuevo(self):
+        store = DatabaseProgressStore()
+        store.set("k", {"count": 0, "urls": []})
+        store.extend("k", "urls", ["https://a.com/1", "https://a.com/2"])
+        store.extend("k", "urls", ["https://a.com/3"])
+        self.assertEqual(
+            list(
+                ProgresoElemento.objects.filter(progress_key="k").values_list(
+                    "posicion", "valor"
+                )
+            ),
+            [(0, "https://a.com/1"), (1, "https://a.com/2"), (2, "https://a.com/3")],
+        )
+        with self.assertNumQueries(2):
+            self.assertEqual(store.get("k", desde=2)["urls"], ["https://a.com/3"])
+        store.update("k", urls=["https://a.com/"])
+        self.assertEqual(store.get("k")["urls"], ["https://a.com/"])
+        store.delete("k")
+        self.assertFalse(ProgresoElemento.objects.exists())
+
+    def test_base_de_datos_purga_progresos_inactivos(self):
+        store = DatabaseProgressStore()
+        store.set("viejo", {"done": True, "urls": ["https://a.com/"]})
+        store.set("nuevo", {"done": False, "urls": ["https://b.com/"]})
+        hace_2h = timezone.now() - timezone.timedelta(hours=2)
+        ProgresoCampo.objects.filter(progress_key="viejo").update(updated_at=hace_2h)
+        self.assertEqual(store.purgar(timezone.now() - timezone.timedelta(hours=1)), 1)
+        self.assertIsNone(store.get("viejo"))
+        self.assertFalse(ProgresoElemento.objects.filter(progress_key="viejo").exists())
+        self.assertEqual(store.get("nuevo")["urls"], ["https://b.com/"])
+
+    def test_urls_de_la_busqueda_desde_discovered_url(self):
+        busqueda = BusquedaDominio.objects.create(dominio="a.com")
+        busqueda.guardar_urls(["https://a.com/", "https://a.com/b"])
+        store = MemoryProgressStore()
+        store.set("k", {"count": 2, "done": False, "busqueda_id": busqueda.id})
+        self.assertEqual(
+            leer_progreso(store, "k", desde=1)["urls"], ["https://a.com/b"]
+        )
+        self.assertNotIn("urls", store.get("k"))
+
+    def test_redis_update_conserva_las_listas(self):
+        store = RedisProgressStore(client=mock.MagicMock())
+        pipe = store.redis.pipeline.return_value
+        store.update("k", count=2, urls=["https://a.com/", "https://a.com/b"])
+        pipe.delete.assert_called_once_with("crawl_progress:k:lista:urls")
+        pipe.rpush.assert_called_once_with(
+            "crawl_progress:k:lista:urls", '"https://a.com/"', '"https://a.com/b"'
+        )
+        pipe.hset.assert_called_once_with(
+            "crawl_progress:k",
+            mapping={"count": "2", "urls": RedisProgressStore.MARCA_LISTA},
+        )
+
+
+@override_settings(CRAWL_PROGRESS_BACKEND="memory")
+class ProgresoIncrementalTest(TestCase):
+    def setUp(self):
+        CrawlingProgress.objects.create(progress_key="k", dominio="a.com")
+
+    def progreso_bd(self):
+        return CrawlingProgress.objects.get(progress_key="k")
+
+    def test_vuelca_por_lotes_agregando_urls(self):
+        progreso = ProgresoIncremental("k", cada_n=2, cada_ms=60_000)
+        self.assertTrue(progreso.registrar("https://a.com/1"))
+        self.assertEqual(self.progreso_bd().count, 0)
+        self.assertTrue(progreso.registrar("https://a.com/2"))
+        progreso.registrar("https://a.com/3")
+        self.assertEqual(self.progreso_bd().count, 2)
+        progreso.flush(final=True)
+        bd = self.progreso_bd()
+        self.assertTrue(bd.is_done)
+        self.assertEqual(
+            bd.get_urls_list(),
+            ["https://a.com/1", "https://a.com/2", "https://a.com/3"],
+        )
+
+    def test_detencion_en_memoria_y_desde_otro_proceso(self):
+        progreso = ProgresoIncremental("k", cada_n=1)
+        solicitar_detencion("k")
+        self.assertTrue(progreso.detenido)
+        progreso.flush(final=True)
+
+        otro = ProgresoIncremental("k", cada_n=1)
+        CrawlingProgress.objects.filter(progress_key="k").update(is_done=True)
+        self.assertFalse(otro.registrar("https://a.com/x"))
+        self.assertIn("https://a.com/x", self.progreso_bd().get_urls_list())
+
+
+@override_settings(CRAWL_PROGRESS_BACKEND="memory", CRAWL_HEARTBEAT_TIMEOUT=300)
+class ReconciliarCrawlingsTest(TestCase):
+    def test_cierra_colgados_y_sincroniza_en_bloque(self):
+        hace_1h = timezone.now() - timezone.timedelta(hours=1)
+        colgada = BusquedaDominio.objects.create(dominio="colgado.com")
+        detenida = BusquedaDominio.objects.create(dominio="detenido.com")
+        cerrada = BusquedaDominio.objects.create(
+            dominio="cerrado.com", fecha_fin=timezone.now()
+        )
+        activa = BusquedaDominio.objects.create(dominio="activo.com")
+        CrawlingProgress.objects.create(
+            progress_key="colgado", busqueda_id=colgada.id, heartbeat=hace_1h
+        )
+        CrawlingProgress.objects.create(
+            progress_key="detenido",
+            busqueda_id=detenida.id,
+            is_done=True,
+            heartbeat=hace_1h,
+        )
+        # Recién terminado: el crawler está a punto de cerrar la búsqueda
+        recien = BusquedaDominio.objects.create(dominio="recien.com")
+        CrawlingProgress.objects.create(
+            progress_key="recien", busqueda_id=recien.id, is_done=True
+        )
+        CrawlingProgress.objects.create(progress_key="cerrado", busqueda_id=cerrada.id)
+        CrawlingProgress.objects.create(progress_key="activo", busqueda_id=activa.id)
+
+        # Consultas fijas, sin depender del número de filas
+        with self.assertNumQueries(11):
+            resumen = reconciliar_crawlings()
+
+        self.assertEqual(
+            resumen,
+            {
+                "progresos_colgados": 1,
+                "busquedas_abandonadas": 1,
+                "busquedas_detenidas": 1,
+                "progresos_cerrados": 1,
+                "progresos_purgados": 0,
+            },
+        )
+        colgada.refresh_from_db()
+        detenida.refresh_from_db()
+        self.assertEqual(colgada.crawl_status, "abandoned")
+        self.assertIsNotNone(colgada.duracion_segundos)
+        self.assertEqual(detenida.crawl_status, "stopped")
+        self.assertIsNone(BusquedaDominio.objects.get(id=recien.id).fecha_fin)
+        self.assertTrue(CrawlingProgress.objects.get(progress_key="cerrado").is_done)
+        self.assertFalse(CrawlingProgress.objects.get(progress_key="activo").is_done)
+        self.assertIsNone(BusquedaDominio.objects.get(id=activa.id).fecha_fin)
+
+    def test_tarea_que_empieza_tras_el_timeout_no_se_abandona(self):
+        hace_10min = timezone.now() - timezone.timedelta(minutes=10)
+        busqueda = BusquedaDominio.objects.create(dominio="lento.com")
+        CrawlingProgress.objects.create(
+            progress_key="lento", busqueda_id=busqueda.id, heartbeat=hace_10min
+        )
+        # El reconciliador pasa mientras la tarea espera en la cola de Celery
+        reconciliar_crawlings()
+        urls = [f"https://lento.com/{i}" for i in range(60)]
+
+        def crawl_urls(base_url, on_url=None, **kwargs):
+            for i, url in enumerate(urls):
+                if i == 30:
+                    reconciliar_crawlings()
+                if on_url(url, {"status_code": 200}) is False:
+                    return {"urls": urls[: i + 1], "status": "stopped"}
+            return {"urls": urls, "status": "success"}
+
+        with mock.patch("core.views_app.crawl_urls", side_effect=crawl_urls):
+            resultado = tarea_crawl_dominio.apply(
+                args=(busqueda.id, "https://lento.com", None, "lento")
+            ).get()
+
+        self.assertEqual(resultado["status"], "success")
+        self.assertEqual(resultado["total_urls"], 60)
+        busqueda.refresh_from_db()
+        self.assertEqual((busqueda.crawl_status, busqueda.url_count), ("success", 60))
+
+
+@override_settings(CRAWL_PROGRESS_BACKEND="memory")
+class TareaCrawlDominioTest(TestCase):
+    def test_error_cierra_busqueda_y_progreso(self):
+        busqueda = BusquedaDominio.objects.create(dominio="roto.com")
+        CrawlingProgress.objects.create(progress_key="roto", busqueda_id=busqueda.id)
+        with mock.patch(
+            "core.views_app.crawl_urls", side_effect=RuntimeError("sin memoria")
+        ):
+            resultado = tarea_crawl_dominio.apply(
+                args=(busqueda.id, "https://roto.com", None, "roto")
+            )
+        self.assertTrue(resultado.failed())
+        busqueda.refresh_from_db()
+        self.assertEqual(busqueda.crawl_status, "error")
+        self.assertIsNotNone(busqueda.fecha_fin)
+        self.assertTrue(CrawlingProgress.objects.get(progress_key="roto").is_done)
+        documento = get_progress_store().get("roto")
+        self.assertTrue(documento["done"])
+        self.assertEqual(documento["error"], "sin memoria")
+
+    def test_fallback_agrega_solo_las_urls_nuevas(self):
+        busqueda = BusquedaDominio.objects.create(dominio="a.com")
+        CrawlingProgress.objects.create(progress_key="k", busqueda_id=busqueda.id)
+        get_progress_store().set(
+            "k", {"count": 0, "done": False, "busqueda_id": busqueda.id}
+        )
+
+        def crawl(base_url, on_url=None, **kwargs):
+            on_url("https://a.com/", {})
+            urls = [f"https://a.com/{i}" for i in range(5)]
+            return {"urls": ["https://a.com/", *urls], "status": "success"}
+
+        with mock.patch("core.views_app.crawl_urls", side_effect=crawl):
+            tarea_crawl_dominio.apply(args=(busqueda.id, "https://a.com", None, "k"))
+        store = get_progress_store()
+        self.assertEqual(store.get("k")["count"], 6)
+        self.assertEqual(len(leer_progreso(store, "k")["urls"]), 6)
+        self.assertEqual(
+            leer_progreso(store, "k", desde=1)["urls"][0], "https://a.com/0"
+        )
+
+
+@override_settings(CRAWL_SSE_INTERVAL_MS=0, CRAWL_SSE_MAX_SEGUNDOS=5)
+class FlujoProgresoTest(SimpleTestCase):
+    def test_envia_solo_cambios_y_termina(self):
+        store = MemoryProgressStore()
+        store.set("k", {"count": 1, "urls": ["https://a.com/1"], "done": False})
+        flujo = FlujoProgreso(store, "k")
+        primeros = flujo.leer()
+        self.assertEqual(len(primeros), 1)
+        self.assertIn("id: 1\n", primeros[0])
+        self.assertEqual(flujo.leer(), [])
+
+        store.extend("k", "urls", ["https://a.com/2"])
+        store.update("k", count=2, done=True)
+
+        async def consumir():
+            return [e async for e in flujo]
+
+        eventos = asyncio.run(consumir())
+        self.assertIn('"desde": 1, "urls": ["https://a.com/2"]', eventos[0])
+        self.assertTrue(eventos[-1].startswith("event: fin"))
+
+    def test_reanuda_desde_cursor_con_iterador_asincrono(self):
+        store = MemoryProgressStore()
+        store.set("k", {"count": 3, "urls": ["u1", "u2", "u3"], "done": True})
+
+        async def consumir():
+            return [e async for e in FlujoProgreso(store, "k", desde=2)]
+
+        eventos = asyncio.run(consumir())
+        self.assertIn('"desde": 2, "urls": ["u3"]', eventos[0])
+        self.assertEqual(len(eventos), 2)
+
+    def test_cierra_conexiones_tras_cada_lectura(self):
+        store = MemoryProgressStore()
+        store.set("k", {"count": 1, "urls": ["u1"], "done": True})
+
+        async def consumir():
+            return [e async for e in FlujoProgreso(store, "k")]
+
+        with mock.patch("core.utils.progress_stream.close_old_connections") as cerrar:
+            asyncio.run(consumir())
+        cerrar.assert_called_once_with()
@@ -27,3 +27,72 @@ class UserModelTest(TestCase):
         )
         self.assertEqual(user.username, "testuser")
         self.assertTrue(user.check_password("12345678"))
+
+
+class DiscoveredUrlTest(TestCase):
+    def test_guardar_urls_reemplaza_filas_y_contador(self):
+        from core.models import BusquedaDominio
+
+        busqueda = BusquedaDominio.objects.create(dominio="a.com")
+        busqueda.guardar_urls(["https://a.com/", "https://a.com/b", "https://a.com/"])
+        busqueda.guardar_urls(
+            ["https://a.com/c", " ", "https://a.com/d"],
+            detalles={"https://a.com/c": {"status_code": 200, "depth": 1}},
+        )
+        busqueda.refresh_from_db()
+        self.assertEqual(busqueda.url_count, 2)
+        self.assertEqual(busqueda.get_urls(), ["https://a.com/c", "https://a.com/d"])
+        self.assertEqual(busqueda.urls_descubiertas.get(depth=1).status_code, 200)
+
+    def test_progreso_incremental_inserta_filas(self):
+        from core.models import BusquedaDominio, CrawlingProgress
+        from core.utils.progress_buffer import ProgresoIncremental
+
+        busqueda = BusquedaDominio.objects.create(dominio="a.com")
+        CrawlingProgress.objects.create(
+            progress_key="k", dominio="a.com", busqueda_id=busqueda.id
+        )
+        progreso = ProgresoIncremental("k", cada_n=2)
+        progreso.registrar("https://a.com/", status_code=200, depth=0)
+        progreso.registrar("https://a.com/b", status_code=200, depth=1)
+        progreso.registrar("https://a.com/c", status_code=200, depth=1)
+        progreso.flush(final=True)
+        busqueda.refresh_from_db()
+        self.assertEqual(busqueda.url_count, 3)
+        self.assertEqual(len(busqueda.get_urls()), 3)
+        progreso_bd = CrawlingProgress.objects.get(progress_key="k")
+        self.assertEqual(progreso_bd.urls_found, "")
+        self.assertEqual(progreso_bd.get_urls_list(), busqueda.get_urls())
+
+
+class EstadoCrawlTest(TestCase):
+    def test_finalizar_guarda_clasificacion(self):
+        from datetime import timedelta
+        from core.models import BusquedaDominio
+
+        busqueda = BusquedaDominio.objects.create(dominio="a.com")
+        busqueda.guardar_urls(["https://a.com/"])
+        busqueda.finalizar(
+            "blocked_fallback_sitemap",
+            3,
+            fecha_fin=busqueda.fecha + timedelta(seconds=75),
+        )
+        busqueda.refresh_from_db()
+        self.assertEqual(busqueda.crawl_status, "blocked_fallback_sitemap")
+        self.assertEqual(busqueda.blocked_count, 3)
+        self.assertEqual(busqueda.duracion_segundos, 75)
+        self.assertEqual(busqueda.estado_clase, "warning")
+
+    def test_clasificacion_por_status_y_heuristica(self):
+        from core.utils.crawl_status import clasificar_crawl, formatear_duracion
+
+        self.assertEqual(clasificar_crawl("a.com", "success", 10, 60)[1], "success")
+        self.assertEqual(clasificar_crawl("a.com", "success", 10, 60, 2)[1], "warning")
+        self.assertEqual(
+            clasificar_crawl("a.com", "blocked_no_sitemap", 0, 1)[1], "danger"
+        )
+        # Búsquedas antiguas sin status: heurísticas de duración y URLs
+        self.assertEqual(clasificar_crawl("www.udemy.com", "", 0, 1)[1], "danger")
+        self.assertEqual(clasificar_crawl("a.com", "", 0, 10)[1], "info")
+        self.assertEqual(formatear_duracion(3725), "01:02:05")
+        self.assertEqual(formatear_duracion(None), "")
@@ -1,4 +1,4 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 
@@ -51,3 +51,296 @@ class UsuarioViewsTest(TestCase):
             follow=True,
         )
         self.assertContains(response, "Usuario editado")
+
+
+class AnalisisDominioCrawlTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("crawler", "c@example.com", "pass1234")
+        self.client = Client()
+        self.client.login(username="crawler", password="pass1234")  # nosec
+
+    def test_post_encola_crawling_en_celery(self):
+        from unittest import mock
+        from django.http import HttpResponse
+        from core.models import BusquedaDominio, CrawlingProgress
+
+        tarea = mock.Mock(id="tarea-123")
+        with mock.patch(
+            "core.views_app.tarea_crawl_dominio.delay", return_value=tarea
+        ) as delay, mock.patch(
+            "core.views_app.render", return_value=HttpResponse()
+        ) as render:
+            self.client.post(
+                reverse("core:analisis_dominio"), {"dominio": "ejemplo.com"}
+            )
+        busqueda = BusquedaDominio.objects.get(dominio="ejemplo.com")
+        progreso = CrawlingProgress.objects.get(busqueda_id=busqueda.id)
+        self.assertEqual(progreso.task_id, "tarea-123")
+        self.assertFalse(progreso.is_done)
+        delay.assert_called_once_with(
+            busqueda.id, "https://ejemplo.com", None, progreso.progress_key
+        )
+        contexto = render.call_args[0][2]
+        self.assertIn(progreso.progress_key, contexto["mensaje"])
+
+    @override_settings(CRAWL_PROGRESS_BACKEND="memory")
+    def test_broker_caido_cierra_busqueda_y_progreso(self):
+        from unittest import mock
+        from django.http import HttpResponse
+        from kombu.exceptions import OperationalError
+        from core.models import BusquedaDominio, CrawlingProgress
+
+        with mock.patch(
+            "core.views_app.tarea_crawl_dominio.delay",
+            side_effect=OperationalError("Connection refused"),
+        ), mock.patch("core.views_app.render", return_value=HttpResponse()) as render:
+            response = self.client.post(
+                reverse("core:analisis_dominio"), {"dominio": "ejemplo.com"}
+            )
+        self.assertEqual(response.status_code, 200)
+        busqueda = BusquedaDominio.objects.get(dominio="ejemplo.com")
+        self.assertEqual(busqueda.crawl_status, "error")
+        self.assertIsNotNone(busqueda.fecha_fin)
+        self.assertTrue(CrawlingProgress.objects.get(busqueda_id=busqueda.id).is_done)
+        self.assertIn("no está disponible", render.call_args[0][2]["mensaje"])
+
+    def test_recrawl_solo_cambios_de_busqueda_existente(self):
+        from unittest import mock
+        from django.http import HttpResponse
+        from core.models import BusquedaDominio
+
+        original = BusquedaDominio.objects.create(dominio="ejemplo.com")
+        with mock.patch(
+            "core.views_app.tarea_crawl_dominio.delay",
+            return_value=mock.Mock(id="tarea-456"),
+        ) as delay, mock.patch("core.views_app.render", return_value=HttpResponse()):
+            self.client.post(
+                reverse("core:analisis_dominio"), {"recrawl_cambios": original.id}
+            )
+        nueva = BusquedaDominio.objects.exclude(id=original.id).get()
+        self.assertEqual(
+            delay.call_args[0][:3], (nueva.id, "https://ejemplo.com", None)
+        )
+        self.assertEqual(delay.call_args[1], {"recrawl_de": original.id})
+
+
+class CrawlingMultipleTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            "staff", "s@example.com", "pass1234", is_staff=True
+        )
+        self.client = Client()
+        self.dominios = "\n".join(f"dominio{i}.com" for i in range(12))
+
+    def post(self):
+        return self.client.post(
+            reverse("core:iniciar_crawling_multiple_ajax"),
+            {"dominios_multiple": self.dominios},
+        )
+
+    def test_limite_de_dominios_mayor_para_staff(self):
+        from unittest import mock
+
+        scheduler = mock.Mock(max_workers=4, max_queue=50)
+        with mock.patch("core.views_app.get_scheduler", return_value=scheduler):
+            self.assertEqual(self.post().status_code, 400)
+            self.client.login(username="staff", password="pass1234")  # nosec
+            self.assertEqual(self.post().status_code, 200)
+
+    def test_lote_mayor_que_el_planificador(self):
+        from unittest import mock
+
+        self.client.login(username="staff", password="pass1234")  # nosec
+        scheduler = mock.Mock(max_workers=2, max_queue=8)
+        with mock.patch("core.views_app.get_scheduler", return_value=scheduler):
+            response = self.post()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "Máximo 10 dominios permitidos")
+        scheduler.enviar_lote.assert_not_called()
+
+    @override_settings(CRAWL_PROGRESS_BACKEND="memory")
+    def test_lote_crawlea_dominios_en_paralelo(self):
+        from unittest import mock
+
+        self.client.login(username="staff", password="pass1234")  # nosec
+        scheduler = mock.Mock(max_workers=4, max_queue=50)
+        # Un trabajo del planificador por dominio
+        scheduler.enviar_lote.side_effect = lambda trabajos, usuario: [
+            fn() for fn, _ in trabajos
+        ]
+        with mock.patch(
+            "core.views_app.get_scheduler", return_value=scheduler
+        ), mock.patch(
+            "core.views_app.crawl_urls",
+            return_value={"urls": ["https://x.com/"], "status": "success"},
+        ), mock.patch(
+            "core.views_app.BusquedaDominio.objects.create",
+            return_value=mock.Mock(id=1),
+        ):
+            data = self.post().json()
+        trabajos = scheduler.enviar_lote.call_args[0][0]
+        self.assertEqual([dominio for _, dominio in trabajos], data["valid_domains"])
+        progreso = self.client.get(
+            reverse("core:progreso_crawling_ajax"),
+            {"progress_key": data["progress_key"]},
+        ).json()
+        self.assertTrue(progreso["done"])
+        self.assertEqual(progreso["completed_domains"], 12)
+        self.assertEqual(len(progreso["results"]), 12)
+        self.assertEqual(progreso["current_domains"], [])
+        self.assertTrue(
+            all(r["status"] == "success" for r in progreso["results"].values())
+        )
+
+    def test_lote_sin_dominios_repetidos(self):
+        from unittest import mock
+
+        self.dominios = "ejemplo.com\nwww.ejemplo.com\nhttps://EJEMPLO.com/x"
+        scheduler = mock.Mock(max_workers=4, max_queue=50)
+        with mock.patch("core.views_app.get_scheduler", return_value=scheduler):
+            data = self.post().json()
+        self.assertEqual(data["valid_domains"], ["ejemplo.com"])
+        self.assertEqual(data["total_domains"], 1)
+        self.assertEqual(len(scheduler.enviar_lote.call_args[0][0]), 1)
+
+
+class HistorialDominiosTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("hist", "h@example.com", "pass1234")
+        self.client = Client()
+        self.client.login(username="hist", password="pass1234")  # nosec
+
+    def crear_busquedas(self, n):
+        from core.models import BusquedaDominio, CrawlingProgress
+
+        for i in range(n):
+            b = BusquedaDominio.objects.create(dominio=f"d{i}.com", usuario=self.user)
+            CrawlingProgress.objects.create(
+                progress_key=f"p{b.id}", dominio=b.dominio, busqueda_id=b.id, count=i
+            )
+
+    def consultas_historial(self):
+        from unittest import mock
+        from django.db import connection
+        from django.http import HttpResponse
+        from django.test.utils import CaptureQueriesContext
+
+        with mock.patch(
+            "core.views_app.render", return_value=HttpResponse()
+        ) as render, CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("core:analisis_dominio"))
+        return len(ctx.captured_queries), render.call_args[0][2]
+
+    def test_consultas_constantes_y_paginacion_en_bd(self):
+        self.crear_busquedas(3)
+        consultas_pocas, _ = self.consultas_historial()
+        self.crear_busquedas(30)
+        consultas_muchas, contexto = self.consultas_historial()
+        self.assertEqual(consultas_pocas, consultas_muchas)
+        self.assertEqual(len(contexto["dominios_tabla"]), 20)
+        self.assertEqual(contexto["page_obj"].paginator.count, 33)
+        fila = contexto["dominios_tabla"][0]
+        self.assertTrue(fila["puede_detener"])
+        self.assertEqual(fila["usuario"], "hist")
+
+
+class VerificarCrawlingActivoTest(TestCase):
+    def test_es_de_solo_lectura(self):
+        import json
+        from django.utils import timezone
+        from core.models import BusquedaDominio, CrawlingProgress
+
+        busqueda = BusquedaDominio.objects.create(dominio="colgado.com")
+        CrawlingProgress.objects.create(
+            progress_key="colgado",
+            dominio="colgado.com",
+            busqueda_id=busqueda.id,
+            heartbeat=timezone.now() - timezone.timedelta(hours=1),
+        )
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("core:verificar_crawling_activo"))
+        self.assertEqual(json.loads(response.content), {"active": False})
+        self.assertFalse(CrawlingProgress.objects.get(progress_key="colgado").is_done)
+        self.assertIsNone(BusquedaDominio.objects.get(id=busqueda.id).fecha_fin)
+
+        CrawlingProgress.objects.create(progress_key="vivo", dominio="vivo.com")
+        response = self.client.get(reverse("core:verificar_crawling_activo"))
+        self.assertEqual(json.loads(response.content)["progress_key"], "vivo")
+
+
+@override_settings(CRAWL_PROGRESS_BACKEND="memory")
+class StreamProgresoTest(TestCase):
+    async def test_stream_sse_desde_last_event_id(self):
+        from core.utils.progress_store import get_progress_store
+
+        get_progress_store().set(
+            "sse", {"count": 2, "urls": ["u1", "u2"], "done": True, "last": None}
+        )
+        url = reverse("core:stream_progreso_crawling")
+        response = await self.async_client.get(
+            url, {"progress_key": "sse"}, headers={"Last-Event-ID": "1"}
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        contenido = b"".join([e async for e in response.streaming_content]).decode()
+        self.assertIn('"desde": 1, "urls": ["u2"]', contenido)
+        self.assertIn("event: fin", contenido)
+        get_progress_store().delete("sse")
+
+        response = await self.async_client.get(url, {"progress_key": "sse"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_stream_no_se_sirve_bajo_wsgi(self):
+        from core.utils.progress_store import get_progress_store
+
+        get_progress_store().set("sse", {"count": 0, "done": False})
+        response = self.client.get(
+            reverse("core:stream_progreso_crawling"), {"progress_key": "sse"}
+        )
+        self.assertEqual(response.status_code, 204)
+        get_progress_store().delete("sse")
+
+    def test_progreso_solo_devuelve_urls_nuevas(self):
+        import json
+        from core.models import BusquedaDominio, CrawlingProgress
+        from core.utils.progress_store import get_progress_store
+
+        get_progress_store().set("delta", {"count": 3, "urls": ["u1", "u2", "u3"]})
+        datos = json.loads(
+            self.client.get(
+                reverse("core:progreso_crawling_ajax"),
+                {"progress_key": "delta", "since": 2},
+            ).content
+        )
+        self.assertEqual((datos["urls"], datos["count"], datos["next"]), (["u3"], 3, 3))
+        get_progress_store().delete("delta")
+
+        busqueda = BusquedaDominio.objects.create(dominio="delta.com")
+        busqueda.guardar_urls(["https://delta.com/1", "https://delta.com/2"])
+        CrawlingProgress.objects.create(
+            progress_key="delta", dominio="delta.com", busqueda_id=busqueda.id, count=2
+        )
+        datos = json.loads(
+            self.client.get(
+                reverse("core:verificar_crawling_activo"), {"since": 1}
+            ).content
+        )
+        self.assertEqual(datos["urls"], ["https://delta.com/2"])
+        self.assertEqual((datos["count"], datos["since"], datos["next"]), (2, 1, 2))
+
+
+class UrlsGuardadasTest(TestCase):
+    def test_url_agregada_se_guarda_como_discovered_url(self):
+        from unittest import mock
+        from django.http import HttpResponse
+        from core.models import BusquedaDominio
+
+        User.objects.create_user("guarda", "g@example.com", "pass1234")
+        self.client.login(username="guarda", password="pass1234")  # nosec
+        with mock.patch("core.views_app.render", return_value=HttpResponse()):
+            self.client.post(
+                reverse("core:urls_guardadas"),
+                {"agregar_url": "1", "nueva_url": "www.ejemplo.com/pagina"},
+            )
+        busqueda = BusquedaDominio.objects.get(dominio="ejemplo.com")
+        self.assertEqual(busqueda.url_count, 1)
+        self.assertEqual(busqueda.get_urls(), ["https://ejemplo.com/pagina"])
@@ -22,6 +22,8 @@ from .views_app import (
     iniciar_crawling_ajax,
     iniciar_crawling_multiple_ajax,
     progreso_crawling_ajax,
+    stream_progreso_crawling,
+    estado_scheduler_ajax,
     verificar_crawling_activo,
     listar_crawlings_activos_ajax,
     detener_crawling_ajax,
@@ -84,6 +86,12 @@ urlpatterns = [
         name="iniciar_crawling_multiple_ajax",
     ),
     path("crawling/progreso/", progreso_crawling_ajax, name="progreso_crawling_ajax"),
+    path(
+        "crawling/progreso/stream/",
+        stream_progreso_crawling,
+        name="stream_progreso_crawling",
+    ),
+    path("crawling/scheduler/", estado_scheduler_ajax, name="estado_scheduler_ajax"),
     path(
         "crawling/activo/", verificar_crawling_activo, name="verificar_crawling_activo"
     ),
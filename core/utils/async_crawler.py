@@ -0,0 +1,456 @@
+"""
+Motor de crawling asíncrono basado en httpx.AsyncClient.
+
+Reemplaza el bucle secuencial de ``crawl_urls``: varias descargas del mismo
+dominio se ejecutan en paralelo (limitadas por ``concurrency``) manteniendo el
+contrato de resultado ``{"urls", "status", "blocked_count", "sitemap_urls"}`` y
+los estados de fallback a sitemap.
+
+Con ``huellas`` (``core.utils.page_fingerprints.HuellasDominio``) registra el
+ETag, Last-Modified y hash de cada página. En modo ``solo_cambios`` siembra la
+frontera con las URLs ya conocidas del dominio y las pide con cabeceras
+condicionales: un 304 cuenta como página sin cambios y no se descarga.
+
+``entradas_sitemap`` (``core.utils.sitemap_entries``) siembra la frontera con
+las URLs del sitemap ordenadas por su ``<priority>``; con
+``seguir_enlaces=False`` solo se visitan esas entradas (recrawl por
+``<lastmod>``) sin descubrir enlaces nuevos.
+
+Las reglas de robots.txt (``core.utils.robots``) se aplican a la frontera antes
+de pedir ninguna URL. El ritmo de peticiones lo marca un
+``core.utils.rate_limiter.LimitadorHost`` compartido por todos los workers:
+sube mientras el host responde rápido, baja ante 429/503, bloqueos o picos de
+latencia, respeta ``Retry-After`` y usa el ``Crawl-delay`` como mínimo. Además
+cada petición reserva turno en el presupuesto global del host
+(``core.utils.host_lease``) que comparten todos los procesos.
+
+Las páginas se descargan en streaming (``http_get_pagina_async``): las que no
+son HTML o pasan del tamaño máximo cuentan como URL encontrada, pero no se
+descargan enteras ni se buscan enlaces en ellas.
+"""
+
+import asyncio
+from urllib.parse import urljoin, urlparse
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .block_detection import detect_blocking
+from .frontier import CrawlFrontier
+from .host_lease import esperar_turno_host_async
+from .http_client import (
+    DescargaDescartada,
+    async_client_kwargs,
+    http_get_pagina_async,
+)
+from .link_extractor import get_link_extractor
+from .page_fingerprints import SIN_CAMBIOS
+from .rate_limiter import LimitadorHost, parse_retry_after
+from .robots import ReglasRobots, reglas_desde_respuesta
+from .url_canon import canonicalizar_url, clave_canonica, url_absoluta
+
+# Prefijos de enlaces que nunca se siguen
+ENLACES_IGNORADOS = ("#", "mailto:", "javascript:", "tel:", "ftp:")
+
+# Tamaño máximo de la cola de URLs pendientes (evita colas infinitas)
+MAX_COLA = 1000
+
+
+def normalize_domain(d):
+    return d.lower().replace("www.", "")
+
+
+class AsyncCrawler:
+    """Crawler concurrente de un único dominio"""
+
+    def __init__(
+        self,
+        base_url,
+        max_urls=None,
+        concurrency=None,
+        crawl_delay=1,
+        max_blocks=3,
+        transport=None,
+        priorizar=None,
+        on_url=None,
+        huellas=None,
+        solo_cambios=False,
+        semillas=(),
+        entradas_sitemap=(),
+        seguir_enlaces=True,
+        robots=None,
+        limitador=None,
+        latido=None,
+    ):
+        if not base_url.startswith(("http://", "https://")):
+            base_url = f"https://{base_url}"
+        base_url = canonicalizar_url(base_url)
+        self.base_url = base_url
+        self.max_urls = max_urls
+        self.concurrency = concurrency or getattr(
+            settings, "CRAWL_CONCURRENCY_PER_DOMAIN", 4
+        )
+        # ReglasRobots ya resueltas (p. ej. guardadas); si no, se descargan
+        self.robots = robots
+        # Sin limitador (tasa aprendida) se parte de un intervalo crawl_delay
+        self.limitador = limitador or LimitadorHost(
+            tasa=1 / crawl_delay if crawl_delay else None
+        )
+        self.max_blocks = max_blocks
+        self.transport = transport
+        # Callback síncrono on_url(url, detalles) tras cada URL encontrada
+        # (detalles: status_code, depth, content_type); si devuelve False el
+        # crawling se detiene (p. ej. el usuario lo canceló)
+        self.on_url = sync_to_async(on_url) if on_url else None
+        # Callback síncrono latido() llamado cada CRAWL_PROGRESS_FLUSH_MS aunque
+        # no aparezcan URLs (descargas lentas, robots, esperas del limitador);
+        # si devuelve False el crawling se detiene
+        self.latido = sync_to_async(latido) if latido else None
+        self.detenido = False
+        self.domain = urlparse(base_url).netloc or base_url
+        if priorizar is None:
+            priorizar = getattr(settings, "CRAWL_FRONTIER_PRIORIZAR", False)
+        self.huellas = huellas
+        self.solo_cambios = huellas is not None and solo_cambios
+        self.seguir_enlaces = seguir_enlaces
+        semillas = ([base_url] if seguir_enlaces else []) + list(semillas)
+        entradas_sitemap = list(entradas_sitemap)
+        if entradas_sitemap:
+            # El orden por <priority> solo existe en la cola con prioridad
+            priorizar = True
+        if self.solo_cambios:
+            # Las páginas sin cambios (304) no se descargan ni aportan enlaces:
+            # se siembran todas las URLs conocidas del dominio
+            semillas += huellas.urls_conocidas()
+        self.frontier = CrawlFrontier(
+            semillas,
+            max_size=max(MAX_COLA, len(semillas) + len(entradas_sitemap)),
+            priorizar=priorizar,
+            key=clave_canonica,
+        )
+        for entrada in entradas_sitemap:
+            self.frontier.push(
+                entrada["loc"], from_sitemap=True, prioridad=entrada["priority"]
+            )
+        self.extractor = get_link_extractor()
+        self.visitadas = 0
+        self.urls = []
+        self.blocked_count = 0
+        self.en_vuelo = 0
+        self.resultado = None
+        self.en_fallback = False
+        self.cambio = None
+
+    # --- Estado compartido entre workers ---
+
+    def limite_alcanzado(self):
+        return bool(self.max_urls) and len(self.urls) >= self.max_urls
+
+    def terminado(self):
+        if self.en_fallback or self.detenido or self.limite_alcanzado():
+            return True
+        return not self.frontier and self.en_vuelo == 0
+
+    async def siguiente_url(self):
+        """Devuelve ``(url, depth)`` pendiente o None si el crawling terminó"""
+        async with self.cambio:
+            while True:
+                if self.terminado():
+                    self.cambio.notify_all()
+                    return None
+                if self.frontier:
+                    self.visitadas += 1
+                    self.en_vuelo += 1
+                    return self.frontier.pop()
+                await self.cambio.wait()
+
+    async def url_procesada(self):
+        async with self.cambio:
+            self.en_vuelo -= 1
+            self.cambio.notify_all()
+
+    async def latir(self):
+        """Llama a ``latido`` periódicamente hasta que se cancela"""
+        intervalo = getattr(settings, "CRAWL_PROGRESS_FLUSH_MS", 1000) / 1000
+        while True:
+            await asyncio.sleep(intervalo)
+            if await self.latido() is False:
+                print(
+                    f"[CRAWL] ⏹️ DETENIDO - Se recibió señal de stop para {self.domain}"
+                )
+                async with self.cambio:
+                    self.detenido = True
+                    self.cambio.notify_all()
+                return
+
+    # --- Crawling ---
+
+    async def leer_robots(self, client):
+        """Aplica robots.txt: filtra la frontera y fija el Crawl-delay"""
+        if self.robots is None:
+            from core.views_app import get_random_headers
+
+            try:
+                await esperar_turno_host_async(self.base_url)
+                resp = await client.get(
+                    f"https://{self.domain}/robots.txt",
+                    timeout=10,
+                    headers=get_random_headers(),
+                )
+                self.robots = reglas_desde_respuesta(resp.status_code, resp.text)
+            except httpx.HTTPError:
+                self.robots = ReglasRobots()
+        delay = self.robots.crawl_delay()
+        if delay:
+            self.limitador.fijar_crawl_delay(delay)
+            print(f"[CRAWL] Delay recomendado por robots.txt: {delay}s")
+        descartadas = self.frontier.filtrar(self.robots.permitido)
+        if descartadas:
+            print(f"[CRAWL] ⚠️ robots.txt prohíbe {descartadas} URLs pendientes")
+
+    async def fallback_sitemap(self, status_ok, status_ko, message_ok, message_ko):
+        """Recurre al sitemap y fija el resultado final del crawling"""
+        from core.views_app import try_sitemap_fallback
+
+        if self.en_fallback:
+            return
+        self.en_fallback = True
+        sitemap_urls = await asyncio.to_thread(try_sitemap_fallback, self.domain)
+        if sitemap_urls and self.robots is not None:
+            sitemap_urls = [url for url in sitemap_urls if self.robots.permitido(url)]
+        if sitemap_urls:
+            print(f"[CRAWL] ✅ Sitemap encontrado con {len(sitemap_urls)} URLs")
+            restantes = (
+                self.max_urls - len(self.urls) if self.max_urls else len(sitemap_urls)
+            )
+            self.urls.extend(sitemap_urls[:restantes])
+        else:
+            print("[CRAWL] ❌ No se encontró sitemap accesible")
+        self.resultado = {
+            "urls": self.urls,
+            "status": status_ok if sitemap_urls else status_ko,
+            "message": (
+                message_ok.format(n=len(sitemap_urls)) if sitemap_urls else message_ko
+            ),
+            "blocked_count": self.blocked_count,
+            "sitemap_urls": len(sitemap_urls) if sitemap_urls else 0,
+        }
+
+    def extraer_enlaces(self, url, depth, content):
+        pagina = self.extractor.extraer(content)
+        base = urljoin(url, pagina["base_href"]) if pagina["base_href"] else url
+        if pagina["canonical"]:
+            # La versión canónica de esta página ya está cubierta
+            self.frontier.mark_seen(url_absoluta(base, pagina["canonical"]))
+        links_found = 0
+        for href in pagina["links"] + list(pagina["hreflang"].values()):
+            if href.startswith(ENLACES_IGNORADOS):
+                continue
+            # Se descarga la URL tal cual; el frontier deduplica por clave_canonica
+            abs_url = url_absoluta(base, href)
+            parsed = urlparse(abs_url)
+            if parsed.netloc and normalize_domain(parsed.netloc) != normalize_domain(
+                self.domain
+            ):
+                continue
+            if abs_url.startswith("http") and self.frontier.push(abs_url, depth + 1):
+                links_found += 1
+        return links_found
+
+    async def procesar(self, client, url, depth):
+        from core.views_app import get_random_headers
+
+        await self.limitador.adquirir()
+        await esperar_turno_host_async(url)
+        if self.en_fallback or self.detenido:
+            return
+
+        headers = get_random_headers()
+        if self.solo_cambios:
+            headers.update(self.huellas.cabeceras_condicionales(url))
+        loop = asyncio.get_running_loop()
+        inicio = loop.time()
+        try:
+            resp = await http_get_pagina_async(client, url, timeout=15, headers=headers)
+        except DescargaDescartada as e:
+            # No es HTML o es demasiado grande: se registra sin descargarla
+            resp = e.response
+            self.limitador.registrar(resp.status_code, loop.time() - inicio)
+            print(f"[CRAWL] ⏭️ {url} descartada: {e}")
+            if self.en_fallback or self.detenido or self.limite_alcanzado():
+                return
+            if resp.status_code == 200:
+                await self.agregar_url(url, depth, resp)
+            return
+        except httpx.TimeoutException:
+            self.limitador.registrar(0, loop.time() - inicio)
+            print(f"[CRAWL] ⏰ Timeout en {url}")
+            self.blocked_count += 1
+            if self.blocked_count >= self.max_blocks and len(self.urls) == 0:
+                print("[CRAWL] 🚨 Demasiados timeouts. Intentando sitemap...")
+                await self.fallback_sitemap(
+                    "timeout_fallback_sitemap",
+                    "timeout_no_sitemap",
+                    "Timeouts repetidos. Se usó sitemap como alternativa.",
+                    "Timeouts repetidos. Sin sitemap disponible.",
+                )
+            return
+        except httpx.TransportError:
+            self.limitador.registrar(0, loop.time() - inicio)
+            print(f"[CRAWL] 🔌 Error de conexión en {url}")
+            self.blocked_count += 1
+            if self.blocked_count >= self.max_blocks and len(self.urls) == 0:
+                print(
+                    "[CRAWL] 🚨 Demasiados errores de conexión. Intentando sitemap..."
+                )
+                await self.fallback_sitemap(
+                    "connection_error_fallback_sitemap",
+                    "connection_error_no_sitemap",
+                    "Errores de conexión repetidos. Se usó sitemap como alternativa.",
+                    "Errores de conexión repetidos. Sin sitemap disponible.",
+                )
+            return
+
+        print(f"[CRAWL] {url} -> {resp.status_code}")
+        latencia = loop.time() - inicio
+        retry_after = parse_retry_after(resp.headers.get("retry-after"))
+        if self.en_fallback or self.detenido:
+            return
+        if resp.status_code == 304 and self.solo_cambios:
+            self.limitador.registrar(304, latencia)
+            # Sin cambios desde la última visita: se conserva sin descargarla
+            if self.limite_alcanzado():
+                return
+            self.huellas.registrar(url, 304, resp.headers)
+            await self.agregar_url(url, depth, resp)
+            return
+
+        is_blocked, block_reason = detect_blocking(resp, url)
+        self.limitador.registrar(
+            resp.status_code, latencia, retry_after, bloqueado=is_blocked
+        )
+        if is_blocked:
+            self.blocked_count += 1
+            print(f"[CRAWL] ⚠️ BLOQUEO DETECTADO: {block_reason}")
+            immediate_fallback = resp.status_code in [403, 429]
+            should_fallback = (self.blocked_count >= self.max_blocks) or (
+                immediate_fallback and len(self.urls) == 0
+            )
+            if should_fallback:
+                await self.fallback_sitemap(
+                    "blocked_fallback_sitemap",
+                    "blocked_no_sitemap",
+                    "Acceso denegado por protección anti-bot. "
+                    "Se usó sitemap como alternativa ({n} URLs).",
+                    "Crawling bloqueado y no hay sitemap disponible. "
+                    f"Motivo: {block_reason}",
+                )
+            return
+
+        if resp.status_code != 200:
+            print(f"[CRAWL] Status no exitoso: {resp.status_code}")
+            return
+        if self.limite_alcanzado():
+            return
+
+        if self.huellas is not None:
+            estado = self.huellas.registrar(url, 200, resp.headers, resp.content)
+            if estado == SIN_CAMBIOS:
+                print(f"[CRAWL] Sin cambios (mismo contenido): {url}")
+        if not await self.agregar_url(url, depth, resp):
+            return
+        if not self.seguir_enlaces:
+            return
+
+        links_found = self.extraer_enlaces(url, depth, resp.content)
+        print(f"[CRAWL] Enlaces internos encontrados: {links_found}")
+
+    async def agregar_url(self, url, depth, resp):
+        """Agrega la URL al resultado. Devuelve False si hay que parar aquí"""
+        self.urls.append(url)
+        print(f"[CRAWL] ✅ URL agregada. Total: {len(self.urls)}")
+        detalles = {
+            "status_code": resp.status_code,
+            "depth": depth,
+            "content_type": resp.headers.get("content-type", ""),
+        }
+        if self.on_url and await self.on_url(url, detalles) is False:
+            print(f"[CRAWL] ⏹️ DETENIDO - Se recibió señal de stop para {self.domain}")
+            self.detenido = True
+            return False
+        if self.limite_alcanzado():
+            print(f"[CRAWL] 🎯 Límite alcanzado: {self.max_urls} URLs")
+            return False
+        return True
+
+    async def worker(self, client, numero):
+        while True:
+            siguiente = await self.siguiente_url()
+            if siguiente is None:
+                return
+            url, depth = siguiente
+            try:
+                await self.procesar(client, url, depth)
+            except Exception as e:
+                print(f"[CRAWL] ❌ Error en {url}: {str(e)[:100]}")
+            finally:
+                await self.url_procesada()
+
+    async def run(self):
+        self.cambio = asyncio.Condition()
+        print(f"[CRAWL] Iniciando crawling concurrente de {self.base_url}")
+        print(f'[CRAWL] Límite de URLs: {self.max_urls or "Sin límite"}')
+        print(f"[CRAWL] Descargas simultáneas: {self.concurrency}")
+
+        latidos = asyncio.create_task(self.latir()) if self.latido else None
+        try:
+            async with httpx.AsyncClient(
+                follow_redirects=True,
+                transport=self.transport,
+                **async_client_kwargs(),
+            ) as client:
+                await self.leer_robots(client)
+                await asyncio.gather(
+                    *(self.worker(client, i) for i in range(self.concurrency))
+                )
+        finally:
+            if latidos:
+                latidos.cancel()
+
+        if self.resultado is not None:
+            return self.resultado
+        cambios = dict(self.huellas.totales) if self.huellas is not None else None
+
+        print(
+            f"[CRAWL] 🏁 Finalizado: {len(self.urls)} URLs, {self.blocked_count} bloqueos"
+        )
+        if self.detenido:
+            return {
+                "urls": self.urls,
+                "status": "stopped",
+                "message": f"Crawling detenido. {len(self.urls)} URLs encontradas.",
+                "blocked_count": self.blocked_count,
+                "sitemap_urls": 0,
+                "total_visited": self.visitadas,
+                "robots_bloqueadas": self.frontier.descartadas,
+                "cambios": cambios,
+            }
+        return {
+            "urls": self.urls,
+            "status": "success",
+            "message": f"Crawling completado exitosamente. {len(self.urls)} URLs encontradas.",
+            "blocked_count": self.blocked_count,
+            "sitemap_urls": 0,
+            "total_visited": self.visitadas,
+            "robots_bloqueadas": self.frontier.descartadas,
+            "cambios": cambios,
+        }
+
+
+async def crawl_urls_async(base_url, max_urls=None, concurrency=None, **kwargs):
+    """Crawlea un dominio con ``concurrency`` descargas simultáneas"""
+    crawler = AsyncCrawler(
+        base_url, max_urls=max_urls, concurrency=concurrency, **kwargs
+    )
+    return await crawler.run()
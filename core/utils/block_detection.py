@@ -0,0 +1,124 @@
+"""
+Detección de bloqueos anti-bot en las respuestas del crawler.
+
+``detect_blocking`` pasaba a minúsculas el cuerpo completo de cada respuesta
+y buscaba diez palabras sueltas: cualquier página que mencionara "robot" o
+"blocked" contaba como bloqueo, disparaba el fallback a sitemap y cortaba el
+crawling. Ahora cada respuesta suma puntos por señales independientes:
+
+- Estado HTTP: 403 y 429 bastan por sí solos; 503 necesita otra señal
+  (puede ser un mantenimiento).
+- Cabeceras: ``Retry-After``, ``cf-mitigated: challenge``, y el ``Server``
+  o ``cf-ray`` de un WAF conocido cuando acompañan a un error.
+- Cuerpo: solo los primeros ``CRAWL_BLOQUEO_MAX_KB`` KB, sin decodificar, con
+  una única regex compilada sobre esa ventana en minúsculas. Las marcas
+  propias de las páginas de desafío (Cloudflare, DataDome, Incapsula,
+  PerimeterX) puntúan alto; las frases genéricas ("access denied", "too many
+  requests"...) solo cuentan en páginas de error o tan cortas que caben
+  enteras en la ventana, como las de desafío.
+
+Con ``CRAWL_BLOQUEO_UMBRAL`` puntos la respuesta se considera bloqueada.
+``scripts/benchmark_block_detection.py`` mide el coste sobre el corpus de
+``core/fixtures/bloqueos/``.
+"""
+
+import re
+
+from django.conf import settings
+
+# Marcas de páginas de desafío: bastan por sí solas
+MARCAS_DESAFIO = {
+    b"_cf_chl_opt": "desafío de Cloudflare",
+    b"cf-browser-verification": "desafío de Cloudflare",
+    b"captcha-delivery.com": "captcha de DataDome",
+    b"_incapsula_resource": "bloqueo de Incapsula",
+    b"px-captcha": "captcha de PerimeterX",
+}
+
+# Frases de bloqueo: solo cuentan en páginas de error o muy cortas
+FRASES_BLOQUEO = {
+    b"access denied": "acceso denegado",
+    b"attention required": "acceso denegado",
+    b"request blocked": "petición bloqueada",
+    b"you have been blocked": "petición bloqueada",
+    b"are you a robot": "verificación humana",
+    b"verify you are human": "verificación humana",
+    b"just a moment...": "verificación humana",
+    b"unusual traffic": "tráfico inusual",
+    b"bot detected": "bot detectado",
+    b"too many requests": "límite de peticiones",
+    b"rate limit exceeded": "límite de peticiones",
+}
+
+# Un captcha suelto puede ser el formulario de contacto
+CAPTCHA = b"captcha"
+
+PESO_MARCA = 3
+PESO_FRASE = 2
+PESO_CAPTCHA = 1
+
+PESO_ESTADO = {403: 3, 429: 3, 503: 2}
+
+# Servidores de WAF/CDN que responden con páginas de desafío
+SERVIDORES_WAF = (b"cloudflare", b"akamaighost", b"ddos-guard", b"sucuri")
+
+# Las marcas más largas primero: a igual posición gana la primera alternativa
+PATRON = re.compile(
+    b"|".join(
+        re.escape(texto)
+        for texto in sorted(
+            [*MARCAS_DESAFIO, *FRASES_BLOQUEO, CAPTCHA], key=len, reverse=True
+        )
+    )
+)
+
+# Cuerpo mínimo de una página 200 real
+CUERPO_MINIMO = 100
+
+
+def _max_bytes():
+    return getattr(settings, "CRAWL_BLOQUEO_MAX_KB", 32) * 1024
+
+
+def puntuar_bloqueo(status_code, headers, contenido):
+    """Puntos de bloqueo de una respuesta y los motivos que suman"""
+    senales = {}
+
+    peso = PESO_ESTADO.get(status_code)
+    if peso:
+        senales[f"HTTP {status_code}"] = peso
+    if headers.get("retry-after"):
+        senales["Retry-After"] = 1
+    if headers.get("cf-mitigated", "").lower() == "challenge":
+        senales["desafío de Cloudflare"] = PESO_MARCA
+    error = status_code >= 400
+    if error:
+        servidor = headers.get("server", "").lower().encode()
+        if headers.get("cf-ray") or any(waf in servidor for waf in SERVIDORES_WAF):
+            senales["WAF/CDN"] = 1
+
+    max_bytes = _max_bytes()
+    ventana = contenido[:max_bytes].lower()
+    # Las páginas de desafío son cortas: caben enteras en la ventana
+    frases = error or len(contenido) <= max_bytes
+    for encontrado in set(PATRON.findall(ventana)):
+        if encontrado in MARCAS_DESAFIO:
+            senales[MARCAS_DESAFIO[encontrado]] = PESO_MARCA
+        elif encontrado == CAPTCHA:
+            senales.setdefault("captcha", PESO_CAPTCHA)
+        elif frases:
+            senales.setdefault(FRASES_BLOQUEO[encontrado], PESO_FRASE)
+
+    if status_code == 200 and len(contenido) < CUERPO_MINIMO:
+        senales["respuesta sospechosamente pequeña"] = 1
+    return sum(senales.values()), list(senales)
+
+
+def detect_blocking(response, url=None):
+    """Detecta si una respuesta indica bloqueo anti-bot: ``(bool, motivo)``"""
+    puntos, motivos = puntuar_bloqueo(
+        response.status_code, response.headers, response.content or b""
+    )
+    if puntos < getattr(settings, "CRAWL_BLOQUEO_UMBRAL", 3):
+        return False, ""
+    return True, f"Bloqueo anti-bot ({puntos} puntos): {', '.join(motivos)}"
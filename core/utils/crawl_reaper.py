@@ -0,0 +1,125 @@
+"""
+Reconciliación periódica de los crawlings.
+
+Antes ``verificar_crawling_activo`` (que la UI consulta cada pocos segundos)
+limpiaba procesos colgados y sincronizaba ``CrawlingProgress`` con
+``BusquedaDominio`` en cada llamada, recorriendo fila a fila todos los
+crawlings de la historia. Ahora ese trabajo lo hace ``reconciliar_crawlings``
+desde Celery beat (``tarea_reconciliar_crawlings``) o con el comando
+``manage.py reconciliar_crawlings``, siempre con ``update()`` masivos:
+
+1. Progresos sin latido (``heartbeat``) desde hace más de
+   ``CRAWL_HEARTBEAT_TIMEOUT`` segundos: se marcan como terminados y su
+   búsqueda como abandonada.
+2. Progresos terminados (sin latido reciente) cuya búsqueda sigue abierta:
+   la búsqueda se cierra como detenida.
+3. Búsquedas cerradas con progreso aún abierto: el progreso se cierra.
+4. Documentos del store de progreso sin actividad desde hace
+   ``CRAWL_PROGRESS_RETENCION`` segundos: se borran.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import BusquedaDominio, CrawlingProgress
+from core.utils.crawl_status import (
+    CLASIFICACION_POR_STATUS,
+    STATUS_ABANDONADO,
+    STATUS_DETENIDO,
+)
+from core.utils.progress_store import get_progress_store
+
+
+def heartbeat_limite(ahora=None):
+    """Fecha a partir de la cual un progreso sin latido se considera colgado"""
+    segundos = getattr(settings, "CRAWL_HEARTBEAT_TIMEOUT", 300)
+    return (ahora or timezone.now()) - timezone.timedelta(seconds=segundos)
+
+
+def _cerrar_busquedas(ids, crawl_status, ahora):
+    """Cierra las búsquedas abiertas de ``ids`` con su duración (un solo
+    ``UPDATE`` masivo tras leer las fechas de inicio)"""
+    estado_detalle, estado_clase = CLASIFICACION_POR_STATUS[crawl_status]
+    with transaction.atomic():
+        busquedas = list(
+            BusquedaDominio.objects.select_for_update()
+            .filter(id__in=ids, fecha_fin__isnull=True)
+            .only("id", "fecha")
+        )
+        for busqueda in busquedas:
+            busqueda.fecha_fin = ahora
+            busqueda.crawl_status = crawl_status
+            busqueda.estado_detalle = estado_detalle
+            busqueda.estado_clase = estado_clase
+            busqueda.duracion_segundos = max(
+                int((ahora - busqueda.fecha).total_seconds()), 0
+            )
+        BusquedaDominio.objects.bulk_update(
+            busquedas,
+            [
+                "fecha_fin",
+                "crawl_status",
+                "estado_detalle",
+                "estado_clase",
+                "duracion_segundos",
+            ],
+            batch_size=500,
+        )
+    return len(busquedas)
+
+
+def reconciliar_crawlings(ahora=None):
+    """Cierra progresos colgados y sincroniza progresos con búsquedas"""
+    ahora = ahora or timezone.now()
+
+    # 1. Progresos colgados (sin latido)
+    colgados = CrawlingProgress.objects.filter(
+        is_done=False, heartbeat__lt=heartbeat_limite(ahora)
+    )
+    claves_colgadas = list(colgados.values_list("progress_key", "busqueda_id"))
+    progresos_colgados = colgados.update(is_done=True)
+    busquedas_abandonadas = _cerrar_busquedas(
+        [busqueda_id for _, busqueda_id in claves_colgadas if busqueda_id],
+        STATUS_ABANDONADO,
+        ahora,
+    )
+    store = get_progress_store()
+    for progress_key, _ in claves_colgadas:
+        store.update(progress_key, done=True)
+
+    # 2. Progresos terminados con la búsqueda aún abierta. Con latido reciente
+    # el crawler acaba de volcar el final y está a punto de cerrarla él mismo
+    # con su status real: no se da por detenida
+    busquedas_detenidas = _cerrar_busquedas(
+        CrawlingProgress.objects.filter(
+            is_done=True,
+            busqueda_id__isnull=False,
+            heartbeat__lt=heartbeat_limite(ahora),
+        ).values("busqueda_id"),
+        STATUS_DETENIDO,
+        ahora,
+    )
+
+    # 3. Búsquedas cerradas con el progreso aún abierto
+    progresos_cerrados = CrawlingProgress.objects.filter(
+        is_done=False,
+        busqueda_id__in=BusquedaDominio.objects.filter(fecha_fin__isnull=False).values(
+            "id"
+        ),
+    ).update(is_done=True)
+
+    # 4. Progresos del store ya sin lectores
+    retencion = getattr(settings, "CRAWL_PROGRESS_RETENCION", 3600)
+    progresos_purgados = store.purgar(ahora - timezone.timedelta(seconds=retencion))
+
+    resumen = {
+        "progresos_colgados": progresos_colgados,
+        "busquedas_abandonadas": busquedas_abandonadas,
+        "busquedas_detenidas": busquedas_detenidas,
+        "progresos_cerrados": progresos_cerrados,
+        "progresos_purgados": progresos_purgados,
+    }
+    if any(resumen.values()):
+        print(f"[REAPER] {resumen}")
+    return resumen
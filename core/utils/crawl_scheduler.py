@@ -0,0 +1,187 @@
+"""
+Planificador de crawlings en segundo plano con control de admisión.
+
+Antes cada petición AJAX lanzaba su propio ``threading.Thread`` sin ningún
+límite: una ráfaga de usuarios agotaba la memoria y los sockets del proceso
+web. Ahora todos los crawlings pasan por un único pool acotado:
+
+- ``CRAWL_MAX_WORKERS``: crawlings ejecutándose a la vez en el proceso.
+- ``CRAWL_MAX_QUEUE``: trabajos esperando turno; por encima se rechaza.
+- ``CRAWL_MAX_POR_USUARIO``: trabajos (en cola o en curso) por usuario.
+- ``CRAWL_MAX_POR_DOMINIO``: trabajos simultáneos sobre un mismo dominio.
+
+Cuando un trabajo no se admite se lanza ``CrawlRechazado`` con el motivo y
+los segundos sugeridos para reintentar (la vista responde HTTP 429).
+
+Los lotes de dominios (``enviar_lote``) se admiten de una vez, pero cada
+dominio es un trabajo del pool: cuentan contra ``CRAWL_MAX_WORKERS``, la cola
+y las cuotas por usuario y por dominio como cualquier otro crawling.
+
+Todos los límites son por proceso: el estado vive en memoria, así que con N
+workers de gunicorn los límites efectivos son N veces los configurados, y los
+trabajos en cola se pierden si el proceso se reinicia. Para límites globales
+y trabajos persistentes hay que usar la ruta de Celery
+(``encolar_crawl_dominio``), cuya concurrencia fija el propio worker.
+"""
+
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+class CrawlRechazado(Exception):
+    """El planificador no admite el trabajo en este momento"""
+
+    def __init__(self, motivo, retry_after):
+        super().__init__(motivo)
+        self.motivo = motivo
+        self.retry_after = retry_after
+
+
+class CrawlScheduler:
+    """Pool acotado de crawlings con cuotas por usuario y por dominio"""
+
+    def __init__(
+        self,
+        max_workers=None,
+        max_queue=None,
+        max_por_usuario=None,
+        max_por_dominio=None,
+    ):
+        self.max_workers = max_workers or _config("CRAWL_MAX_WORKERS", 4)
+        self.max_queue = (
+            max_queue if max_queue is not None else _config("CRAWL_MAX_QUEUE", 50)
+        )
+        self.max_por_usuario = max_por_usuario or _config("CRAWL_MAX_POR_USUARIO", 2)
+        self.max_por_dominio = max_por_dominio or _config("CRAWL_MAX_POR_DOMINIO", 1)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="crawl"
+        )
+        self._lock = threading.Lock()
+        self._trabajos = {}
+        self._por_usuario = Counter()
+        self._por_dominio = Counter()
+
+    def _en_cola(self):
+        return sum(1 for t in self._trabajos.values() if t["estado"] == "en_cola")
+
+    def _en_curso(self):
+        return sum(1 for t in self._trabajos.values() if t["estado"] == "en_curso")
+
+    def _retry_after(self):
+        """Estimación de espera: un turno por cada tanda de trabajos en cola"""
+        base = _config("CRAWL_RETRY_AFTER", 30)
+        tandas = self._en_cola() // self.max_workers + 1
+        return base * tandas
+
+    def _verificar_admision(self, usuario, dominios, nuevos=1):
+        if len(self._trabajos) + nuevos > self.max_workers + self.max_queue:
+            raise CrawlRechazado(
+                "Demasiados crawlings en cola, inténtalo más tarde",
+                self._retry_after(),
+            )
+        if self._por_usuario[usuario] >= self.max_por_usuario:
+            raise CrawlRechazado(
+                f"Máximo {self.max_por_usuario} crawlings simultáneos por usuario",
+                self._retry_after(),
+            )
+        for dominio in dominios:
+            if self._por_dominio[dominio] >= self.max_por_dominio:
+                raise CrawlRechazado(
+                    f"Ya hay un crawling en curso para {dominio}",
+                    self._retry_after(),
+                )
+
+    def enviar(self, fn, usuario, dominios):
+        """Encola ``fn()`` si se admite. Devuelve el id del trabajo.
+
+        ``usuario`` es cualquier clave hashable (id o IP) y ``dominios`` la
+        lista de dominios que va a crawlear el trabajo.
+        """
+        dominios = [dominios] if isinstance(dominios, str) else list(dominios)
+        with self._lock:
+            self._verificar_admision(usuario, dominios)
+            trabajo_id = self._registrar(usuario, dominios)
+        self._executor.submit(self._ejecutar, trabajo_id, fn)
+        return trabajo_id
+
+    def enviar_lote(self, trabajos, usuario):
+        """Encola un lote de ``(fn, dominio)`` si se admite entero.
+
+        El lote pasa la cuota por usuario como un único envío, pero cada
+        dominio ocupa su propio puesto en el pool y en la cola: el usuario no
+        puede lanzar más crawlings hasta que el lote baje de su cuota.
+        Devuelve los ids de los trabajos.
+        """
+        trabajos = list(trabajos)
+        with self._lock:
+            self._verificar_admision(
+                usuario, [dominio for _, dominio in trabajos], nuevos=len(trabajos)
+            )
+            ids = [self._registrar(usuario, [dominio]) for _, dominio in trabajos]
+        for trabajo_id, (fn, _) in zip(ids, trabajos):
+            self._executor.submit(self._ejecutar, trabajo_id, fn)
+        return ids
+
+    def _registrar(self, usuario, dominios):
+        trabajo_id = uuid.uuid4().hex
+        self._trabajos[trabajo_id] = {
+            "usuario": usuario,
+            "dominios": dominios,
+            "estado": "en_cola",
+            "encolado": time.time(),
+        }
+        self._por_usuario[usuario] += 1
+        self._por_dominio.update(dominios)
+        return trabajo_id
+
+    def _ejecutar(self, trabajo_id, fn):
+        with self._lock:
+            self._trabajos[trabajo_id]["estado"] = "en_curso"
+        try:
+            fn()
+        except Exception as e:
+            print(f"[SCHEDULER] Error en trabajo {trabajo_id}: {e}")
+        finally:
+            # Los hilos del pool se reutilizan: liberar la conexión a la BD
+            close_old_connections()
+            with self._lock:
+                trabajo = self._trabajos.pop(trabajo_id)
+                self._por_usuario[trabajo["usuario"]] -= 1
+                self._por_usuario += Counter()
+                self._por_dominio.subtract(trabajo["dominios"])
+                self._por_dominio += Counter()
+
+    def estadisticas(self):
+        """Longitud de la cola y trabajos en curso"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "en_curso": self._en_curso(),
+                "en_cola": self._en_cola(),
+                "por_dominio": dict(self._por_dominio),
+                "usuarios_activos": len(self._por_usuario),
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Planificador compartido del proceso (se crea al primer uso)"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = CrawlScheduler()
+        return _scheduler
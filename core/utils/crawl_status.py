@@ -0,0 +1,86 @@
+"""
+Clasificación del resultado final de un crawling.
+
+Se calcula una sola vez, al terminar el crawling, y se guarda en
+``BusquedaDominio`` (``crawl_status``, ``blocked_count``,
+``duracion_segundos``, ``estado_detalle`` y ``estado_clase``) para que el
+historial no tenga que recalcularla en cada render.
+
+Cuando se conoce el status devuelto por ``crawl_urls`` la clasificación sale
+directamente de él. Las búsquedas antiguas (sin status) se clasifican con las
+heurísticas de duración y número de URLs que usaba la vista.
+"""
+
+# Status adicionales a los devueltos por crawl_urls
+STATUS_DETENIDO = "stopped"
+STATUS_ERROR = "error"
+STATUS_ABANDONADO = "abandoned"
+
+CLASIFICACION_POR_STATUS = {
+    "blocked_fallback_sitemap": (
+        "🛡️ Bloqueo anti-bot, URLs obtenidas del sitemap",
+        "warning",
+    ),
+    "timeout_fallback_sitemap": ("⏰ Timeouts, URLs obtenidas del sitemap", "warning"),
+    "connection_error_fallback_sitemap": (
+        "🌐 Errores de conexión, URLs obtenidas del sitemap",
+        "warning",
+    ),
+    "blocked_no_sitemap": ("🛡️ Dominio completamente protegido", "danger"),
+    "timeout_no_sitemap": ("⏰ Timeout o problemas de conexión", "warning"),
+    "connection_error_no_sitemap": (
+        "🌐 Error de conexión o dominio inaccesible",
+        "warning",
+    ),
+    STATUS_DETENIDO: ("⏹️ Detenido por el usuario", "secondary"),
+    STATUS_ERROR: ("❌ Error durante el crawling", "danger"),
+    STATUS_ABANDONADO: ("⚠️ Proceso interrumpido", "warning"),
+}
+
+DOMINIOS_PROTEGIDOS = ["udemy.com", "netflix.com", "hulu.com", "disney.com"]
+
+
+def formatear_duracion(segundos):
+    """Duración ``HH:MM:SS`` (``-`` si es negativa, vacía si no se conoce)"""
+    if segundos is None:
+        return ""
+    if segundos < 0:
+        return "-"
+    return f"{segundos // 3600:02}:{(segundos % 3600) // 60:02}:{segundos % 60:02}"
+
+
+def clasificar_por_heuristica(dominio, total_urls, total_seconds):
+    """Clasificación de búsquedas antiguas, sin status de crawl_urls"""
+    dominio = dominio.lower().removeprefix("www.")
+    if total_urls == 0 and total_seconds <= 2:
+        # Probablemente bloqueado (finaliza muy rápido con 0 URLs)
+        if dominio in DOMINIOS_PROTEGIDOS:
+            return "🛡️ Dominio completamente protegido", "danger"
+        return "⚠️ Posible bloqueo o error", "warning"
+    if total_urls == 0 and total_seconds > 15:
+        return "⏰ Timeout o problemas de conexión", "warning"
+    if total_urls == 0 and 3 <= total_seconds <= 15:
+        # Casos como jw.org: intenta crawling pero no encuentra sitemap
+        if "jw.org" in dominio:
+            return "🔒 Restricciones de acceso o geobloqueo", "warning"
+        if any(keyword in dominio for keyword in ["redlink", "hb."]):
+            return "🌐 Error de conexión o dominio inaccesible", "warning"
+        return "🔍 Sin sitemap encontrado", "info"
+    if total_urls > 0 and total_seconds <= 5:
+        return "✅ Éxito rápido (sitemap)", "success"
+    if total_urls > 0:
+        return "✅ Crawling exitoso", "success"
+    return "ℹ️ Finalizado", "info"
+
+
+def clasificar_crawl(dominio, crawl_status, total_urls, total_seconds, blocked_count=0):
+    """Devuelve ``(estado_detalle, estado_clase)`` del resultado de un crawling"""
+    if crawl_status in CLASIFICACION_POR_STATUS:
+        return CLASIFICACION_POR_STATUS[crawl_status]
+    if crawl_status == "success":
+        if total_urls == 0:
+            return "ℹ️ Sin URLs encontradas", "info"
+        if blocked_count:
+            return f"⚠️ Crawling con {blocked_count} bloqueos", "warning"
+        return "✅ Crawling exitoso", "success"
+    return clasificar_por_heuristica(dominio, total_urls, total_seconds or 0)
@@ -0,0 +1,108 @@
+"""
+Frontera de crawling: cola de URLs pendientes con deduplicación en O(1).
+
+Sustituye a la combinación ``list.pop(0)`` + ``url not in to_visit`` de los
+crawlers, que era cuadrática en sitios con muchos enlaces internos.
+"""
+
+import heapq
+import itertools
+from collections import deque
+
+# Prioridad por defecto de una URL según el protocolo de sitemaps
+PRIORIDAD_DEFECTO = 0.5
+
+
+class CrawlFrontier:
+    """Cola de URLs pendientes con conjunto de URLs ya vistas.
+
+    En modo FIFO (por defecto) encolar, desencolar y comprobar pertenencia son
+    O(1). Con ``priorizar=True`` se atienden primero las URLs menos profundas y,
+    a igual profundidad, las que provienen del sitemap y, entre estas, las de
+    mayor ``<priority>`` declarada (O(log n) por operación).
+
+    ``key`` permite deduplicar por una clave derivada de la URL (por ejemplo
+    ``clave_canonica``) en lugar de por la URL literal.
+
+    ``filtrar`` instala un predicado (p. ej. las reglas de robots.txt): las
+    URLs que no lo cumplen se descartan al encolarlas y nunca se piden.
+    """
+
+    def __init__(self, seeds=(), max_size=None, priorizar=False, key=None):
+        self.max_size = max_size
+        self.priorizar = priorizar
+        self.key = key or (lambda url: url)
+        self._seen = set()
+        self._cola = [] if priorizar else deque()
+        self._orden = itertools.count()
+        self.permitida = None
+        self.descartadas = 0
+        for url in seeds:
+            self.push(url)
+
+    def __len__(self):
+        return len(self._cola)
+
+    def __bool__(self):
+        return bool(self._cola)
+
+    def __contains__(self, url):
+        """Indica si la URL ya fue encolada alguna vez (pendiente o visitada)"""
+        return self.key(url) in self._seen
+
+    @property
+    def vistas(self):
+        return len(self._seen)
+
+    def push(self, url, depth=0, from_sitemap=False, prioridad=None):
+        """Encola la URL si no se vio antes. Devuelve True si se agregó.
+
+        ``prioridad`` es el ``<priority>`` del sitemap (0 a 1, 0.5 si falta).
+        """
+        clave = self.key(url)
+        if clave in self._seen:
+            return False
+        if self.max_size is not None and len(self._cola) >= self.max_size:
+            return False
+        self._seen.add(clave)
+        if self.permitida is not None and not self.permitida(url):
+            self.descartadas += 1
+            return False
+        if self.priorizar:
+            orden = (
+                depth,
+                0 if from_sitemap else 1,
+                -(PRIORIDAD_DEFECTO if prioridad is None else prioridad),
+                next(self._orden),
+            )
+            heapq.heappush(self._cola, (orden, url, depth))
+        else:
+            self._cola.append((url, depth))
+        return True
+
+    def pop(self):
+        """Devuelve la tupla ``(url, depth)`` siguiente. IndexError si está vacía"""
+        if self.priorizar:
+            _, url, depth = heapq.heappop(self._cola)
+            return url, depth
+        return self._cola.popleft()
+
+    def mark_seen(self, url):
+        """Marca una URL como vista sin encolarla"""
+        self._seen.add(self.key(url))
+
+    def filtrar(self, permitida):
+        """Aplica ``permitida(url)`` a las pendientes y a las que se encolen.
+
+        Devuelve cuántas URLs pendientes se descartaron.
+        """
+        self.permitida = permitida
+        antes = len(self._cola)
+        if self.priorizar:
+            self._cola = [item for item in self._cola if permitida(item[1])]
+            heapq.heapify(self._cola)
+        else:
+            self._cola = deque(item for item in self._cola if permitida(item[0]))
+        descartadas = antes - len(self._cola)
+        self.descartadas += descartadas
+        return descartadas
@@ -0,0 +1,150 @@
+"""
+Turnos de petición por host compartidos entre procesos (Redis).
+
+Cada crawling regula su propio ritmo (``core.utils.rate_limiter``), pero
+varios usuarios, lotes o workers de Celery crawleando el mismo dominio a la
+vez sumaban sus peticiones y el sitio los bloqueaba antes. Aquí cada petición
+reserva un turno en un presupuesto global por host (``CRAWL_HOST_RATE_GLOBAL``
+peticiones/segundo con ráfagas de ``CRAWL_HOST_RAFAGA_GLOBAL``), guardado en
+Redis junto al progreso de tareas (``core.utils.task_progress``):
+
+- La reserva es un script Lua atómico (GCRA) con el reloj de Redis, así que
+  todos los procesos comparten la misma cola de turnos sin desfase de reloj.
+- ``http_get`` y el motor asíncrono reservan turno antes de cada petición,
+  así que lo cumplen hilos web, tareas Celery y crawlings por lotes.
+- Si Redis no responde se sigue sin coordinación global (solo el límite
+  local) y se reintenta pasados ``REINTENTO_REDIS`` segundos.
+
+``CRAWL_POLITENESS_BACKEND`` elige ``"redis"``, ``"memory"`` (un solo
+proceso) u ``"off"``.
+"""
+
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+
+import redis
+from django.conf import settings
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+
+from .url_canon import host_sin_www
+
+# Segundos sin volver a intentar Redis tras un fallo de conexión
+REINTENTO_REDIS = 30
+
+# Reserva el siguiente turno del host y devuelve los milisegundos a esperar.
+# KEYS[1]: clave del host; ARGV: intervalo y tolerancia de ráfaga en ms.
+SCRIPT_RESERVAR = """
+local t = redis.call('TIME')
+local ahora = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local intervalo = tonumber(ARGV[1])
+local tolerancia = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or '0')
+local inicio = math.max(tat, ahora)
+local siguiente = inicio + intervalo
+redis.call('SET', KEYS[1], siguiente, 'PX', siguiente - ahora + 1000)
+return math.max(inicio - tolerancia - ahora, 0)
+"""
+
+
+def _presupuesto():
+    """``(intervalo, tolerancia)`` en segundos del presupuesto por host"""
+    tasa = getattr(settings, "CRAWL_HOST_RATE_GLOBAL", 4.0)
+    rafaga = getattr(settings, "CRAWL_HOST_RAFAGA_GLOBAL", 4)
+    intervalo = 1 / tasa if tasa else 0
+    return intervalo, (rafaga - 1) * intervalo
+
+
+def host_de_url(url):
+    return host_sin_www((urlparse(url).netloc or url).lower())
+
+
+class TurnosMemoria:
+    """Turnos por host dentro de un único proceso"""
+
+    def __init__(self):
+        self._tat = {}
+        self._lock = threading.Lock()
+
+    def reservar(self, host):
+        intervalo, tolerancia = _presupuesto()
+        with self._lock:
+            ahora = time.monotonic()
+            inicio = max(self._tat.get(host, 0), ahora)
+            self._tat[host] = inicio + intervalo
+            return max(inicio - tolerancia - ahora, 0)
+
+
+class TurnosRedis:
+    """Turnos por host compartidos por todos los procesos vía Redis"""
+
+    def __init__(self, client=None):
+        if client is None:
+            from core.utils.task_progress import REDIS_DB, REDIS_HOST, REDIS_PORT
+
+            # Timeouts cortos y sin reintentos: un Redis caído no debe frenar
+            # los crawlings
+            client = redis.StrictRedis(
+                host=REDIS_HOST,
+                port=REDIS_PORT,
+                db=REDIS_DB,
+                socket_connect_timeout=1,
+                socket_timeout=1,
+                retry=Retry(NoBackoff(), 0),
+            )
+        self.redis = client
+        self._script = client.register_script(SCRIPT_RESERVAR)
+        self._sin_redis_hasta = 0
+
+    def reservar(self, host):
+        if time.monotonic() < self._sin_redis_hasta:
+            return 0
+        intervalo, tolerancia = _presupuesto()
+        try:
+            espera_ms = self._script(
+                keys=[f"host_turno:{host}"],
+                args=[int(intervalo * 1000), int(tolerancia * 1000)],
+            )
+        except redis.RedisError as e:
+            self._sin_redis_hasta = time.monotonic() + REINTENTO_REDIS
+            print(f"[POLITENESS] Redis no disponible, sin coordinación global: {e}")
+            return 0
+        return int(espera_ms) / 1000
+
+
+class SinTurnos:
+    """Sin coordinación entre procesos"""
+
+    def reservar(self, host):
+        return 0
+
+
+BACKENDS = {"redis": TurnosRedis, "memory": TurnosMemoria, "off": SinTurnos}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_turnos(nombre=None):
+    """Devuelve el backend de turnos configurado (uno por backend)"""
+    nombre = nombre or getattr(settings, "CRAWL_POLITENESS_BACKEND", "redis")
+    with _backends_lock:
+        if nombre not in _backends:
+            _backends[nombre] = BACKENDS[nombre]()
+        return _backends[nombre]
+
+
+def esperar_turno_host(url):
+    """Bloquea hasta el turno de la petición a ``url``"""
+    espera = get_turnos().reservar(host_de_url(url))
+    if espera:
+        time.sleep(espera)
+
+
+async def esperar_turno_host_async(url):
+    turnos = get_turnos()
+    espera = await asyncio.to_thread(turnos.reservar, host_de_url(url))
+    if espera:
+        await asyncio.sleep(espera)
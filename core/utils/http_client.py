@@ -0,0 +1,232 @@
+"""
+Capa HTTP con conexiones persistentes para los crawlers y analizadores.
+
+Cada host tiene su propia ``requests.Session`` con un pool de conexiones
+acotado, de modo que las peticiones sucesivas al mismo dominio reutilizan la
+conexión TCP/TLS (keep-alive) en lugar de abrir una nueva por página.
+
+Las sesiones se reciclan al agotar su presupuesto de keep-alive (número de
+peticiones o segundos de inactividad) y, si hay demasiados hosts abiertos, se
+retira la del menos usado recientemente. Una sesión retirada no se cierra:
+otros hilos (el planificador, los lotes, los lectores de sitemaps) pueden
+estar a mitad de una petición con ella, y ``close()`` les cortaría el pool;
+deja de entregarse y el recolector libera sus conexiones cuando terminan. El motor asíncrono usa la misma
+configuración vía ``async_client_kwargs`` (con HTTP/2 opcional).
+
+Antes de cada petición ``http_get`` reserva turno en el presupuesto global del
+host (``core.utils.host_lease``), compartido por todos los procesos.
+
+Los crawlers descargan las páginas con ``http_get_pagina`` (o su versión
+asíncrona) en streaming: se cortan en cuanto la respuesta resulta no ser HTML
+o pasa de ``CRAWL_MAX_BYTES_PAGINA``, así que un PDF o un vídeo enlazado no
+se carga entero en memoria. Las URLs con extensión binaria se comprueban
+antes con un HEAD (``CRAWL_HEAD_BINARIOS``).
+"""
+
+import importlib.util
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .host_lease import esperar_turno_host, esperar_turno_host_async
+
+_sesiones = OrderedDict()
+_lock = threading.Lock()
+
+# Tipos de contenido que se descargan y parsean como páginas
+TIPOS_HTML = ("text/html", "application/xhtml+xml")
+
+# Extensiones que casi nunca son HTML: se comprueban con HEAD antes del GET
+EXTENSIONES_BINARIAS = tuple(
+    ".pdf .zip .rar .gz .tar .7z .exe .dmg .iso .mp4 .mp3 .avi .mov .webm .wav "
+    ".jpg .jpeg .png .gif .webp .svg .ico .doc .docx .xls .xlsx .ppt .pptx .csv".split()
+)
+
+TAM_BLOQUE = 64 * 1024
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+class SesionHost:
+    """Sesión HTTP de un host con su presupuesto de keep-alive"""
+
+    def __init__(self, host):
+        self.host = host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=_config("HTTP_POOL_MAXSIZE", 10)
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.usos = 0
+        self.ultimo_uso = time.monotonic()
+
+    def agotada(self):
+        inactiva = time.monotonic() - self.ultimo_uso
+        return self.usos >= _config(
+            "HTTP_KEEPALIVE_MAX_REQUESTS", 1000
+        ) or inactiva > _config("HTTP_KEEPALIVE_SECONDS", 60)
+
+    def usar(self):
+        self.usos += 1
+        self.ultimo_uso = time.monotonic()
+        return self.session
+
+    def cerrar(self):
+        self.session.close()
+
+
+def _host(url):
+    return (urlparse(url).netloc or url).lower()
+
+
+def get_session(url):
+    """Devuelve la sesión reutilizable para el host de ``url``"""
+    host = _host(url)
+    with _lock:
+        sesion = _sesiones.get(host)
+        if sesion is not None and sesion.agotada():
+            # Se retira sin cerrarla: puede tener peticiones en curso
+            sesion = None
+        if sesion is None:
+            sesion = SesionHost(host)
+            _sesiones[host] = sesion
+            while len(_sesiones) > _config("HTTP_MAX_SESSIONS", 100):
+                _sesiones.popitem(last=False)
+        _sesiones.move_to_end(host)
+        return sesion.usar()
+
+
+def http_get(url, **kwargs):
+    """Equivalente a ``requests.get`` usando la sesión pooled del host"""
+    kwargs.setdefault("timeout", 10)
+    esperar_turno_host(url)
+    return get_session(url).get(url, **kwargs)
+
+
+class DescargaDescartada(Exception):
+    """La página no se descarga: no es HTML o supera el tamaño máximo.
+
+    ``response`` conserva el estado y las cabeceras, sin cuerpo.
+    """
+
+    def __init__(self, motivo, response):
+        super().__init__(motivo)
+        self.response = response
+
+
+def max_bytes_pagina():
+    return _config("CRAWL_MAX_BYTES_PAGINA", 5 * 1024 * 1024)
+
+
+def es_html(content_type):
+    """Sin ``Content-Type`` se asume HTML"""
+    tipo = (content_type or "").split(";", 1)[0].strip().lower()
+    return not tipo or tipo in TIPOS_HTML
+
+
+def parece_binaria(url):
+    return urlparse(url).path.lower().endswith(EXTENSIONES_BINARIAS)
+
+
+def _comprobar_cabeceras(resp, max_bytes):
+    """Descarta la respuesta por sus cabeceras, antes de leer el cuerpo"""
+    content_type = resp.headers.get("content-type", "")
+    if resp.status_code == 200 and not es_html(content_type):
+        raise DescargaDescartada(f"no es HTML ({content_type})", resp)
+    longitud = resp.headers.get("content-length", "")
+    if longitud.isdigit() and int(longitud) > max_bytes:
+        raise DescargaDescartada(f"demasiado grande ({longitud} bytes)", resp)
+
+
+def _demasiado_grande(resp, max_bytes):
+    return DescargaDescartada(f"demasiado grande (más de {max_bytes} bytes)", resp)
+
+
+def http_get_pagina(url, max_bytes=None, **kwargs):
+    """``http_get`` de una página HTML en streaming.
+
+    Lanza ``DescargaDescartada`` sin leer el resto del cuerpo si la respuesta
+    no es HTML o pasa de ``max_bytes``. El cuerpo leído queda en
+    ``.content``/``.text`` como en una descarga normal.
+    """
+    max_bytes = max_bytes or max_bytes_pagina()
+    if _config("CRAWL_HEAD_BINARIOS", True) and parece_binaria(url):
+        head_kwargs = {k: v for k, v in kwargs.items() if k in ("headers", "timeout")}
+        esperar_turno_host(url)
+        head = get_session(url).head(url, allow_redirects=True, **head_kwargs)
+        # Si el servidor no admite HEAD se decide con el GET
+        if head.status_code == 200:
+            _comprobar_cabeceras(head, max_bytes)
+    resp = http_get(url, stream=True, **kwargs)
+    try:
+        _comprobar_cabeceras(resp, max_bytes)
+        bloques = []
+        leidos = 0
+        for bloque in resp.iter_content(TAM_BLOQUE):
+            leidos += len(bloque)
+            if leidos > max_bytes:
+                raise _demasiado_grande(resp, max_bytes)
+            bloques.append(bloque)
+        resp._content = b"".join(bloques)
+    finally:
+        # Tras un corte se cierra la conexión en vez de leer lo que falta
+        resp.close()
+    return resp
+
+
+async def http_get_pagina_async(client, url, max_bytes=None, **kwargs):
+    """Versión de ``http_get_pagina`` para un ``httpx.AsyncClient``"""
+    max_bytes = max_bytes or max_bytes_pagina()
+    if _config("CRAWL_HEAD_BINARIOS", True) and parece_binaria(url):
+        # El HEAD es otra petición al host: gasta su propio turno (el del GET
+        # lo reserva quien llama)
+        await esperar_turno_host_async(url)
+        head = await client.head(url, **kwargs)
+        if head.status_code == 200:
+            _comprobar_cabeceras(head, max_bytes)
+    async with client.stream("GET", url, **kwargs) as resp:
+        _comprobar_cabeceras(resp, max_bytes)
+        bloques = []
+        leidos = 0
+        async for bloque in resp.aiter_bytes(TAM_BLOQUE):
+            leidos += len(bloque)
+            if leidos > max_bytes:
+                raise _demasiado_grande(resp, max_bytes)
+            bloques.append(bloque)
+        # Como ``aread()``: el cuerpo queda disponible tras cerrar el stream
+        resp._content = b"".join(bloques)
+    return resp
+
+
+def cerrar_sesiones():
+    """Cierra todas las sesiones abiertas (útil en tests y al apagar workers)"""
+    with _lock:
+        for sesion in _sesiones.values():
+            sesion.cerrar()
+        _sesiones.clear()
+
+
+def http2_disponible():
+    return importlib.util.find_spec("h2") is not None
+
+
+def async_client_kwargs():
+    """Parámetros de ``httpx.AsyncClient`` con el mismo pool y keep-alive"""
+    pool = _config("HTTP_POOL_MAXSIZE", 10)
+    return {
+        "limits": httpx.Limits(
+            max_connections=pool,
+            max_keepalive_connections=pool,
+            keepalive_expiry=_config("HTTP_KEEPALIVE_SECONDS", 60),
+        ),
+        "http2": _config("HTTP_CLIENT_HTTP2", False) and http2_disponible(),
+    }
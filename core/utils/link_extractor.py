@@ -0,0 +1,140 @@
+"""
+Extracción de enlaces de páginas HTML con backends intercambiables.
+
+Los crawlers solo necesitan los ``<a href>`` (más ``<link rel=canonical>``,
+``hreflang`` y ``<base href>``), así que construir un árbol completo de
+BeautifulSoup por página es innecesariamente caro. El backend por defecto usa
+la interfaz *target* del parser HTML de lxml: recibe los eventos de apertura
+de etiquetas sin construir ningún árbol. BeautifulSoup queda como alternativa
+cuando lxml no está instalado o se elige con ``CRAWL_LINK_EXTRACTOR = "bs4"``.
+
+Todos los backends devuelven un dict::
+
+    {
+        "links": ["/a", "https://x.com/b", ...],  # href tal cual, sin vacíos
+        "canonical": "https://x.com/" | None,
+        "hreflang": {"es": "https://x.com/es/", ...},
+        "base_href": "https://x.com/" | None,
+    }
+"""
+
+from bs4 import BeautifulSoup
+from django.conf import settings
+
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover - lxml es opcional
+    etree = None
+
+
+def _resultado_vacio():
+    return {"links": [], "canonical": None, "hreflang": {}, "base_href": None}
+
+
+def _procesar_link(resultado, rel, href, hreflang):
+    """Registra canonical y hreflang de una etiqueta <link>"""
+    rels = rel.lower().split() if isinstance(rel, str) else [r.lower() for r in rel]
+    href = (href or "").strip()
+    if not href:
+        return
+    if "canonical" in rels and resultado["canonical"] is None:
+        resultado["canonical"] = href
+    if "alternate" in rels and hreflang:
+        resultado["hreflang"].setdefault(hreflang.strip().lower(), href)
+
+
+class BeautifulSoupLinkExtractor:
+    """Backend original: árbol completo con html.parser"""
+
+    nombre = "bs4"
+
+    def extraer(self, content):
+        resultado = _resultado_vacio()
+        soup = BeautifulSoup(content, "html.parser")
+        base = soup.find("base", href=True)
+        if base:
+            resultado["base_href"] = base["href"].strip()
+        for link in soup.find_all("link", href=True):
+            _procesar_link(
+                resultado, link.get("rel", []), link["href"], link.get("hreflang")
+            )
+        resultado["links"] = [
+            a["href"].strip()
+            for a in soup.find_all("a", href=True)
+            if a["href"].strip()
+        ]
+        return resultado
+
+
+class _ColectorEnlaces:
+    """Target de lxml: recibe eventos de etiquetas sin construir el árbol"""
+
+    def __init__(self):
+        self.resultado = _resultado_vacio()
+
+    def start(self, tag, attrib):
+        if tag == "a":
+            href = (attrib.get("href") or "").strip()
+            if href:
+                self.resultado["links"].append(href)
+        elif tag == "link":
+            _procesar_link(
+                self.resultado,
+                attrib.get("rel", ""),
+                attrib.get("href"),
+                attrib.get("hreflang"),
+            )
+        elif tag == "base" and self.resultado["base_href"] is None:
+            href = (attrib.get("href") or "").strip()
+            if href:
+                self.resultado["base_href"] = href
+
+    def end(self, tag):
+        pass
+
+    def data(self, data):
+        pass
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return self.resultado
+
+
+class LxmlLinkExtractor:
+    """Backend rápido: parser HTML de lxml en modo streaming (sin árbol)"""
+
+    nombre = "lxml"
+
+    def extraer(self, content):
+        if not content:
+            return _resultado_vacio()
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        colector = _ColectorEnlaces()
+        parser = etree.HTMLParser(target=colector, recover=True, no_network=True)
+        try:
+            parser.feed(content)
+            return parser.close()
+        except etree.Error:
+            return colector.resultado
+
+
+BACKENDS = {
+    "lxml": LxmlLinkExtractor,
+    "bs4": BeautifulSoupLinkExtractor,
+}
+
+
+def get_link_extractor(nombre=None):
+    """Devuelve el backend configurado, con BeautifulSoup como alternativa"""
+    nombre = nombre or getattr(settings, "CRAWL_LINK_EXTRACTOR", "lxml")
+    if nombre == "lxml" and etree is None:
+        nombre = "bs4"
+    return BACKENDS.get(nombre, BeautifulSoupLinkExtractor)()
+
+
+def extraer_enlaces(content, backend=None):
+    """Extrae enlaces, canonical, hreflang y base href de un HTML"""
+    return get_link_extractor(backend).extraer(content)
@@ -0,0 +1,131 @@
+"""
+Almacén de huellas de página para recrawls condicionales.
+
+Por cada URL canónica se guardan el ``ETag``, el ``Last-Modified`` y un hash
+del contenido (modelo ``PageFingerprint``). ``HuellasDominio`` carga las huellas
+de un dominio con una sola consulta, da las cabeceras condicionales de cada URL
+y clasifica cada respuesta:
+
+- ``304 Not Modified`` o mismo hash de contenido: ``"sin_cambios"``.
+- Hash distinto: ``"cambiada"``.
+- URL sin huella previa: ``"nueva"``.
+
+Las huellas nuevas o actualizadas se acumulan en memoria y ``guardar`` las
+escribe con un único upsert masivo al terminar el crawling.
+"""
+
+import hashlib
+
+from django.utils import timezone
+
+from core.models import PageFingerprint
+from core.utils.url_canon import clave_canonica, host_sin_www
+
+NUEVA = "nueva"
+CAMBIADA = "cambiada"
+SIN_CAMBIOS = "sin_cambios"
+
+CAMPOS_ACTUALIZABLES = [
+    "url",
+    "etag",
+    "last_modified",
+    "content_hash",
+    "status_code",
+    "fetched_at",
+    "checked_at",
+]
+
+
+def hash_url(url):
+    return hashlib.sha256(clave_canonica(url).encode("utf-8")).hexdigest()
+
+
+def hash_contenido(contenido):
+    if isinstance(contenido, str):
+        contenido = contenido.encode("utf-8")
+    return hashlib.sha256(contenido or b"").hexdigest()
+
+
+class HuellasDominio:
+    """Huellas de las páginas de un dominio durante un crawling"""
+
+    def __init__(self, dominio):
+        self.dominio = host_sin_www(dominio.lower())
+        self._huellas = {
+            huella.url_hash: huella
+            for huella in PageFingerprint.objects.filter(dominio=self.dominio)
+        }
+        self._pendientes = {}
+        self.totales = {NUEVA: 0, CAMBIADA: 0, SIN_CAMBIOS: 0}
+
+    def urls_conocidas(self):
+        """URLs del dominio con huella, de la más a la menos reciente"""
+        huellas = sorted(
+            self._huellas.values(), key=lambda h: h.checked_at, reverse=True
+        )
+        return [huella.url for huella in huellas]
+
+    def cabeceras_condicionales(self, url):
+        """``If-None-Match`` / ``If-Modified-Since`` de la última visita"""
+        huella = self._huellas.get(hash_url(url))
+        cabeceras = {}
+        if huella and huella.etag:
+            cabeceras["If-None-Match"] = huella.etag
+        if huella and huella.last_modified:
+            cabeceras["If-Modified-Since"] = huella.last_modified
+        return cabeceras
+
+    def registrar(self, url, status_code, headers, contenido=b""):
+        """Clasifica la respuesta y actualiza la huella. Devuelve el estado"""
+        clave = hash_url(url)
+        ahora = timezone.now()
+        huella = self._huellas.get(clave)
+        if status_code == 304 and huella:
+            huella.checked_at = ahora
+            estado = SIN_CAMBIOS
+        else:
+            contenido_hash = hash_contenido(contenido)
+            if huella is None:
+                huella = PageFingerprint(
+                    url_hash=clave, url=url[:2000], dominio=self.dominio
+                )
+                self._huellas[clave] = huella
+                estado = NUEVA
+            elif huella.content_hash == contenido_hash:
+                estado = SIN_CAMBIOS
+            else:
+                estado = CAMBIADA
+            huella.url = url[:2000]
+            huella.etag = (headers.get("etag") or "")[:255]
+            huella.last_modified = (headers.get("last-modified") or "")[:64]
+            huella.content_hash = contenido_hash
+            huella.status_code = status_code
+            huella.fetched_at = ahora
+            huella.checked_at = ahora
+        self._pendientes[clave] = huella
+        self.totales[estado] += 1
+        return estado
+
+    def guardar(self):
+        """Escribe las huellas pendientes con un único upsert masivo"""
+        pendientes, self._pendientes = list(self._pendientes.values()), {}
+        if pendientes:
+            # Copias sin pk: el conflicto se resuelve por url_hash, no por id
+            PageFingerprint.objects.bulk_create(
+                [
+                    PageFingerprint(
+                        url_hash=huella.url_hash,
+                        dominio=huella.dominio,
+                        **{
+                            campo: getattr(huella, campo)
+                            for campo in CAMPOS_ACTUALIZABLES
+                        },
+                    )
+                    for huella in pendientes
+                ],
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=["url_hash"],
+                update_fields=CAMPOS_ACTUALIZABLES,
+            )
+        return len(pendientes)
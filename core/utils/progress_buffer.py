@@ -0,0 +1,192 @@
+"""
+Persistencia incremental del progreso de un crawling.
+
+Antes cada página crawleada hacía un ``objects.get`` (para ver si había que
+detenerse), un ``get_or_create`` y un ``save()`` que reescribía
+``urls_found = "|".join(urls)`` completo: O(n²) bytes escritos por crawling.
+
+``ProgresoIncremental`` acumula las URLs en memoria y las vuelca cada
+``CRAWL_PROGRESS_FLUSH_URLS`` URLs o ``CRAWL_PROGRESS_FLUSH_MS`` milisegundos:
+las URLs nuevas se insertan en bloque como filas ``DiscoveredUrl`` de la
+búsqueda (o, si el progreso no tiene búsqueda, se agregan al final de
+``urls_found`` con un único ``UPDATE``). La señal de detener se consulta en memoria: las vistas de stop
+llaman a ``solicitar_detencion`` y, para paradas hechas desde otro proceso,
+el propio ``UPDATE`` del volcado (filtrado por ``is_done=False``) detecta que
+el progreso ya fue marcado como terminado.
+
+Cada volcado renueva ``CrawlingProgress.heartbeat``; el reconciliador
+periódico (``core.utils.crawl_reaper``) da por colgados los progresos sin
+latido reciente. ``iniciar`` lo renueva cuando el trabajo sale de la cola y
+``latido`` lo mantiene mientras no aparecen URLs (el crawler síncrono lo
+llama en cada iteración; el motor asíncrono, con un temporizador).
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Case, F, TextField, Value, When
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from core.models import BusquedaDominio, CrawlingProgress, DiscoveredUrl
+from core.utils.crawl_status import STATUS_ABANDONADO
+from core.utils.progress_store import get_progress_store
+
+_detenidos = set()
+_detenidos_lock = threading.Lock()
+
+
+def solicitar_detencion(progress_key):
+    """Marca en memoria que el crawling debe detenerse"""
+    with _detenidos_lock:
+        _detenidos.add(progress_key)
+
+
+def detencion_solicitada(progress_key):
+    with _detenidos_lock:
+        return progress_key in _detenidos
+
+
+def _olvidar_detencion(progress_key):
+    with _detenidos_lock:
+        _detenidos.discard(progress_key)
+
+
+class ProgresoIncremental:
+    """Acumula URLs encontradas y las persiste por lotes"""
+
+    def __init__(self, progress_key, cada_n=None, cada_ms=None):
+        self.progress_key = progress_key
+        self.cada_n = cada_n or getattr(settings, "CRAWL_PROGRESS_FLUSH_URLS", 25)
+        self.cada_ms = (
+            cada_ms
+            if cada_ms is not None
+            else getattr(settings, "CRAWL_PROGRESS_FLUSH_MS", 1000)
+        )
+        self.store = get_progress_store()
+        self.busqueda_id = (
+            CrawlingProgress.objects.filter(progress_key=progress_key)
+            .values_list("busqueda_id", flat=True)
+            .first()
+        )
+        self.count = 0
+        self.ultima = None
+        self._pendientes = []
+        self._ultimo_volcado = time.monotonic()
+        self._detenido = False
+
+    @property
+    def detenido(self):
+        """True si se pidió detener (comprobación sin acceso a la BD)"""
+        if not self._detenido and detencion_solicitada(self.progress_key):
+            self._detenido = True
+        return self._detenido
+
+    def registrar(self, url, **detalles):
+        """Agrega una URL encontrada. Devuelve False si hay que detenerse.
+
+        ``detalles`` admite ``status_code``, ``depth`` y ``content_type``.
+        """
+        if "content_type" in detalles:
+            detalles["content_type"] = (detalles["content_type"] or "")[:255]
+        self.count += 1
+        self.ultima = url
+        self._pendientes.append((url, detalles))
+        transcurrido = (time.monotonic() - self._ultimo_volcado) * 1000
+        if len(self._pendientes) >= self.cada_n or transcurrido >= self.cada_ms:
+            self.flush()
+        return not self.detenido
+
+    def iniciar(self):
+        """Renueva el latido al empezar el crawling de verdad.
+
+        El progreso se crea al encolar el trabajo: si la espera en la cola de
+        Celery o del planificador superó ``CRAWL_HEARTBEAT_TIMEOUT`` y el
+        reconciliador lo dio por abandonado, se reabre.
+        """
+        ahora = timezone.now()
+        self._ultimo_volcado = time.monotonic()
+        progreso = CrawlingProgress.objects.filter(progress_key=self.progress_key)
+        reabierta = self.busqueda_id and BusquedaDominio.objects.filter(
+            pk=self.busqueda_id, crawl_status=STATUS_ABANDONADO
+        ).update(
+            fecha_fin=None,
+            crawl_status="",
+            estado_detalle="",
+            estado_clase="",
+            duracion_segundos=None,
+        )
+        campos = {"heartbeat": ahora, "updated_at": ahora}
+        if reabierta:
+            print(f"[CRAWL] Reabierto {self.progress_key}: esperó demasiado en cola")
+            campos["is_done"] = False
+            self.store.update(self.progress_key, done=False)
+        progreso.update(**campos)
+
+    def latido(self):
+        """Vuelca (y renueva ``heartbeat``) si pasó el intervalo sin volcados.
+
+        Se llama en cada iteración del crawler para que un crawling lento,
+        que tarda en encontrar URLs, no parezca colgado al reconciliador.
+        """
+        if (time.monotonic() - self._ultimo_volcado) * 1000 >= self.cada_ms:
+            self.flush()
+        return not self.detenido
+
+    def flush(self, final=False):
+        """Vuelca las URLs pendientes con un único UPDATE de solo-agregar"""
+        pendientes, self._pendientes = self._pendientes, []
+        nuevas = [url for url, _ in pendientes]
+        self._ultimo_volcado = time.monotonic()
+
+        ahora = timezone.now()
+        campos = {"count": self.count, "updated_at": ahora, "heartbeat": ahora}
+        campos["last_url"] = "" if final else (self.ultima or "")
+        if pendientes and self.busqueda_id:
+            self._insertar_urls(pendientes)
+        elif nuevas:
+            sufijo = "|".join(nuevas)
+            campos["urls_found"] = Case(
+                When(urls_found="", then=Value(sufijo)),
+                default=Concat(
+                    F("urls_found"), Value(f"|{sufijo}"), output_field=TextField()
+                ),
+                output_field=TextField(),
+            )
+        progreso = CrawlingProgress.objects.filter(progress_key=self.progress_key)
+        if final:
+            campos["is_done"] = True
+            progreso.update(**campos)
+        elif progreso.filter(is_done=False).update(**campos) == 0:
+            # Terminado (o eliminado) desde otro proceso: detener el crawling,
+            # conservando igualmente las URLs de este lote
+            self._detenido = True
+            progreso.update(**campos)
+
+        self.store.update(
+            self.progress_key,
+            count=self.count,
+            last=None if final else self.ultima,
+            **({"done": True} if final else {}),
+        )
+        if not self.busqueda_id:
+            # Con búsqueda las URLs ya están en DiscoveredUrl (leer_progreso)
+            self.store.extend(self.progress_key, "urls", nuevas)
+        if final:
+            _olvidar_detencion(self.progress_key)
+
+    def _insertar_urls(self, pendientes):
+        ahora = timezone.now()
+        DiscoveredUrl.objects.bulk_create(
+            [
+                DiscoveredUrl(
+                    busqueda_id=self.busqueda_id, url=url, fetched_at=ahora, **detalles
+                )
+                for url, detalles in pendientes
+            ],
+            batch_size=DiscoveredUrl.BATCH_SIZE,
+        )
+        BusquedaDominio.objects.filter(pk=self.busqueda_id).update(
+            url_count=F("url_count") + len(pendientes)
+        )
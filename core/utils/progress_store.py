@@ -0,0 +1,410 @@
+"""
+Almacén compartido del progreso de los crawlings.
+
+Sustituye al dict ``crawling_progress`` de ``core.views_app``, que vivía en
+la memoria de cada proceso: con varios workers de gunicorn (o tras un
+reinicio) el poll devolvía 404 aunque el crawling siguiera en marcha.
+
+El backend se elige con ``CRAWL_PROGRESS_BACKEND``:
+
+- ``"memory"``: dict del proceso (desarrollo y tests).
+- ``"redis"``: hash por clave en el Redis de ``core.utils.task_progress``.
+- ``"db"``: una fila ``ProgresoCampo`` por campo del documento y una
+  ``ProgresoElemento`` por elemento de sus listas.
+
+Todas las escrituras son parciales y atómicas: ``update`` solo toca los campos
+indicados, ``incr``, ``append`` y ``extend`` modifican un único campo y los resultados
+por dominio de un lote (``set_resultado``) se guardan como campos separados,
+de modo que dos hilos que escriben a la vez no se pisan el documento.
+
+Los progresos de una búsqueda llevan ``busqueda_id`` y no guardan la lista
+``urls``: ya está en las filas ``DiscoveredUrl`` y ``leer_progreso`` la lee de
+ahí, con el cursor como ``OFFSET``. ``purgar`` borra los progresos sin
+actividad desde hace ``CRAWL_PROGRESS_RETENCION`` segundos (lo llama el
+reconciliador; en Redis caducan solos).
+
+``get(key, desde=n)`` devuelve los campos lista (p. ej. ``urls``) a partir de
+la posición ``n``: los polls y el canal SSE piden solo lo nuevo y no se lee
+la lista completa (``LRANGE n -1`` en Redis, ``posicion >= n`` en la base de
+datos).
+"""
+
+import copy
+import json
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+# Mismo tiempo de expiración que task_progress
+EXPIRACION_SEGUNDOS = 60 * 60 * 6
+
+PREFIJO_RESULTADO = "results:"
+
+
+def _recortar_listas(documento, desde):
+    """Copia superficial del documento con los campos lista desde ``desde``"""
+    if not desde:
+        return documento
+    return {
+        campo: valor[desde:] if isinstance(valor, list) else valor
+        for campo, valor in documento.items()
+    }
+
+
+class MemoryProgressStore:
+    """Progreso en memoria del proceso (no se comparte entre workers)"""
+
+    def __init__(self):
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, desde=0):
+        with self._lock:
+            documento = self._datos.get(key)
+            if documento is None:
+                return None
+            return copy.deepcopy(_recortar_listas(documento, desde))
+
+    def set(self, key, datos):
+        with self._lock:
+            documento = copy.deepcopy(datos)
+            documento.setdefault("results", {})
+            self._datos[key] = documento
+
+    def update(self, key, **campos):
+        with self._lock:
+            self._datos.setdefault(key, {"results": {}}).update(campos)
+
+    def incr(self, key, campo, n=1):
+        with self._lock:
+            documento = self._datos.setdefault(key, {"results": {}})
+            documento[campo] = documento.get(campo, 0) + n
+            return documento[campo]
+
+    def append(self, key, campo, valor):
+        self.extend(key, campo, [valor])
+
+    def extend(self, key, campo, valores):
+        with self._lock:
+            documento = self._datos.setdefault(key, {"results": {}})
+            documento.setdefault(campo, []).extend(valores)
+
+    def set_resultado(self, key, nombre, resultado):
+        with self._lock:
+            documento = self._datos.setdefault(key, {"results": {}})
+            documento.setdefault("results", {})[nombre] = resultado
+
+    def delete(self, key):
+        with self._lock:
+            self._datos.pop(key, None)
+
+    def purgar(self, antes_de):
+        """Sin fechas en memoria: el proceso no sobrevive a sus progresos"""
+        return 0
+
+
+class RedisProgressStore:
+    """Progreso en un hash de Redis por clave, con listas en claves aparte"""
+
+    # Marca en el hash de los campos cuyo valor es una lista de Redis
+    MARCA_LISTA = json.dumps("__lista__")
+
+    def __init__(self, client=None):
+        if client is None:
+            from core.utils.task_progress import redis_client as client
+        self.redis = client
+
+    def _hash(self, key):
+        return f"crawl_progress:{key}"
+
+    def _lista(self, key, campo):
+        return f"crawl_progress:{key}:lista:{campo}"
+
+    def _expirar(self, pipe, key, *listas):
+        pipe.expire(self._hash(key), EXPIRACION_SEGUNDOS)
+        for campo in listas:
+            pipe.expire(self._lista(key, campo), EXPIRACION_SEGUNDOS)
+
+    def get(self, key, desde=0):
+        campos = self.redis.hgetall(self._hash(key))
+        if not campos:
+            return None
+        documento = {"results": {}}
+        for campo, valor in campos.items():
+            if campo.startswith(PREFIJO_RESULTADO):
+                documento["results"][campo[len(PREFIJO_RESULTADO) :]] = json.loads(
+                    valor
+                )
+            elif valor == self.MARCA_LISTA:
+                documento[campo] = [
+                    json.loads(v)
+                    for v in self.redis.lrange(self._lista(key, campo), desde, -1)
+                ]
+            else:
+                documento[campo] = json.loads(valor)
+        return documento
+
+    def set(self, key, datos):
+        self.delete(key)
+        pipe = self.redis.pipeline(transaction=True)
+        listas = []
+        for campo, valor in datos.items():
+            if campo == "results":
+                for nombre, resultado in valor.items():
+                    pipe.hset(
+                        self._hash(key),
+                        f"{PREFIJO_RESULTADO}{nombre}",
+                        json.dumps(resultado),
+                    )
+            elif isinstance(valor, list):
+                listas.append(campo)
+                pipe.hset(self._hash(key), campo, self.MARCA_LISTA)
+                if valor:
+                    pipe.rpush(self._lista(key, campo), *map(json.dumps, valor))
+            else:
+                pipe.hset(self._hash(key), campo, json.dumps(valor))
+        self._expirar(pipe, key, *listas)
+        pipe.execute()
+
+    def update(self, key, **campos):
+        if not campos:
+            return
+        pipe = self.redis.pipeline(transaction=True)
+        # Las listas se reemplazan como listas de Redis: un JSON en el hash
+        # perdería la marca y get(desde=n) devolvería siempre la lista entera
+        listas = [campo for campo, valor in campos.items() if isinstance(valor, list)]
+        for campo in listas:
+            pipe.delete(self._lista(key, campo))
+            if campos[campo]:
+                pipe.rpush(self._lista(key, campo), *map(json.dumps, campos[campo]))
+        pipe.hset(
+            self._hash(key),
+            mapping={
+                campo: self.MARCA_LISTA if campo in listas else json.dumps(valor)
+                for campo, valor in campos.items()
+            },
+        )
+        self._expirar(pipe, key, *listas)
+        pipe.execute()
+
+    def incr(self, key, campo, n=1):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hincrby(self._hash(key), campo, n)
+        self._expirar(pipe, key)
+        return pipe.execute()[0]
+
+    def append(self, key, campo, valor):
+        self.extend(key, campo, [valor])
+
+    def extend(self, key, campo, valores):
+        if not valores:
+            return
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(self._hash(key), campo, self.MARCA_LISTA)
+        pipe.rpush(self._lista(key, campo), *map(json.dumps, valores))
+        self._expirar(pipe, key, campo)
+        pipe.execute()
+
+    def set_resultado(self, key, nombre, resultado):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(
+            self._hash(key), f"{PREFIJO_RESULTADO}{nombre}", json.dumps(resultado)
+        )
+        self._expirar(pipe, key)
+        pipe.execute()
+
+    def delete(self, key):
+        listas = [
+            self._lista(key, campo)
+            for campo, valor in self.redis.hgetall(self._hash(key)).items()
+            if valor == self.MARCA_LISTA
+        ]
+        self.redis.delete(self._hash(key), *listas)
+
+    def purgar(self, antes_de):
+        """Las claves caducan solas a las ``EXPIRACION_SEGUNDOS``"""
+        return 0
+
+
+class DatabaseProgressStore:
+    """Progreso en la base de datos, una fila ``ProgresoCampo`` por campo.
+
+    Los campos lista se guardan como filas ``ProgresoElemento`` numeradas; su
+    ``ProgresoCampo`` solo lleva la marca con la longitud, de modo que
+    ``extend`` no reescribe la lista y ``get(desde=n)`` lee solo lo nuevo.
+    """
+
+    # Valor en ProgresoCampo de los campos lista: {MARCA_LISTA: longitud}
+    MARCA_LISTA = "__lista__"
+
+    @property
+    def modelo(self):
+        from core.models import ProgresoCampo
+
+        return ProgresoCampo
+
+    @property
+    def modelo_elemento(self):
+        from core.models import ProgresoElemento
+
+        return ProgresoElemento
+
+    def _es_lista(self, valor):
+        return isinstance(valor, dict) and self.MARCA_LISTA in valor
+
+    def _longitud(self, valor):
+        return valor[self.MARCA_LISTA] if self._es_lista(valor) else 0
+
+    def _escribir_lista(self, key, campo, valores, desde=0):
+        """Inserta ``valores`` a partir de ``desde`` y devuelve la marca"""
+        self.modelo_elemento.objects.bulk_create(
+            self.modelo_elemento(
+                progress_key=key, campo=campo, posicion=posicion, valor=valor
+            )
+            for posicion, valor in enumerate(valores, desde)
+        )
+        return {self.MARCA_LISTA: desde + len(valores)}
+
+    def get(self, key, desde=0):
+        filas = self.modelo.objects.filter(progress_key=key).values_list(
+            "campo", "valor"
+        )
+        if not filas:
+            return None
+        documento = {"results": {}}
+        listas = []
+        for campo, valor in filas:
+            if campo.startswith(PREFIJO_RESULTADO):
+                documento["results"][campo[len(PREFIJO_RESULTADO) :]] = valor
+            elif self._es_lista(valor):
+                documento[campo] = []
+                listas.append(campo)
+            else:
+                documento[campo] = valor
+        if listas:
+            elementos = (
+                self.modelo_elemento.objects.filter(
+                    progress_key=key, campo__in=listas, posicion__gte=desde
+                )
+                .order_by("campo", "posicion")
+                .values_list("campo", "valor")
+            )
+            for campo, valor in elementos:
+                documento[campo].append(valor)
+        return documento
+
+    def set(self, key, datos):
+        with transaction.atomic():
+            self.delete(key)
+            filas = []
+            for campo, valor in datos.items():
+                if campo == "results":
+                    filas.extend(
+                        self.modelo(
+                            progress_key=key,
+                            campo=f"{PREFIJO_RESULTADO}{nombre}",
+                            valor=resultado,
+                        )
+                        for nombre, resultado in valor.items()
+                    )
+                    continue
+                if isinstance(valor, list):
+                    valor = self._escribir_lista(key, campo, valor)
+                filas.append(self.modelo(progress_key=key, campo=campo, valor=valor))
+            self.modelo.objects.bulk_create(filas)
+
+    def update(self, key, **campos):
+        with transaction.atomic():
+            for campo, valor in campos.items():
+                if isinstance(valor, list):
+                    self.modelo_elemento.objects.filter(
+                        progress_key=key, campo=campo
+                    ).delete()
+                    valor = self._escribir_lista(key, campo, valor)
+                self.modelo.objects.update_or_create(
+                    progress_key=key, campo=campo, defaults={"valor": valor}
+                )
+
+    def _modificar(self, key, campo, funcion, inicial):
+        with transaction.atomic():
+            fila, _ = self.modelo.objects.select_for_update().get_or_create(
+                progress_key=key, campo=campo, defaults={"valor": inicial}
+            )
+            fila.valor = funcion(fila.valor if fila.valor is not None else inicial)
+            fila.save(update_fields=["valor", "updated_at"])
+            return fila.valor
+
+    def incr(self, key, campo, n=1):
+        return self._modificar(key, campo, lambda valor: valor + n, 0)
+
+    def append(self, key, campo, valor):
+        self.extend(key, campo, [valor])
+
+    def extend(self, key, campo, valores):
+        # La fila de la marca bloqueada reserva las posiciones: dos escritores
+        # a la vez no numeran igual sus elementos
+        if valores:
+            self._modificar(
+                key,
+                campo,
+                lambda marca: self._escribir_lista(
+                    key, campo, list(valores), self._longitud(marca)
+                ),
+                {self.MARCA_LISTA: 0},
+            )
+
+    def set_resultado(self, key, nombre, resultado):
+        self.update(key, **{f"{PREFIJO_RESULTADO}{nombre}": resultado})
+
+    def delete(self, key):
+        self.modelo_elemento.objects.filter(progress_key=key).delete()
+        self.modelo.objects.filter(progress_key=key).delete()
+
+    def purgar(self, antes_de):
+        """Borra los progresos sin escrituras desde ``antes_de``"""
+        claves = list(
+            self.modelo.objects.values("progress_key")
+            .annotate(ultima=Max("updated_at"))
+            .filter(ultima__lt=antes_de)
+            .values_list("progress_key", flat=True)
+        )
+        if not claves:
+            return 0
+        self.modelo_elemento.objects.filter(progress_key__in=claves).delete()
+        self.modelo.objects.filter(progress_key__in=claves).delete()
+        return len(claves)
+
+
+BACKENDS = {
+    "memory": MemoryProgressStore,
+    "redis": RedisProgressStore,
+    "db": DatabaseProgressStore,
+}
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_progress_store(nombre=None):
+    """Devuelve el almacén de progreso configurado (uno por backend)"""
+    nombre = nombre or getattr(settings, "CRAWL_PROGRESS_BACKEND", "db")
+    with _stores_lock:
+        if nombre not in _stores:
+            _stores[nombre] = BACKENDS[nombre]()
+        return _stores[nombre]
+
+
+def leer_progreso(store, key, desde=0):
+    """``store.get`` con las ``urls`` de la búsqueda leídas de ``DiscoveredUrl``"""
+    documento = store.get(key, desde=desde)
+    if documento and documento.get("busqueda_id"):
+        from core.models import DiscoveredUrl
+
+        documento["urls"] = list(
+            DiscoveredUrl.objects.filter(
+                busqueda_id=documento["busqueda_id"]
+            ).values_list("url", flat=True)[desde:]
+        )
+    return documento
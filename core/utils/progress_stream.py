@@ -0,0 +1,121 @@
+"""
+Canal push (Server-Sent Events) del progreso de un crawling.
+
+La plantilla consultaba ``/crawling/progreso/`` cada segundo: cada consulta era
+una petición Django completa que devolvía otra vez la lista entera de URLs.
+Con ``FlujoProgreso`` el navegador abre una sola conexión ``EventSource`` y el
+servidor le envía únicamente los cambios (URLs nuevas, contador, última URL y
+si terminó), leyendo del store compartido solo las URLs posteriores al cursor.
+
+Cada evento lleva como ``id`` el número de URLs ya enviadas: si la conexión se
+corta, ``EventSource`` reconecta con la cabecera ``Last-Event-ID`` y el flujo
+continúa desde ahí, sin reenviar lo anterior.
+
+El flujo solo se sirve bajo ASGI (ver ``prestaLabs/asgi.py``), con un
+iterador asíncrono que no ocupa un hilo por cliente. Bajo WSGI la vista
+responde 204 y el navegador consulta ``/crawling/progreso/?since=`` cada
+pocos segundos.
+"""
+
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from core.utils.progress_store import leer_progreso
+
+
+def cursor_desde(request):
+    """Posición desde la que el cliente quiere las URLs (``Last-Event-ID`` o
+    ``?since=``). Lanza ``ValueError`` si no es un entero."""
+    valor = request.headers.get("Last-Event-ID") or request.GET.get("since") or 0
+    return max(int(valor), 0)
+
+
+def formatear_evento(evento, datos, id_evento=None):
+    """Serializa un evento SSE"""
+    lineas = []
+    if id_evento is not None:
+        lineas.append(f"id: {id_evento}")
+    lineas.append(f"event: {evento}")
+    lineas.append(f"data: {json.dumps(datos)}")
+    return "\n".join(lineas) + "\n\n"
+
+
+class FlujoProgreso:
+    """Genera los eventos SSE del progreso ``progress_key`` a partir de ``desde``"""
+
+    def __init__(self, store, progress_key, desde=0):
+        self.store = store
+        self.progress_key = progress_key
+        self.enviados = max(int(desde or 0), 0)
+        self.intervalo = getattr(settings, "CRAWL_SSE_INTERVAL_MS", 2000) / 1000
+        self.max_segundos = getattr(settings, "CRAWL_SSE_MAX_SEGUNDOS", 300)
+        self.keepalive = getattr(settings, "CRAWL_SSE_KEEPALIVE", 15)
+        self.terminado = False
+        self._ultimo = None
+        self._ultimo_envio = time.monotonic()
+
+    def leer(self):
+        """Devuelve los eventos pendientes (lista de str) según el store"""
+        documento = leer_progreso(self.store, self.progress_key, desde=self.enviados)
+        if documento is None:
+            self.terminado = True
+            return [formatear_evento("error", {"error": "Clave inválida"})]
+
+        nuevas = documento.get("urls") or []
+        estado = (
+            documento.get("count", 0),
+            documento.get("last"),
+            bool(documento.get("done")),
+        )
+        eventos = []
+        if nuevas or estado != self._ultimo:
+            eventos.append(
+                formatear_evento(
+                    "progreso",
+                    {
+                        "desde": self.enviados,
+                        "urls": nuevas,
+                        "count": estado[0],
+                        "last": estado[1],
+                        "done": estado[2],
+                    },
+                    id_evento=self.enviados + len(nuevas),
+                )
+            )
+            self.enviados += len(nuevas)
+            self._ultimo = estado
+        if estado[2]:
+            self.terminado = True
+            eventos.append(formatear_evento("fin", {"count": estado[0]}))
+        elif not eventos and time.monotonic() - self._ultimo_envio >= self.keepalive:
+            # Comentario SSE: mantiene viva la conexión a través de proxies
+            eventos.append(": ping\n\n")
+        if eventos:
+            self._ultimo_envio = time.monotonic()
+        return eventos
+
+    def _leer_en_hilo(self):
+        """``leer`` para un hilo del pool: el backend ``db`` abre ahí una
+        conexión propia que Django no cierra fuera del ciclo de una petición,
+        así que se libera al terminar cada lectura."""
+        try:
+            return self.leer()
+        finally:
+            close_old_connections()
+
+    async def __aiter__(self):
+        limite = time.monotonic() + self.max_segundos
+        # Fuera del hilo compartido de sync_to_async: un cliente lento no
+        # bloquea a los demás flujos ni a las vistas síncronas
+        leer = sync_to_async(self._leer_en_hilo, thread_sensitive=False)
+        while True:
+            for evento in await leer():
+                yield evento
+            if self.terminado or time.monotonic() >= limite:
+                return
+            await asyncio.sleep(self.intervalo)
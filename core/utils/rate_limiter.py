@@ -0,0 +1,167 @@
+"""
+Control adaptativo del ritmo de peticiones por host.
+
+Los crawlers esperaban ``crawl_delay * (1 + bloqueos * 0.5)`` antes de cada
+petición y duplicaban ``crawl_delay`` en cada bloqueo: demasiado lento en
+hosts sanos y sin memoria entre crawlings. ``LimitadorHost`` combina:
+
+- Un token bucket (``tasa`` peticiones/segundo con ráfagas de
+  ``CRAWL_RATE_RAFAGA``) compartido por todos los workers del host.
+- AIMD: cada respuesta rápida 2xx/3xx suma ``CRAWL_RATE_INCREMENTO`` a la
+  tasa (hasta ``CRAWL_RATE_MAX``); un 429/503, un bloqueo, un error de red o
+  un pico de latencia (``CRAWL_RATE_PICO_LATENCIA`` veces la media) la
+  reducen a la mitad (hasta ``CRAWL_RATE_MIN``).
+- ``Retry-After``: no se pide nada al host hasta que vence.
+- El ``Crawl-delay`` de robots.txt como intervalo mínimo.
+
+``cargar_limitador`` y ``guardar_limitador`` persisten la tasa aprendida por
+dominio (``HostRate``) para que el siguiente crawling empiece donde terminó
+el anterior.
+"""
+
+import asyncio
+import threading
+import time
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.models import HostRate
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def parse_retry_after(valor):
+    """Segundos de ``Retry-After`` (entero o fecha HTTP), o None"""
+    if not valor:
+        return None
+    valor = valor.strip()
+    if valor.isdigit():
+        segundos = int(valor)
+    else:
+        try:
+            segundos = (parsedate_to_datetime(valor) - timezone.now()).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(segundos, 0), _config("CRAWL_RETRY_AFTER_MAX", 300))
+
+
+class LimitadorHost:
+    """Token bucket con ajuste AIMD de la tasa de un host.
+
+    ``tasa=None`` no limita (pero sigue respetando ``Retry-After`` y el
+    ``Crawl-delay``) hasta la primera señal de sobrecarga.
+    """
+
+    def __init__(self, tasa=None, latencia=None, espera_inicial=0):
+        self.tasa_max = _config("CRAWL_RATE_MAX", 10.0)
+        self.tasa_min = _config("CRAWL_RATE_MIN", 0.2)
+        self.tasa = min(tasa, self.tasa_max) if tasa else None
+        self.latencia = latencia
+        self.intervalo_minimo = 0
+        self.bloqueado_hasta = time.monotonic() + espera_inicial
+        self._tat = 0
+        self._ultima_reduccion = 0
+        self._lock = threading.Lock()
+
+    def fijar_crawl_delay(self, delay):
+        """Intervalo mínimo entre peticiones pedido por robots.txt"""
+        self.intervalo_minimo = delay or 0
+        if self.intervalo_minimo:
+            self.tasa_max = min(self.tasa_max, 1 / self.intervalo_minimo)
+            self.tasa_min = min(self.tasa_min, self.tasa_max)
+            if self.tasa:
+                self.tasa = min(self.tasa, self.tasa_max)
+
+    def _intervalo(self):
+        return max(1 / self.tasa if self.tasa else 0, self.intervalo_minimo)
+
+    def reservar(self):
+        """Reserva el siguiente turno. Devuelve los segundos a esperar"""
+        with self._lock:
+            ahora = time.monotonic()
+            inicio = max(ahora, self.bloqueado_hasta)
+            intervalo = self._intervalo()
+            tat = max(self._tat, inicio)
+            tolerancia = (_config("CRAWL_RATE_RAFAGA", 2) - 1) * intervalo
+            if self.intervalo_minimo:
+                tolerancia = 0
+            self._tat = tat + intervalo
+            return max(tat - tolerancia - ahora, inicio - ahora, 0)
+
+    async def adquirir(self):
+        espera = self.reservar()
+        if espera:
+            await asyncio.sleep(espera)
+
+    def esperar(self):
+        espera = self.reservar()
+        if espera:
+            time.sleep(espera)
+
+    def registrar(self, status_code, latencia, retry_after=None, bloqueado=False):
+        """Ajusta la tasa según la respuesta (``status_code=0``: error de red)"""
+        with self._lock:
+            if retry_after:
+                self.bloqueado_hasta = max(
+                    self.bloqueado_hasta, time.monotonic() + retry_after
+                )
+            pico = (
+                self.latencia is not None
+                and latencia > 0.5
+                and latencia > self.latencia * _config("CRAWL_RATE_PICO_LATENCIA", 3.0)
+            )
+            if bloqueado or pico or status_code in (0, 429, 503):
+                self._reducir()
+            elif 200 <= status_code < 400:
+                self.latencia = (
+                    latencia
+                    if self.latencia is None
+                    else 0.8 * self.latencia + 0.2 * latencia
+                )
+                if self.tasa:
+                    self.tasa = min(
+                        self.tasa + _config("CRAWL_RATE_INCREMENTO", 0.25),
+                        self.tasa_max,
+                    )
+
+    def _reducir(self):
+        ahora = time.monotonic()
+        # Las respuestas ya en vuelo no vuelven a reducir la tasa recién reducida
+        if ahora - self._ultima_reduccion < self._intervalo():
+            return
+        self._ultima_reduccion = ahora
+        self.tasa = max((self.tasa or self.tasa_max) / 2, self.tasa_min)
+        print(f"[RATE] Tasa reducida a {self.tasa:.2f} peticiones/s")
+
+    def espera_pendiente(self):
+        return max(self.bloqueado_hasta - time.monotonic(), 0)
+
+
+def cargar_limitador(dominio):
+    """Limitador del dominio con la tasa aprendida en el crawling anterior"""
+    fila = HostRate.objects.filter(dominio=dominio.lower()).first()
+    if fila is None:
+        return LimitadorHost(tasa=_config("CRAWL_RATE_INICIAL", 1.0))
+    espera = 0
+    if fila.bloqueado_hasta:
+        espera = max((fila.bloqueado_hasta - timezone.now()).total_seconds(), 0)
+    return LimitadorHost(tasa=fila.tasa, latencia=fila.latencia, espera_inicial=espera)
+
+
+def guardar_limitador(dominio, limitador):
+    espera = limitador.espera_pendiente()
+    HostRate.objects.update_or_create(
+        dominio=dominio.lower(),
+        defaults={
+            "tasa": limitador.tasa,
+            "latencia": limitador.latencia,
+            "bloqueado_hasta": (
+                timezone.now() + timedelta(seconds=espera) if espera else None
+            ),
+        },
+    )
@@ -0,0 +1,198 @@
+"""
+Servicio de robots.txt compartido por crawlers y sitemaps.
+
+Antes ``crawl_urls``, ``try_sitemap_fallback`` y ``buscar_sitemap`` descargaban
+robots.txt cada uno por su lado y solo miraban ``Crawl-delay`` y ``Sitemap:``;
+``Disallow`` se ignoraba. Ahora:
+
+- ``obtener_reglas`` descarga robots.txt una vez por host y guarda las reglas
+  ya parseadas en ``RobotsTxt`` durante ``CRAWL_ROBOTS_TTL`` segundos.
+- ``ReglasRobots`` elige el grupo del user-agent más específico
+  (``CRAWL_ROBOTS_USER_AGENT`` o ``*``) y aplica ``Allow``/``Disallow`` con
+  comodines ``*`` y ``$``: gana la regla más larga y, a igual longitud,
+  ``Allow``.
+- La frontera descarta las URLs prohibidas antes de pedirlas
+  (``CrawlFrontier.filtrar``) y el ``Crawl-delay`` del grupo marca el ritmo
+  mínimo entre peticiones al host.
+
+Un robots.txt inexistente (4xx) permite todo. Si el servidor falla (5xx o
+error de red) también se permite todo, pero no se guarda para reintentar en
+el siguiente crawling.
+"""
+
+import re
+from datetime import timedelta
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from core.models import RobotsTxt
+
+from .http_client import http_get
+
+
+def user_agent_robots():
+    return getattr(settings, "CRAWL_ROBOTS_USER_AGENT", "PrestaLab")
+
+
+def _patron(regla):
+    """Regex de una ruta de robots.txt (``*`` comodín, ``$`` fin de URL)"""
+    anclada = regla.endswith("$")
+    if anclada:
+        regla = regla[:-1]
+    regex = ".*".join(re.escape(parte) for parte in regla.split("*"))
+    return re.compile(regex + ("$" if anclada else ""))
+
+
+def parse_robots(texto):
+    """Parsea robots.txt a ``{"grupos": [...], "sitemaps": [...]}``.
+
+    Cada grupo es ``{"agentes", "reglas": [[allow, ruta], ...], "crawl_delay"}``;
+    varias líneas ``User-agent`` seguidas comparten grupo.
+    """
+    grupos = []
+    sitemaps = []
+    grupo = None
+    abriendo_grupo = False
+    for linea in texto.splitlines():
+        linea = linea.split("#", 1)[0].strip()
+        if ":" not in linea:
+            continue
+        campo, valor = (parte.strip() for parte in linea.split(":", 1))
+        campo = campo.lower()
+        if campo == "sitemap":
+            if valor:
+                sitemaps.append(valor)
+            continue
+        if campo == "user-agent":
+            if not abriendo_grupo:
+                grupo = {"agentes": [], "reglas": [], "crawl_delay": None}
+                grupos.append(grupo)
+            grupo["agentes"].append(valor.lower())
+            abriendo_grupo = True
+            continue
+        abriendo_grupo = False
+        if grupo is None:
+            continue
+        if campo in ("allow", "disallow") and valor:
+            # "Disallow:" vacío no prohíbe nada
+            grupo["reglas"].append([campo == "allow", valor])
+        elif campo == "crawl-delay":
+            try:
+                grupo["crawl_delay"] = float(valor)
+            except ValueError:
+                pass
+    return {"grupos": grupos, "sitemaps": sitemaps}
+
+
+class ReglasRobots:
+    """Reglas parseadas de un robots.txt (vacías: se permite todo)"""
+
+    def __init__(self, datos=None):
+        datos = datos or {}
+        self.grupos = datos.get("grupos", [])
+        self.sitemaps = datos.get("sitemaps", [])
+        self._por_agente = {}
+
+    @classmethod
+    def desde_texto(cls, texto):
+        return cls(parse_robots(texto))
+
+    def como_dict(self):
+        return {"grupos": self.grupos, "sitemaps": self.sitemaps}
+
+    def _grupo(self, user_agent):
+        """Reglas y Crawl-delay del grupo más específico para ``user_agent``"""
+        user_agent = user_agent.lower()
+        if user_agent not in self._por_agente:
+            mejor = None
+            for grupo in self.grupos:
+                for agente in grupo["agentes"]:
+                    if agente == "*":
+                        longitud = 0
+                    elif agente in user_agent:
+                        longitud = len(agente)
+                    else:
+                        continue
+                    if mejor is None or longitud > mejor[0]:
+                        mejor = (longitud, [grupo])
+                    elif longitud == mejor[0] and grupo not in mejor[1]:
+                        mejor[1].append(grupo)
+            grupos = mejor[1] if mejor else []
+            reglas = [
+                (len(ruta), allow, _patron(ruta))
+                for grupo in grupos
+                for allow, ruta in grupo["reglas"]
+            ]
+            delays = [g["crawl_delay"] for g in grupos if g["crawl_delay"] is not None]
+            self._por_agente[user_agent] = (reglas, max(delays) if delays else None)
+        return self._por_agente[user_agent]
+
+    def permitido(self, url, user_agent=None):
+        reglas, _ = self._grupo(user_agent or user_agent_robots())
+        if not reglas:
+            return True
+        partes = urlparse(url)
+        ruta = (partes.path or "/") + (f"?{partes.query}" if partes.query else "")
+        mejor = None
+        for longitud, allow, patron in reglas:
+            if patron.match(ruta) and (
+                mejor is None or (longitud, allow) > (mejor[0], mejor[1])
+            ):
+                mejor = (longitud, allow)
+        return mejor is None or mejor[1]
+
+    def crawl_delay(self, user_agent=None):
+        return self._grupo(user_agent or user_agent_robots())[1]
+
+
+def reglas_desde_respuesta(status_code, texto):
+    """Reglas según la respuesta de robots.txt"""
+    if 200 <= status_code < 300:
+        return ReglasRobots.desde_texto(texto)
+    return ReglasRobots()
+
+
+def reglas_guardadas(host):
+    """Reglas del host guardadas hace menos de ``CRAWL_ROBOTS_TTL`` segundos"""
+    limite = timezone.now() - timedelta(
+        seconds=getattr(settings, "CRAWL_ROBOTS_TTL", 86400)
+    )
+    fila = RobotsTxt.objects.filter(host=host.lower(), fetched_at__gte=limite).first()
+    return ReglasRobots(fila.reglas) if fila else None
+
+
+def guardar_reglas(host, reglas, status_code):
+    if status_code >= 500:
+        return
+    RobotsTxt.objects.update_or_create(
+        host=host.lower(),
+        defaults={
+            "reglas": reglas.como_dict(),
+            "status_code": status_code,
+            "fetched_at": timezone.now(),
+        },
+    )
+
+
+def obtener_reglas(host):
+    """Reglas de robots.txt del host: guardadas o descargadas una vez"""
+    host = host.lower()
+    reglas = reglas_guardadas(host)
+    if reglas is not None:
+        return reglas
+    try:
+        resp = http_get(
+            f"https://{host}/robots.txt",
+            timeout=10,
+            headers={"User-Agent": user_agent_robots()},
+        )
+    except requests.RequestException as e:
+        print(f"[ROBOTS] Error accediendo robots.txt de {host}: {str(e)[:50]}")
+        return ReglasRobots()
+    print(f"[ROBOTS] robots.txt de {host} -> {resp.status_code}")
+    reglas = reglas_desde_respuesta(resp.status_code, resp.text)
+    guardar_reglas(host, reglas, resp.status_code)
+    return reglas
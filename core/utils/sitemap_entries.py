@@ -0,0 +1,211 @@
+"""
+Entradas estructuradas de sitemap.
+
+De un sitemap no solo interesa ``<loc>``: cada ``<url>`` se convierte en un dict ``{"loc", "lastmod", "changefreq",
+"priority"}`` que se persiste por dominio en ``SitemapEntry``. Con esas
+entradas:
+
+- ``entradas_a_recrawlear`` devuelve las URLs cuyo ``lastmod`` es posterior a
+  nuestra última visita (``PageFingerprint.checked_at``) o que nunca se
+  visitaron, para recrawls incrementales.
+- ``entradas_guardadas`` devuelve las entradas ordenadas por ``priority`` para
+  sembrar la frontera con prioridad.
+"""
+
+import gzip
+import io
+from datetime import datetime, time as dt_time, timezone as dt_timezone
+from urllib.parse import urldefrag
+
+from defusedxml.ElementTree import iterparse as ET_iterparse
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from core.models import PageFingerprint, SitemapEntry
+from core.utils.page_fingerprints import hash_url
+from core.utils.url_canon import host_sin_www
+
+CHANGEFREQ_VALIDOS = {
+    "always",
+    "hourly",
+    "daily",
+    "weekly",
+    "monthly",
+    "yearly",
+    "never",
+}
+
+# Entradas por upsert al guardar sitemaps grandes
+LOTE_ENTRADAS_SITEMAP = 500
+
+# Primeros bytes de un archivo gzip (sitemap.xml.gz)
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def _nombre_local(tag):
+    """Nombre de la etiqueta sin namespace (``{ns}url`` -> ``url``)"""
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _texto_hijo(elemento, nombre):
+    for hijo in elemento:
+        if _nombre_local(hijo.tag) == nombre and hijo.text:
+            return hijo.text.strip()
+    return ""
+
+
+def parse_lastmod(texto):
+    """Fecha W3C de ``<lastmod>`` como datetime con zona (UTC si no la trae)"""
+    if not texto:
+        return None
+    try:
+        fecha = parse_datetime(texto)
+        if fecha is None:
+            dia = parse_date(texto[:10])
+            if dia is None:
+                return None
+            fecha = datetime.combine(dia, dt_time.min)
+    except ValueError:
+        return None
+    if timezone.is_naive(fecha):
+        fecha = fecha.replace(tzinfo=dt_timezone.utc)
+    return fecha
+
+
+def parse_priority(texto):
+    try:
+        return min(max(float(texto), 0.0), 1.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def entrada_de_elemento(elemento):
+    """Dict de la entrada ``<url>`` o None si no tiene ``<loc>`` válido"""
+    loc = _texto_hijo(elemento, "loc")
+    if not loc.startswith("http"):
+        return None
+    changefreq = _texto_hijo(elemento, "changefreq").lower()
+    return {
+        "loc": urldefrag(loc)[0],
+        "lastmod": parse_lastmod(_texto_hijo(elemento, "lastmod")),
+        "changefreq": changefreq if changefreq in CHANGEFREQ_VALIDOS else "",
+        "priority": parse_priority(_texto_hijo(elemento, "priority")),
+    }
+
+
+def iterar_sitemap(flujo):
+    """Recorre un sitemap con ``iterparse`` sin cargarlo entero en memoria.
+
+    ``flujo`` es un archivo binario (respuesta HTTP en streaming, ``BytesIO``...)
+    y puede venir comprimido con gzip (``.xml.gz``). Produce tuplas
+    ``("url", entrada)`` y ``("sitemap", loc)`` a medida que se leen y libera
+    cada elemento procesado, así que la memoria no crece con el documento.
+    """
+    if not hasattr(flujo, "peek"):
+        flujo = io.BufferedReader(flujo)
+    if flujo.peek(2)[:2] == GZIP_MAGIC:
+        flujo = gzip.GzipFile(fileobj=flujo)
+    raiz = None
+    for evento, elemento in ET_iterparse(flujo, events=("start", "end")):
+        if evento == "start":
+            if raiz is None:
+                raiz = elemento
+            continue
+        nombre = _nombre_local(elemento.tag)
+        if nombre == "url":
+            entrada = entrada_de_elemento(elemento)
+            if entrada:
+                yield "url", entrada
+        elif nombre == "sitemap":
+            loc = _texto_hijo(elemento, "loc")
+            if loc:
+                yield "sitemap", loc
+        else:
+            continue
+        # Suelta los <url>/<sitemap> ya leídos (hijos directos de la raíz)
+        raiz.clear()
+
+
+def parse_entradas_sitemap(content):
+    """Devuelve ``(entradas, sitemaps_hijos)`` de un sitemap en memoria"""
+    entradas = []
+    hijos = []
+    for tipo, valor in iterar_sitemap(io.BytesIO(content)):
+        (entradas if tipo == "url" else hijos).append(valor)
+    return entradas, hijos
+
+
+def guardar_entradas(dominio, entradas, sitemap_url=""):
+    """Guarda (upsert masivo) las entradas del sitemap de un dominio"""
+    dominio = host_sin_www(dominio.lower())
+    ahora = timezone.now()
+    filas = {}
+    for entrada in entradas:
+        url_hash = hash_url(entrada["loc"])
+        filas[url_hash] = SitemapEntry(
+            url_hash=url_hash,
+            dominio=dominio,
+            url=entrada["loc"][:2000],
+            lastmod=entrada["lastmod"],
+            changefreq=entrada["changefreq"],
+            priority=entrada["priority"],
+            sitemap_url=entrada.get("sitemap_url", sitemap_url)[:2000],
+            seen_at=ahora,
+        )
+    if filas:
+        SitemapEntry.objects.bulk_create(
+            list(filas.values()),
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["url_hash"],
+            update_fields=[
+                "dominio",
+                "url",
+                "lastmod",
+                "changefreq",
+                "priority",
+                "sitemap_url",
+                "seen_at",
+            ],
+        )
+    return len(filas)
+
+
+def _como_entrada(fila):
+    return {
+        "loc": fila.url,
+        "lastmod": fila.lastmod,
+        "changefreq": fila.changefreq,
+        "priority": fila.priority,
+    }
+
+
+def entradas_guardadas(dominio, limite=None):
+    """Entradas del dominio de mayor a menor ``priority``"""
+    filas = SitemapEntry.objects.filter(dominio=host_sin_www(dominio.lower())).order_by(
+        F("priority").desc(nulls_last=True), "id"
+    )
+    if limite:
+        filas = filas[:limite]
+    return [_como_entrada(fila) for fila in filas]
+
+
+def entradas_a_recrawlear(dominio, limite=None):
+    """Entradas modificadas (``lastmod``) después de nuestra última visita.
+
+    Incluye las que nunca se visitaron. Las que no declaran ``lastmod`` y ya
+    se visitaron se omiten: no hay forma de saber si cambiaron.
+    """
+    ultima_visita = PageFingerprint.objects.filter(
+        url_hash=OuterRef("url_hash")
+    ).values("checked_at")[:1]
+    filas = (
+        SitemapEntry.objects.filter(dominio=host_sin_www(dominio.lower()))
+        .annotate(ultima_visita=Subquery(ultima_visita))
+        .filter(Q(ultima_visita__isnull=True) | Q(lastmod__gt=F("ultima_visita")))
+        .order_by(F("priority").desc(nulls_last=True), "id")
+    )
+    if limite:
+        filas = filas[:limite]
+    return [_como_entrada(fila) for fila in filas]
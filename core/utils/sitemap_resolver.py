@@ -0,0 +1,223 @@
+"""
+Descubrimiento unificado del sitemap de un dominio.
+
+``try_sitemap_fallback`` (crawler) y ``buscar_sitemap`` (análisis de dominio)
+leían robots.txt y probaban candidatos cada uno a su manera, con timeouts,
+cabeceras y límites distintos: el mismo dominio podía dar resultados
+diferentes según el punto de entrada. Este módulo es el único camino:
+
+- ``resolver_sitemap`` toma las líneas ``Sitemap:`` de robots.txt
+  (``core.utils.robots``, compartido con los crawlers) y sondea en
+  paralelo los candidatos (solo los primeros KB de cada uno). Devuelve el
+  primer sitemap válido en orden de preferencia, sin esperar a los de menor
+  preferencia, y guarda la ubicación por dominio en la caché de Django
+  (``CRAWL_SITEMAP_CACHE_TTL``; también se recuerda, menos tiempo, que un
+  dominio no tiene sitemap).
+- ``leer_urls_sitemap`` lee el sitemap en streaming (``LectorSitemap``),
+  guarda sus entradas y se queda con las URLs del dominio.
+- ``urls_sitemap_dominio`` combina ambos pasos.
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from .http_client import http_get
+from .robots import obtener_reglas
+from .sitemap_entries import GZIP_MAGIC, LOTE_ENTRADAS_SITEMAP, guardar_entradas
+from .sitemap_stream import LectorSitemap
+from .url_canon import clave_canonica, deduplicar_urls, host_sin_www
+
+CABECERAS_SITEMAP = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/119.0.0.0 Safari/537.36"
+    ),
+    "Accept": "application/xml,text/xml,text/plain,*/*;q=0.8",
+}
+
+# Bytes que se leen de cada candidato para decidir si es un sitemap
+TAM_SONDEO = 4096
+
+# Valor en caché para "este dominio no tiene sitemap"
+SIN_SITEMAP = ""
+
+
+def _timeout():
+    return getattr(settings, "CRAWL_SITEMAP_TIMEOUT", 10)
+
+
+def _clave_cache(dominio):
+    return f"sitemap_resolver:{dominio}"
+
+
+def limpiar_dominio(dominio):
+    """Host sin esquema, barra final ni ``www.``"""
+    dominio = dominio.strip().lower()
+    dominio = urlparse(dominio).netloc if "://" in dominio else dominio
+    return host_sin_www(dominio.strip("/"))
+
+
+def parece_sitemap(inicio):
+    """Indica si los primeros bytes de una respuesta son de un sitemap"""
+    if inicio[:2] == GZIP_MAGIC:
+        return True
+    texto = inicio.decode("utf-8", errors="ignore").lower()
+    if "<urlset" in texto or "<sitemapindex" in texto:
+        return True
+    # Sitemap de texto: una URL por línea y nada de HTML
+    return "<html" not in texto[:500] and (
+        texto.lstrip().startswith(("http://", "https://"))
+    )
+
+
+def candidatos_sitemap(dominio):
+    """Candidatos en orden de preferencia: robots.txt y rutas habituales"""
+    candidatos = obtener_reglas(dominio).sitemaps + [
+        f"https://{dominio}/sitemap.xml",
+        f"https://www.{dominio}/sitemap.xml",
+        f"https://{dominio}/sitemap_index.xml",
+        f"https://{dominio}/sitemaps.xml",
+        f"https://{dominio}/sitemap.xml.gz",
+        f"https://{dominio}/sitemap.php",
+        f"https://{dominio}/sitemap/",
+        f"https://{dominio}/sitemap.txt",
+    ]
+    return list(dict.fromkeys(candidatos))
+
+
+def sondear_sitemap(url):
+    """Descarga solo el inicio de ``url`` y comprueba si es un sitemap"""
+    try:
+        resp = http_get(url, timeout=_timeout(), headers=CABECERAS_SITEMAP, stream=True)
+    except requests.RequestException:
+        return False
+    try:
+        if resp.status_code != 200:
+            return False
+        resp.raw.decode_content = True
+        return parece_sitemap(resp.raw.read(TAM_SONDEO))
+    except Exception:
+        return False
+    finally:
+        resp.close()
+
+
+def _primer_valido(candidatos):
+    """Sondea todos los candidatos a la vez y devuelve el primero válido en
+    orden de preferencia en cuanto los anteriores han fallado"""
+    if not candidatos:
+        return None
+    pool = ThreadPoolExecutor(
+        max_workers=min(
+            len(candidatos), getattr(settings, "CRAWL_SITEMAP_CONCURRENCIA", 4)
+        )
+    )
+    try:
+        futuros = [pool.submit(sondear_sitemap, url) for url in candidatos]
+        for url, futuro in zip(candidatos, futuros):
+            if futuro.result():
+                return url
+        return None
+    finally:
+        # Los sondeos menos preferidos que sigan en vuelo se descartan
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def resolver_sitemap(dominio, usar_cache=True):
+    """URL del sitemap del dominio (o None), cacheada por dominio"""
+    dominio = limpiar_dominio(dominio)
+    if usar_cache:
+        cacheado = cache.get(_clave_cache(dominio))
+        if cacheado is not None:
+            print(f"[SITEMAP] Ubicación en caché para {dominio}: {cacheado or '-'}")
+            return cacheado or None
+    print(f"[SITEMAP] Buscando sitemap de {dominio}")
+    sitemap_url = _primer_valido(candidatos_sitemap(dominio))
+    if sitemap_url:
+        print(f"[SITEMAP] ✅ Sitemap encontrado: {sitemap_url}")
+        ttl = getattr(settings, "CRAWL_SITEMAP_CACHE_TTL", 86400)
+    else:
+        print("[SITEMAP] ❌ No se encontró sitemap accesible")
+        ttl = getattr(settings, "CRAWL_SITEMAP_CACHE_TTL_VACIO", 3600)
+    cache.set(_clave_cache(dominio), sitemap_url or SIN_SITEMAP, ttl)
+    return sitemap_url
+
+
+def _del_dominio(url, dominio):
+    host = host_sin_www(urlparse(url).netloc.lower())
+    return host == dominio or host.endswith(f".{dominio}")
+
+
+def _urls_de_texto(sitemap_url):
+    """URLs de un sitemap de texto (una por línea)"""
+    resp = http_get(sitemap_url, timeout=_timeout(), headers=CABECERAS_SITEMAP)
+    texto = resp.text if resp.status_code == 200 else ""
+    urls = [
+        linea.strip()
+        for linea in texto.splitlines()
+        if linea.strip().startswith(("http://", "https://"))
+    ]
+    return urls or re.findall(r'https?://[^\s<>"]+', texto)
+
+
+def leer_urls_sitemap(sitemap_url, dominio, max_urls=None):
+    """URLs del dominio en el sitemap (y sus hijos), leído en streaming.
+
+    Las entradas completas se guardan por lotes en ``SitemapEntry``.
+    """
+    dominio = limpiar_dominio(dominio)
+    urls = []
+    vistas = set()
+    lote = []
+    lector = LectorSitemap(headers=CABECERAS_SITEMAP, timeout=_timeout())
+    for entrada in lector.entradas(sitemap_url):
+        if not _del_dominio(entrada["loc"], dominio):
+            continue
+        lote.append(entrada)
+        if len(lote) >= LOTE_ENTRADAS_SITEMAP:
+            guardar_entradas(dominio, lote)
+            lote = []
+        clave = clave_canonica(entrada["loc"])
+        if clave in vistas:
+            continue
+        vistas.add(clave)
+        urls.append(entrada["loc"])
+        if max_urls and len(urls) >= max_urls:
+            break
+    if lote:
+        guardar_entradas(dominio, lote)
+    if lector.hijos:
+        print(f"[SITEMAP] {lector.hijos} sitemaps hijos leídos")
+    if not urls and lector.errores:
+        # No es XML: sitemap de texto
+        try:
+            urls = deduplicar_urls(
+                url for url in _urls_de_texto(sitemap_url) if _del_dominio(url, dominio)
+            )
+        except requests.RequestException as e:
+            print(f"[SITEMAP] Error leyendo {sitemap_url}: {str(e)[:50]}")
+    return urls[:max_urls]
+
+
+def urls_sitemap_dominio(dominio, max_urls=None):
+    """URLs del sitemap del dominio (lista vacía si no tiene).
+
+    Si la ubicación venía de la caché y ya no da URLs, se vuelve a buscar.
+    """
+    dominio = limpiar_dominio(dominio)
+    en_cache = cache.get(_clave_cache(dominio)) is not None
+    sitemap_url = resolver_sitemap(dominio)
+    urls = leer_urls_sitemap(sitemap_url, dominio, max_urls) if sitemap_url else []
+    if not urls and sitemap_url and en_cache:
+        print("[SITEMAP] ⚠️ El sitemap en caché no dio URLs, buscando de nuevo")
+        sitemap_url = resolver_sitemap(dominio, usar_cache=False)
+        urls = leer_urls_sitemap(sitemap_url, dominio, max_urls) if sitemap_url else []
+    if urls:
+        print(f"[SITEMAP] 🎉 Encontradas {len(urls)} URLs en sitemap")
+    return urls
@@ -0,0 +1,127 @@
+"""
+Lector de sitemaps en streaming.
+
+Los sitemaps se cargaban enteros con ``fromstring``, se cortaban en 100 URLs y
+se seguían como mucho 5 sitemaps hijos. ``LectorSitemap`` descarga cada sitemap en streaming, lo recorre con
+``iterparse`` (``core.utils.sitemap_entries.iterar_sitemap``) y produce las
+entradas con un generador: un sitemap de 50.000 URLs se procesa con memoria
+constante.
+
+Los hijos de un ``<sitemapindex>`` (también índices anidados) se leen en
+paralelo en un pool de hilos, hasta ``CRAWL_SITEMAP_MAX_HIJOS`` sitemaps con
+``CRAWL_SITEMAP_CONCURRENCIA`` descargas simultáneas. Los hilos entregan las
+entradas por una cola acotada: si el consumidor va más lento, esperan en vez de
+acumularlas. Al cerrar el generador (p. ej. tras alcanzar un límite de URLs)
+los hilos se detienen.
+"""
+
+import io
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .http_client import http_get
+from .sitemap_entries import iterar_sitemap
+
+# Entradas que pueden esperar en la cola entre los hilos y el consumidor
+TAM_COLA = 1000
+
+_FIN = object()
+
+
+class LectorSitemap:
+    """Lee un sitemap (o índice de sitemaps) y sus hijos en streaming"""
+
+    def __init__(self, headers=None, max_hijos=None, concurrencia=None, timeout=15):
+        self.headers = headers or {}
+        self.max_hijos = (
+            max_hijos
+            if max_hijos is not None
+            else getattr(settings, "CRAWL_SITEMAP_MAX_HIJOS", 50)
+        )
+        self.concurrencia = concurrencia or getattr(
+            settings, "CRAWL_SITEMAP_CONCURRENCIA", 4
+        )
+        self.timeout = timeout
+        self.hijos = 0
+        # (url, mensaje) de los sitemaps que no se pudieron leer
+        self.errores = []
+
+    def _recorrer(self, url, contenido=None):
+        if contenido is not None:
+            yield from iterar_sitemap(io.BytesIO(contenido))
+            return
+        resp = http_get(url, timeout=self.timeout, headers=self.headers, stream=True)
+        try:
+            if resp.status_code != 200:
+                raise ValueError(f"status {resp.status_code}")
+            # Descomprime Content-Encoding; los .xml.gz los detecta iterar_sitemap
+            resp.raw.decode_content = True
+            yield from iterar_sitemap(resp.raw)
+        finally:
+            resp.close()
+
+    def entradas(self, sitemap_url, contenido=None):
+        """Genera las entradas ``<url>`` de ``sitemap_url`` y de sus hijos.
+
+        Si ya se descargó el sitemap raíz se pasa en ``contenido`` (bytes).
+        Cada entrada lleva en ``sitemap_url`` el sitemap del que proviene.
+        """
+        cola = queue.Queue(maxsize=TAM_COLA)
+        cancelado = threading.Event()
+        lock = threading.Lock()
+        vistos = {sitemap_url}
+        lanzados = [1]
+        pool = ThreadPoolExecutor(max_workers=self.concurrencia)
+
+        def poner(item):
+            while not cancelado.is_set():
+                try:
+                    cola.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def leer(url, contenido=None):
+            try:
+                for tipo, valor in self._recorrer(url, contenido):
+                    if tipo == "url":
+                        valor["sitemap_url"] = url
+                        if not poner(valor):
+                            return
+                        continue
+                    with lock:
+                        if (
+                            valor in vistos
+                            or self.hijos >= self.max_hijos
+                            or cancelado.is_set()
+                        ):
+                            continue
+                        vistos.add(valor)
+                        self.hijos += 1
+                        lanzados[0] += 1
+                    pool.submit(leer, valor)
+            except Exception as e:
+                self.errores.append((url, str(e)[:100]))
+                print(f"[SITEMAP] Error leyendo {url or 'sitemap'}: {str(e)[:100]}")
+            finally:
+                poner(_FIN)
+
+        pool.submit(leer, sitemap_url, contenido)
+        terminados = 0
+        try:
+            while True:
+                item = cola.get()
+                if item is not _FIN:
+                    yield item
+                    continue
+                terminados += 1
+                with lock:
+                    if terminados == lanzados[0]:
+                        return
+        finally:
+            cancelado.set()
+            pool.shutdown(wait=False, cancel_futures=True)
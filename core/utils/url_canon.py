@@ -0,0 +1,173 @@
+"""
+Canonicalización de URLs compartida por los crawlers y los parsers de sitemap.
+
+Una misma página suele aparecer con muchas grafías (``http``/``https``,
+``www``/sin ``www``, barra final, ``#fragmento``, puerto por defecto,
+parámetros ``utm_*`` u orden distinto de la query). ``clave_canonica``
+devuelve la clave con la que se deduplica: ignora el esquema, el ``www``, la
+barra final y el orden de la query. Los crawlers descargan y guardan la URL
+original (``url_absoluta``), no la clave: hay servidores que distinguen
+``/ruta`` de ``/ruta/`` o que dependen del orden o la codificación de los
+parámetros.
+
+``canonicalizar_url`` aplica solo las reglas que no cambian la página
+(esquema y host en minúsculas, puerto por defecto, fragmento, parámetros de
+seguimiento); por defecto no toca la barra final ni reordena la query, y los
+valores de la query nunca se recodifican.
+
+Las reglas se pueden ajustar por dominio con ``URL_CANONICAL_RULES`` en
+settings, por ejemplo::
+
+    URL_CANONICAL_RULES = {
+        "tienda.com": {"force_https": True, "keep_params": ["page", "sku"]},
+    }
+"""
+
+from fnmatch import fnmatchcase
+from urllib.parse import unquote_plus, urldefrag, urljoin, urlsplit, urlunsplit
+
+from django.conf import settings
+
+# Parámetros de seguimiento que nunca cambian el contenido de la página
+TRACKING_PARAMS = (
+    "utm_*",
+    "gclid",
+    "gclsrc",
+    "dclid",
+    "fbclid",
+    "msclkid",
+    "yclid",
+    "mc_cid",
+    "mc_eid",
+    "_ga",
+    "_gl",
+    "igshid",
+    "ref_src",
+)
+
+REGLAS_POR_DEFECTO = {
+    # Reescribir http:// como https://
+    "force_https": False,
+    # Quitar el prefijo www. del host
+    "strip_www": False,
+    # "strip" quita la barra final, "add" la agrega, "keep" no la toca
+    "trailing_slash": "keep",
+    # Parámetros extra a eliminar (admite comodines, como TRACKING_PARAMS)
+    "strip_params": (),
+    # Si se define, solo se conservan estos parámetros de la query
+    "keep_params": None,
+    # Ordenar los parámetros de la query alfabéticamente
+    "sort_query": False,
+    # Pasar el path a minúsculas (solo para servidores case-insensitive)
+    "lowercase_path": False,
+}
+
+PUERTOS_POR_DEFECTO = {"http": 80, "https": 443}
+
+
+def host_sin_www(host):
+    host = host.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def reglas_para(host, reglas=None):
+    """Combina las reglas por defecto, las del dominio y las recibidas"""
+    combinadas = dict(REGLAS_POR_DEFECTO)
+    por_dominio = getattr(settings, "URL_CANONICAL_RULES", {})
+    combinadas.update(por_dominio.get(host_sin_www(host), {}))
+    if reglas:
+        combinadas.update(reglas)
+    return combinadas
+
+
+def _es_tracking(nombre, patrones):
+    nombre = nombre.lower()
+    return any(fnmatchcase(nombre, patron) for patron in patrones)
+
+
+def canonicalizar_url(url, reglas=None):
+    """Devuelve la forma canónica (y descargable) de una URL absoluta"""
+    url = url.strip()
+    try:
+        partes = urlsplit(url)
+        port = partes.port
+    except ValueError:
+        return url
+    scheme = partes.scheme.lower()
+    if scheme not in PUERTOS_POR_DEFECTO or not partes.hostname:
+        return url
+
+    r = reglas_para(partes.hostname, reglas)
+    if r["force_https"]:
+        scheme = "https"
+
+    host = partes.hostname.lower().rstrip(".")
+    if r["strip_www"]:
+        host = host_sin_www(host)
+    if port and port != PUERTOS_POR_DEFECTO.get(partes.scheme.lower()):
+        host = f"{host}:{port}"
+    if partes.username:
+        credenciales = partes.username
+        if partes.password:
+            credenciales += f":{partes.password}"
+        host = f"{credenciales}@{host}"
+
+    path = partes.path or "/"
+    if r["lowercase_path"]:
+        path = path.lower()
+    if path != "/":
+        if r["trailing_slash"] == "strip":
+            path = path.rstrip("/") or "/"
+        elif r["trailing_slash"] == "add" and not path.endswith("/"):
+            ultimo = path.rsplit("/", 1)[-1]
+            if "." not in ultimo:
+                path += "/"
+
+    patrones = tuple(getattr(settings, "URL_TRACKING_PARAMS", TRACKING_PARAMS)) + tuple(
+        r["strip_params"]
+    )
+    # Se filtra por nombre pero se conservan los parámetros tal cual vienen
+    params = [
+        (unquote_plus(param.split("=", 1)[0]), param)
+        for param in partes.query.split("&")
+        if param
+    ]
+    params = [(k, param) for k, param in params if not _es_tracking(k, patrones)]
+    if r["keep_params"] is not None:
+        params = [(k, param) for k, param in params if k in r["keep_params"]]
+    if r["sort_query"]:
+        params.sort()
+    query = "&".join(param for _, param in params)
+
+    # El fragmento nunca llega al servidor: se descarta siempre
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def url_absoluta(base, href):
+    """URL que se descarga y se guarda: ``href`` absoluto, sin fragmento"""
+    return urldefrag(urljoin(base, href.strip()))[0]
+
+
+def clave_canonica(url, reglas=None):
+    """Clave de deduplicación: URL canónica sin esquema, www ni barra final y
+    con la query ordenada"""
+    canonica = canonicalizar_url(
+        url, {**(reglas or {}), "trailing_slash": "strip", "sort_query": True}
+    )
+    partes = urlsplit(canonica)
+    if not partes.netloc:
+        return canonica
+    netloc = host_sin_www(partes.netloc)
+    return urlunsplit(("", netloc, partes.path, partes.query, ""))
+
+
+def deduplicar_urls(urls, reglas=None):
+    """Elimina las grafías repetidas de una lista de URLs (queda la primera)"""
+    vistas = set()
+    resultado = []
+    for url in urls:
+        clave = clave_canonica(url, reglas)
+        if clave not in vistas:
+            vistas.add(clave)
+            resultado.append(urldefrag(url.strip())[0])
+    return resultado
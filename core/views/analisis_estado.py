@@ -6,6 +6,8 @@ from django.contrib.auth.decorators import login_required
 from celery.result import AsyncResult
 from django.conf import settings
 
+from core.utils.progress_stream import cursor_desde
+
 
 @csrf_exempt
 @login_required
@@ -62,20 +64,25 @@ def analisis_estado(request):
             except CrawlingProgress.DoesNotExist:
                 pass
 
-            # Si tenemos progreso activo, usar esos datos. Si no, usar los de BusquedaDominio
+            # Si tenemos progreso activo, usar esos datos. Si no, usar los de BusquedaDominio.
+            # Con ?since=n solo se devuelven las URLs a partir de la posición n
+            try:
+                desde = cursor_desde(request)
+            except ValueError:
+                desde = 0
             if progreso:
-                urls_list = progreso.get_urls_list()
+                resultados = progreso.get_urls_list(desde=desde)
                 total_urls = progreso.count
-                resultados = urls_list
             else:
-                urls_list = busqueda.get_urls()
-                total_urls = len(urls_list)
-                resultados = urls_list
+                resultados = busqueda.get_urls(desde=desde)
+                total_urls = busqueda.url_count
 
             data = {
                 "tipo": "dominio",
                 "dominio": busqueda.dominio,
                 "resultados": resultados,
+                "since": desde,
+                "next": desde + len(resultados),
                 "total_urls": total_urls,
                 "timestamp": fecha_inicio.strftime("%Y-%m-%d %H:%M"),
                 "usuario": busqueda.usuario.username if busqueda.usuario else None,
@@ -114,6 +121,8 @@ def analisis_estado(request):
                         "total": data["total_urls"] if data else 0,
                         "count": data["total_urls"] if data else 0,
                         "urls": data["resultados"] if data else [],
+                        "since": data.get("since", 0) if data else 0,
+                        "next": data.get("next") if data else None,
                         "timestamp": data["timestamp"] if data else None,
                         "porcentaje": (
                             min(99, data["total_urls"])
@@ -1,12 +1,13 @@
-import requests
 from bs4 import BeautifulSoup
 import re
 
+from core.utils.http_client import http_get_pagina
+
 
 def analizar_formularios(url):
     """Analiza formularios en una URL"""
     try:
-        resp = requests.get(url, timeout=10, headers={"User-Agent": "PrestaLab"})
+        resp = http_get_pagina(url, timeout=10, headers={"User-Agent": "PrestaLab"})
         soup = BeautifulSoup(resp.content, "html.parser")
         forms = soup.find_all("form")
         resultados = {
@@ -30,7 +31,7 @@ def analizar_formularios(url):
 def analizar_analytics(url):
     """Busca Google Analytics, GTM, etc."""
     try:
-        resp = requests.get(url, timeout=10)
+        resp = http_get_pagina(url, timeout=10)
         content = resp.text
         analytics_data = {
             "google_analytics": False,
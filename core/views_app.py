@@ -1,22 +1,49 @@
-import threading
+import asyncio
 import time
 import re
 import random
 import json
 import csv
-from urllib.parse import urljoin, urlparse
-from defusedxml.ElementTree import fromstring as ET_fromstring
 import requests
-from bs4 import BeautifulSoup
+from urllib.parse import urljoin, urlparse
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db.models import Q
-from django.http import JsonResponse, HttpResponse
+from django.db import close_old_connections
+from django.db.models import OuterRef, Q, Subquery
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.utils import timezone
+from django.utils.safestring import mark_safe
+from celery.result import AsyncResult
+from kombu.exceptions import OperationalError
+from functools import partial
 from datetime import datetime
 from .forms import AdminSetPasswordForm, DominioForm
+from .tasks import tarea_crawl_dominio
+from .utils.async_crawler import MAX_COLA, crawl_urls_async
+from .utils.crawl_reaper import heartbeat_limite
+from .utils.crawl_scheduler import CrawlRechazado, get_scheduler
+from .utils.crawl_status import (
+    STATUS_ABANDONADO,
+    STATUS_DETENIDO,
+    STATUS_ERROR,
+    formatear_duracion,
+)
+from .utils.frontier import CrawlFrontier
+from .utils.http_client import DescargaDescartada, http_get, http_get_pagina
+from .utils.link_extractor import get_link_extractor
+from .utils.page_fingerprints import HuellasDominio
+from .utils.progress_buffer import ProgresoIncremental, solicitar_detencion
+from .utils.progress_store import get_progress_store, leer_progreso
+from .utils.progress_stream import FlujoProgreso, cursor_desde
+from .utils.rate_limiter import cargar_limitador, guardar_limitador, parse_retry_after
+from .utils.robots import obtener_reglas
+from .utils.sitemap_entries import entradas_a_recrawlear, entradas_guardadas
+from .utils.sitemap_resolver import urls_sitemap_dominio
+from .utils.url_canon import canonicalizar_url, clave_canonica, url_absoluta
 from .models import (
     BusquedaDominio,
     CrawlingProgress,
@@ -24,132 +51,39 @@ from .models import (
     AnalisisUrlIndividual,
 )
 
-# Variable global temporal para progreso (en producción usar cache/db)
-crawling_progress = {}
-
-
-def limpiar_procesos_colgados():
-    """Limpia procesos de crawling que han quedado colgados"""
-
-    # Buscar procesos que no han sido actualizados en más de 10 minutos
-    hace_10min = timezone.now() - timezone.timedelta(minutes=10)
-
-    procesos_colgados = CrawlingProgress.objects.filter(
-        is_done=False, updated_at__lt=hace_10min
-    )
-
-    for proceso in procesos_colgados:
-        # Marcar como terminado
-        proceso.is_done = True
-        proceso.save()
-
-        # Actualizar también el BusquedaDominio correspondiente si existe
-        if proceso.busqueda_id:
-            try:
-                busqueda = BusquedaDominio.objects.get(id=proceso.busqueda_id)
-                if not busqueda.fecha_fin:
-                    busqueda.fecha_fin = timezone.now()
-                    # Guardar URLs del progreso si no existen en BusquedaDominio
-                    if proceso.count > 0 and not busqueda.urls:
-                        urls_list = proceso.get_urls_list()
-                        busqueda.urls = "\n".join(urls_list[: proceso.count])
-                    busqueda.save()
-            except BusquedaDominio.DoesNotExist:
-                pass
-
-    return procesos_colgados.count()
-
-
-def sincronizar_estados_crawling():
-    """Sincroniza los estados entre CrawlingProgress y BusquedaDominio"""
-
-    # Buscar CrawlingProgress terminados que tienen BusquedaDominio sin fecha_fin
-    progresos_terminados = CrawlingProgress.objects.filter(
-        is_done=True, busqueda_id__isnull=False
-    )
-
-    for progreso in progresos_terminados:
-        try:
-            busqueda = BusquedaDominio.objects.get(id=progreso.busqueda_id)
-            if not busqueda.fecha_fin:
-                busqueda.fecha_fin = timezone.now()
-                # Actualizar URLs si no existen
-                if progreso.count > 0 and not busqueda.urls:
-                    urls_list = progreso.get_urls_list()
-                    busqueda.urls = "\n".join(urls_list[: progreso.count])
-                busqueda.save()
-                print(f"[SYNC] Sincronizado BusquedaDominio ID {busqueda.id}")
-        except BusquedaDominio.DoesNotExist:
-            pass
-
-    # Buscar BusquedaDominio con fecha_fin que tienen CrawlingProgress sin terminar
-    busquedas_terminadas = BusquedaDominio.objects.filter(
-        fecha_fin__isnull=False
-    ).exclude(
-        id__in=CrawlingProgress.objects.filter(is_done=True).values_list(
-            "busqueda_id", flat=True
-        )
-    )
-
-    for busqueda in busquedas_terminadas:
-        progresos_activos = CrawlingProgress.objects.filter(
-            busqueda_id=busqueda.id, is_done=False
-        )
-        for progreso in progresos_activos:
-            progreso.is_done = True
-            progreso.save()
-            print(f"[SYNC] Marcado progreso como terminado: {progreso.progress_key}")
+# El progreso de los crawlings AJAX se guarda en el store compartido
+# (ver core/utils/progress_store.py y CRAWL_PROGRESS_BACKEND)
 
 
 def verificar_crawling_activo(request):
-    """Verifica si hay un crawling activo para el usuario"""
-    usuario = request.user if request.user.is_authenticated else None
-
-    # Primero limpiar procesos colgados y sincronizar estados
-    limpiados = limpiar_procesos_colgados()
-    if limpiados > 0:
-        print(f"[CLEANUP] Limpiados {limpiados} procesos colgados")
-
-    # Sincronizar estados entre CrawlingProgress y BusquedaDominio
-    sincronizar_estados_crawling()
+    """Verifica si hay un crawling activo para el usuario.
 
-    # Buscar crawlings activos (no completados) de las últimas 24 horas
+    Solo lectura: la limpieza de procesos colgados y la sincronización con
+    ``BusquedaDominio`` las hace el reconciliador periódico
+    (``core.utils.crawl_reaper``). Con ``?since=n`` solo devuelve las URLs a
+    partir de la posición ``n``.
+    """
+    usuario = request.user if request.user.is_authenticated else None
+    try:
+        desde = cursor_desde(request)
+    except ValueError:
+        return JsonResponse({"error": "Cursor inválido"}, status=400)
 
+    # Crawling activo más reciente de las últimas 24 horas con latido reciente
     hace_24h = timezone.now() - timezone.timedelta(hours=24)
+    progress_obj = (
+        CrawlingProgress.objects.filter(
+            usuario=usuario,
+            is_done=False,
+            created_at__gte=hace_24h,
+            heartbeat__gte=heartbeat_limite(),
+        )
+        .order_by("-created_at")
+        .first()
+    )
 
-    crawlings_activos = CrawlingProgress.objects.filter(
-        usuario=usuario, is_done=False, created_at__gte=hace_24h
-    ).order_by("-created_at")[:1]
-
-    if crawlings_activos:
-        progress_obj = crawlings_activos[0]
-
-        # Verificar si realmente está activo (actualizado en los últimos 5 minutos)
-        hace_5min = timezone.now() - timezone.timedelta(minutes=5)
-        if progress_obj.updated_at < hace_5min:
-            # Proceso probablemente abandonado, marcarlo como terminado
-            progress_obj.is_done = True
-            progress_obj.save()
-
-            # También actualizar BusquedaDominio si existe
-            if progress_obj.busqueda_id:
-                try:
-                    busqueda = BusquedaDominio.objects.get(id=progress_obj.busqueda_id)
-                    if not busqueda.fecha_fin:
-                        busqueda.fecha_fin = timezone.now()
-                        # Actualizar URLs con el progreso actual
-                        if progress_obj.count > 0 and not busqueda.urls:
-                            urls_list = progress_obj.get_urls_list()
-                            busqueda.urls = "\n".join(urls_list[: progress_obj.count])
-                        busqueda.save()
-                        print(
-                            f"[SYNC] Finalizado proceso abandonado: ID {busqueda.id}, URLs: {progress_obj.count}"
-                        )
-                except BusquedaDominio.DoesNotExist:
-                    pass
-
-            return JsonResponse({"active": False})
-
+    if progress_obj:
+        urls = progress_obj.get_urls_list(desde=desde)
         return JsonResponse(
             {
                 "active": True,
@@ -157,7 +91,9 @@ def verificar_crawling_activo(request):
                 "dominio": progress_obj.dominio,
                 "count": progress_obj.count,
                 "last": progress_obj.last_url,
-                "urls": progress_obj.get_urls_list(),
+                "urls": urls,
+                "since": desde,
+                "next": desde + len(urls),
             }
         )
 
@@ -210,188 +146,9 @@ def get_random_headers():
     }
 
 
-def detect_blocking(response, url):
-    """Detecta si una respuesta indica bloqueo anti-bot"""
-    status = response.status_code
-    content = response.text.lower() if hasattr(response, "text") else ""
-
-    # Códigos de estado que indican bloqueo
-    if status in [403, 429, 503]:
-        return True, f"HTTP {status}: Acceso bloqueado por el servidor"
-
-    # Contenido que indica bloqueo
-    blocking_keywords = [
-        "blocked",
-        "forbidden",
-        "access denied",
-        "cloudflare",
-        "captcha",
-        "robot",
-        "bot detected",
-        "rate limit",
-        "too many requests",
-        "suspicious activity",
-    ]
-
-    if any(keyword in content for keyword in blocking_keywords):
-        return True, "Contenido indica protección anti-bot"
-
-    # Respuesta muy pequeña o vacía puede indicar bloqueo
-    if len(content) < 100 and status == 200:
-        return True, "Respuesta sospechosamente pequeña"
-
-    return False, ""
-
-
 def try_sitemap_fallback(domain):
     """Intenta obtener URLs del sitemap cuando el crawling falla"""
-    # Limpiar el dominio de cualquier protocolo previo
-    clean_domain = domain.replace("https://", "").replace("http://", "").strip("/")
-
-    print(f"[SITEMAP] Iniciando búsqueda de sitemap para {clean_domain}")
-
-    sitemap_urls = [
-        f"https://{clean_domain}/sitemap.xml",
-        f"https://www.{clean_domain}/sitemap.xml",
-        f"https://{clean_domain}/sitemap_index.xml",
-        f"https://{clean_domain}/sitemaps.xml",
-        f"https://{clean_domain}/sitemap/",
-        f"https://{domain}/sitemap.txt",
-    ]
-
-    # Primero buscar en robots.txt con diferentes estrategias
-    robots_urls = [f"https://{domain}/robots.txt", f"https://www.{domain}/robots.txt"]
-
-    for robots_url in robots_urls:
-        try:
-            print(f"[SITEMAP] Revisando robots.txt: {robots_url}")
-            headers = get_random_headers()
-            robots_response = requests.get(robots_url, timeout=10, headers=headers)
-
-            if robots_response.status_code == 200:
-                print("[SITEMAP] ✅ robots.txt accesible")
-                for line in robots_response.text.split("\n"):
-                    if line.lower().strip().startswith("sitemap:"):
-                        sitemap_url = line.split(":", 1)[1].strip()
-                        print(
-                            f"[SITEMAP] Sitemap encontrado en robots.txt: {sitemap_url}"
-                        )
-                        sitemap_urls.insert(0, sitemap_url)
-                break
-            else:
-                print(
-                    f"[SITEMAP] robots.txt no accesible: {robots_response.status_code}"
-                )
-        except Exception as e:
-            print(f"[SITEMAP] Error accediendo robots.txt: {str(e)[:50]}")
-            continue
-
-    # Intentar cada sitemap con diferentes estrategias
-    for i, sitemap_url in enumerate(sitemap_urls):
-        try:
-            print(
-                f"[SITEMAP] Probando sitemap {i+1}/{len(sitemap_urls)}: {sitemap_url}"
-            )
-
-            # Usar diferentes headers para cada intento
-            headers = get_random_headers()
-            # Para algunos sitios, agregar headers más específicos
-            if "udemy" in domain:
-                headers.update(
-                    {
-                        "Accept": "application/xml,text/xml,*/*;q=0.8",
-                        "X-Requested-With": "XMLHttpRequest",
-                    }
-                )
-
-            response = requests.get(sitemap_url, timeout=15, headers=headers)
-
-            print(f"[SITEMAP] Respuesta: {response.status_code}")
-
-            if response.status_code == 200:
-                print("[SITEMAP] ✅ Sitemap accesible, parseando contenido...")
-                urls = parse_sitemap_urls(response.content, domain)
-                if urls:
-                    print(f"[SITEMAP] 🎉 Encontradas {len(urls)} URLs en sitemap")
-                    return urls
-                else:
-                    print("[SITEMAP] ⚠️ Sitemap válido pero sin URLs útiles")
-            elif response.status_code == 403:
-                print("[SITEMAP] ❌ Sitemap bloqueado (403)")
-            else:
-                print(f"[SITEMAP] ❌ Sitemap no disponible ({response.status_code})")
-
-        except Exception as e:
-            print(f"[SITEMAP] Error: {str(e)[:50]}")
-            continue
-
-    print(f"[SITEMAP] ❌ No se encontraron sitemaps accesibles para {domain}")
-    return []
-
-
-def parse_sitemap_urls(content, base_domain, max_urls=100):
-    """Extrae URLs de un sitemap XML"""
-    urls = []
-    try:
-        root = ET_fromstring(content)
-
-        # Definir namespaces comunes
-        namespaces = {
-            "sm": "http://www.sitemaps.org/schemas/sitemap/0.9",
-            "": "http://www.sitemaps.org/schemas/sitemap/0.9",
-        }
-
-        # Buscar URLs con namespace
-        url_elements = root.findall(".//sm:url", namespaces)
-        if not url_elements:
-            # Buscar sin namespace
-            url_elements = root.findall(".//url")
-
-        for url_elem in url_elements:
-            loc = url_elem.find("sm:loc", namespaces)
-            if loc is None:
-                loc = url_elem.find("loc")
-
-            if loc is not None and loc.text:
-                url = loc.text.strip()
-                if url.startswith("http") and base_domain in url:
-                    urls.append(url)
-                    if len(urls) >= max_urls:
-                        break
-
-        # Si no encontramos URLs, buscar sitemaps anidados
-        if not urls:
-            sitemap_elements = root.findall(".//sm:sitemap", namespaces)
-            if not sitemap_elements:
-                sitemap_elements = root.findall(".//sitemap")
-
-            for sitemap_elem in sitemap_elements[:5]:  # Máximo 5 sitemaps anidados
-                loc = sitemap_elem.find("sm:loc", namespaces)
-                if loc is None:
-                    loc = sitemap_elem.find("loc")
-
-                if loc is not None and loc.text:
-                    nested_sitemap_url = loc.text.strip()
-                    try:
-                        nested_response = requests.get(
-                            nested_sitemap_url, timeout=10, headers=get_random_headers()
-                        )
-                        if nested_response.status_code == 200:
-                            nested_urls = parse_sitemap_urls(
-                                nested_response.content,
-                                base_domain,
-                                max_urls - len(urls),
-                            )
-                            urls.extend(nested_urls)
-                            if len(urls) >= max_urls:
-                                break
-                    except Exception:
-                        continue
-
-    except Exception as e:
-        print(f"Error parseando sitemap: {e}")
-
-    return urls[:max_urls]
+    return urls_sitemap_dominio(domain)
 
 
 # --- Guardar búsqueda desde AJAX ---
@@ -418,26 +175,37 @@ def guardar_busqueda_ajax(dominio, urls, user=None):
             .order_by("-fecha")
             .first()
         )
-    if obj:
-        obj.urls = "\n".join(urls_limpias)
-        obj.fecha_fin = timezone.now()
-        obj.save()
-    else:
-        BusquedaDominio.objects.create(
+    if not obj:
+        obj = BusquedaDominio.objects.create(
             dominio=dominio,
             usuario=(
                 user
                 if user and hasattr(user, "is_authenticated") and user.is_authenticated
                 else None
             ),
-            urls="\n".join(urls_limpias),
             fecha=timezone.now(),
         )
-
-
-def crawl_urls_progress(base_url, max_urls, progress_key):
-    visited = set()
-    to_visit = [base_url]
+    obj.guardar_urls(urls_limpias)
+    obj.finalizar("success")
+
+
+def crawl_urls_progress(base_url, max_urls, progress_key, solo_cambios=False):
+    base_url = canonicalizar_url(base_url)
+    huellas = HuellasDominio(dominio_de_url(base_url))
+    # En modo solo_cambios se siembran las URLs conocidas: un 304 no trae enlaces
+    semillas = [base_url] + (huellas.urls_conocidas() if solo_cambios else [])
+    frontier = CrawlFrontier(
+        semillas,
+        priorizar=getattr(settings, "CRAWL_FRONTIER_PRIORIZAR", False),
+        key=clave_canonica,
+    )
+    robots = obtener_reglas(dominio_de_url(base_url))
+    frontier.filtrar(robots.permitido)
+    limitador = cargar_limitador(dominio_de_url(base_url))
+    limitador.fijar_crawl_delay(robots.crawl_delay())
+    extractor = get_link_extractor()
+    progreso = ProgresoIncremental(progress_key)
+    progreso.iniciar()
     urls = []
 
     def normalize_netloc(netloc):
@@ -445,61 +213,64 @@ def crawl_urls_progress(base_url, max_urls, progress_key):
 
     domain = normalize_netloc(urlparse(base_url).netloc or base_url)
 
-    while to_visit:
-        url = to_visit.pop(0)
-        if url in visited:
-            continue
-        visited.add(url)
+    while frontier:
+        url, depth = frontier.pop()
 
-        # VERIFICAR SI DEBE DETENERSE
-        try:
-            progress_obj = CrawlingProgress.objects.get(progress_key=progress_key)
-            if progress_obj.is_done:
-                print(
-                    f"[CRAWL] ⏹️ DETENIDO - Se recibió señal de stop para {progress_key}"
-                )
-                break
-        except CrawlingProgress.DoesNotExist:
-            print(f"[CRAWL] ⏹️ DETENIDO - Progreso eliminado: {progress_key}")
+        # VERIFICAR SI DEBE DETENERSE (flag en memoria; el latido solo toca
+        # la BD si pasó el intervalo de volcado)
+        if not progreso.latido():
+            print(f"[CRAWL] ⏹️ DETENIDO - Se recibió señal de stop para {progress_key}")
             break
+        limitador.esperar()
 
-        try:
-            resp = requests.get(
-                url,
-                timeout=8,
-                headers={
-                    "User-Agent": (
-                        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                        "AppleWebKit/537.36 (KHTML, like Gecko) "
-                        "Chrome/119.0.0.0 Safari/537.36"
-                    )
-                },
+        headers = {
+            "User-Agent": (
+                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                "AppleWebKit/537.36 (KHTML, like Gecko) "
+                "Chrome/119.0.0.0 Safari/537.36"
             )
+        }
+        if solo_cambios:
+            headers.update(huellas.cabeceras_condicionales(url))
+        inicio = time.monotonic()
+        try:
+            resp = http_get_pagina(url, timeout=8, headers=headers)
             print(f"[CRAWL] URL: {url} | Status: {resp.status_code}")
+            limitador.registrar(
+                resp.status_code,
+                time.monotonic() - inicio,
+                parse_retry_after(resp.headers.get("Retry-After")),
+            )
+            if resp.status_code == 304 and solo_cambios:
+                # Sin cambios desde la última visita
+                huellas.registrar(url, 304, resp.headers)
+                urls.append(url)
+                if not progreso.registrar(url, status_code=304, depth=depth):
+                    break
+                if max_urls and len(urls) >= max_urls:
+                    break
+                continue
             if resp.status_code != 200:
                 continue
-            soup = BeautifulSoup(resp.content, "html.parser")
+            huellas.registrar(url, 200, resp.headers, resp.content)
+            pagina = extractor.extraer(resp.content)
             urls.append(url)
-            enlaces = [a["href"].strip() for a in soup.find_all("a", href=True)]
+            enlaces = pagina["links"] + list(pagina["hreflang"].values())
+            base = urljoin(url, pagina["base_href"]) if pagina["base_href"] else url
+            if pagina["canonical"]:
+                frontier.mark_seen(url_absoluta(base, pagina["canonical"]))
             print(f"[CRAWL] Enlaces encontrados en {url}: {len(enlaces)}")
             if enlaces:
                 print(f"[CRAWL] Primeros 5 enlaces: {enlaces[:5]}")
-            # Actualizar progreso en base de datos
-            progress_obj, created = CrawlingProgress.objects.get_or_create(
-                progress_key=progress_key, defaults={"dominio": domain, "usuario": None}
-            )
-            progress_obj.count = len(urls)
-            progress_obj.last_url = url
-            progress_obj.urls_found = "|".join(urls)
-            progress_obj.save()
-
-            # Mantener también en memoria para compatibilidad
-            crawling_progress[progress_key] = {
-                "count": len(urls),
-                "last": url,
-                "done": False,
-                "urls": urls.copy(),
-            }
+            # Progreso incremental: se vuelca a la BD y al store por lotes
+            if not progreso.registrar(
+                url,
+                status_code=resp.status_code,
+                depth=depth,
+                content_type=resp.headers.get("Content-Type", ""),
+            ):
+                print(f"[CRAWL] ⏹️ DETENIDO - Progreso terminado: {progress_key}")
+                break
             if max_urls and len(urls) >= max_urls:
                 break
             for href in enlaces:
@@ -509,40 +280,60 @@ def crawl_urls_progress(base_url, max_urls, progress_key):
                     or href.startswith("javascript:")
                 ):
                     continue
-                abs_url = urljoin(url, href)
+                # Se descarga la URL tal cual; el frontier deduplica por clave_canonica
+                abs_url = url_absoluta(base, href)
                 parsed = urlparse(abs_url)
                 # Permitir tanto con como sin www
                 if parsed.netloc and normalize_netloc(parsed.netloc) != domain:
                     continue
-                if (
-                    abs_url not in visited
-                    and abs_url not in to_visit
-                    and abs_url.startswith("http")
-                ):
-                    to_visit.append(abs_url)
+                if abs_url.startswith("http"):
+                    frontier.push(abs_url, depth + 1)
+        except DescargaDescartada as e:
+            # No es HTML o es demasiado grande: se registra sin descargarla
+            limitador.registrar(e.response.status_code, time.monotonic() - inicio)
+            print(f"[CRAWL] ⏭️ {url} descartada: {e}")
+            if e.response.status_code != 200:
+                continue
+            urls.append(url)
+            if not progreso.registrar(
+                url,
+                status_code=200,
+                depth=depth,
+                content_type=e.response.headers.get("Content-Type", ""),
+            ):
+                break
+            if max_urls and len(urls) >= max_urls:
+                break
+        except requests.RequestException as e:
+            limitador.registrar(0, time.monotonic() - inicio)
+            print(f"[CRAWL][ERROR] {url}: {e}")
+            continue  # nosec
         except Exception as e:
             print(f"[CRAWL][ERROR] {url}: {e}")
             continue  # nosec
-    # Actualizar progreso final en base de datos
-    progress_obj, created = CrawlingProgress.objects.get_or_create(
-        progress_key=progress_key, defaults={"dominio": domain, "usuario": None}
-    )
-    progress_obj.count = len(urls)
-    progress_obj.last_url = ""
-    progress_obj.urls_found = "|".join(urls)
-    progress_obj.is_done = True
-    progress_obj.save()
-
-    # Mantener también en memoria
-    crawling_progress[progress_key] = {
-        "count": len(urls),
-        "last": None,
-        "done": True,
-        "urls": urls.copy(),
-    }
+    # Volcar las URLs pendientes y marcar el progreso como terminado
+    progreso.flush(final=True)
+    huellas.guardar()
+    guardar_limitador(dominio_de_url(base_url), limitador)
     return urls
 
 
+def clave_usuario_crawl(request):
+    """Clave para la cuota por usuario: id si está autenticado, si no la IP"""
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def respuesta_crawl_rechazado(error):
+    """Respuesta 429 con la sugerencia de reintento del planificador"""
+    response = JsonResponse(
+        {"error": error.motivo, "retry_after": error.retry_after}, status=429
+    )
+    response["Retry-After"] = str(error.retry_after)
+    return response
+
+
 def iniciar_crawling_ajax(request):
     """Inicia el crawling en background y retorna una key de progreso"""
     if request.method == "POST":
@@ -568,16 +359,20 @@ def iniciar_crawling_ajax(request):
             for proto in ["https", "http"]:
                 url = f"{proto}://{dominio}"
                 try:
-                    resp = requests.get(
-                        url, timeout=6, headers={"User-Agent": "PrestaLab"}
+                    # Solo importa el estado: no se descarga el cuerpo
+                    resp = http_get(
+                        url,
+                        timeout=6,
+                        headers={"User-Agent": "PrestaLab"},
+                        stream=True,
                     )
+                    resp.close()
                     if resp.status_code == 200:
                         return url
                 except Exception:
                     continue  # nosec
             return f"https://{dominio}"  # fallback
 
-        base_url = get_working_base_url(dominio_limpio)
         progress_key = f"{dominio}_{int(time.time())}"
 
         # Crear el objeto BusquedaDominio al iniciar
@@ -585,7 +380,6 @@ def iniciar_crawling_ajax(request):
         obj = BusquedaDominio.objects.create(
             dominio=dominio,
             usuario=(request.user if request.user.is_authenticated else None),
-            urls="",
             fecha=timezone.now(),
         )
 
@@ -597,23 +391,26 @@ def iniciar_crawling_ajax(request):
             busqueda_id=obj.id,
         )
 
-        # Mantener también en memoria para compatibilidad
-        crawling_progress[progress_key] = {"count": 0, "last": None, "done": False}
+        # Progreso compartido entre workers
+        get_progress_store().set(
+            progress_key,
+            {"count": 0, "last": None, "done": False, "busqueda_id": obj.id},
+        )
 
         # Guardar el id en la sesión para referencia
         request.session["busqueda_id"] = obj.id
 
         def crawl_and_save():
             try:
+                base_url = get_working_base_url(dominio_limpio)
                 urls = crawl_urls_progress(base_url, limite_urls, progress_key)
-                # Al finalizar, actualizar ambos objetos
-                obj.urls = "\n".join(urls)
-                obj.fecha_fin = timezone.now()
-                obj.save()
+                # Las URLs ya se insertaron por lotes en DiscoveredUrl; si se
+                # detuvo desde la tabla se conserva el status "stopped"
+                obj.refresh_from_db(fields=["crawl_status"])
+                obj.finalizar(obj.crawl_status or "success")
 
-                # Actualizar también CrawlingProgress
-                progress_obj.is_done = True
-                progress_obj.save()
+                # Actualizar también CrawlingProgress (sin pisar urls_found)
+                CrawlingProgress.objects.filter(pk=progress_obj.pk).update(is_done=True)
 
                 print(
                     f"[AJAX] Crawling completado para {dominio}. URLs encontradas: {len(urls)}"
@@ -621,16 +418,20 @@ def iniciar_crawling_ajax(request):
             except Exception as e:
                 # En caso de error, asegurar que ambos se marquen como finalizados
                 print(f"[AJAX] Error en crawling: {e}")
-                obj.urls = ""
-                obj.fecha_fin = timezone.now()
-                obj.save()
+                obj.finalizar(STATUS_ERROR)
 
                 # Marcar también como terminado en CrawlingProgress
-                progress_obj.is_done = True
-                progress_obj.save()
+                CrawlingProgress.objects.filter(pk=progress_obj.pk).update(is_done=True)
 
-        t = threading.Thread(target=crawl_and_save)
-        t.start()
+        try:
+            get_scheduler().enviar(
+                crawl_and_save, clave_usuario_crawl(request), [dominio_limpio]
+            )
+        except CrawlRechazado as e:
+            progress_obj.delete()
+            obj.delete()
+            get_progress_store().delete(progress_key)
+            return respuesta_crawl_rechazado(e)
         return JsonResponse({"progress_key": progress_key})
     return JsonResponse({"error": "Método no permitido"}, status=405)
 
@@ -653,9 +454,18 @@ def iniciar_crawling_multiple_ajax(request):
         # Procesar lista de dominios
         dominios_raw = [d.strip() for d in dominios_text.split("\n") if d.strip()]
 
-        # Validar cantidad de dominios
-        if len(dominios_raw) > 10:
-            return JsonResponse({"error": "Máximo 10 dominios permitidos"}, status=400)
+        # Validar cantidad de dominios (los usuarios staff tienen un límite mayor)
+        if request.user.is_authenticated and request.user.is_staff:
+            max_dominios = getattr(settings, "CRAWL_BATCH_MAX_DOMINIOS_STAFF", 50)
+        else:
+            max_dominios = getattr(settings, "CRAWL_BATCH_MAX_DOMINIOS", 10)
+        # Un lote mayor que el planificador entero no se admitiría nunca
+        scheduler = get_scheduler()
+        max_dominios = min(max_dominios, scheduler.max_workers + scheduler.max_queue)
+        if len(dominios_raw) > max_dominios:
+            return JsonResponse(
+                {"error": f"Máximo {max_dominios} dominios permitidos"}, status=400
+            )
 
         if len(dominios_raw) == 0:
             return JsonResponse({"error": "No se proporcionaron dominios"}, status=400)
@@ -668,6 +478,9 @@ def iniciar_crawling_multiple_ajax(request):
             dominio_normalizado = normalizar_dominio(dominio_raw)
             if re.match(regex, dominio_normalizado):
                 dominios_validos.append(dominio_normalizado)
+        # "a.com" y "www.a.com" son el mismo dominio tras normalizar: un solo
+        # trabajo (cuota por dominio) y un solo resultado en el lote
+        dominios_validos = list(dict.fromkeys(dominios_validos))
 
         if len(dominios_validos) == 0:
             return JsonResponse(
@@ -676,72 +489,90 @@ def iniciar_crawling_multiple_ajax(request):
 
         # Generar clave de progreso única para el lote
         batch_key = f"batch_{int(time.time())}"
-        crawling_progress[batch_key] = {
-            "type": "multiple",
-            "total_domains": len(dominios_validos),
-            "completed_domains": 0,
-            "current_domain": None,
-            "results": {},
-            "done": False,
-        }
-
-        def crawl_multiple_and_save():
+        store = get_progress_store()
+        store.set(
+            batch_key,
+            {
+                "type": "multiple",
+                "total_domains": len(dominios_validos),
+                "completed_domains": 0,
+                "current_domain": None,
+                "results": {},
+                "done": False,
+            },
+        )
 
-            for i, dominio in enumerate(dominios_validos):
-                try:
-                    # Actualizar progreso
-                    crawling_progress[batch_key]["current_domain"] = dominio
-                    crawling_progress[batch_key]["completed_domains"] = i
-
-                    # Realizar crawling individual
-                    base_url = f"https://{dominio}"
-                    resultado_crawl = crawl_urls(base_url, max_urls=limite_urls)
-
-                    # Manejar resultado
-                    if isinstance(resultado_crawl, dict):
-                        urls_encontradas = resultado_crawl["urls"]
-                        crawl_status = resultado_crawl["status"]
-                    else:
-                        urls_encontradas = resultado_crawl
-                        crawl_status = "legacy"
-
-                    # Crear registro en BD con fecha_fin inmediata
-                    busqueda = BusquedaDominio.objects.create(
-                        dominio=dominio,
-                        usuario=(
-                            request.user if request.user.is_authenticated else None
-                        ),
-                        urls="\n".join(urls_encontradas),
-                        fecha=timezone.now(),
-                        fecha_fin=timezone.now(),  # Marcar como completado inmediatamente
-                    )
+        usuario = request.user if request.user.is_authenticated else None
 
-                    # Guardar resultado
-                    crawling_progress[batch_key]["results"][dominio] = {
-                        "urls_count": len(urls_encontradas),
-                        "status": crawl_status,
-                        "id": busqueda.id,
-                    }
+        def crawl_dominio_lote(dominio):
+            try:
+                # Cada dominio escribe solo su propio resultado en el store
+                store.set_resultado(
+                    batch_key, dominio, {"urls_count": 0, "status": "running"}
+                )
+                store.update(batch_key, current_domain=dominio)
 
-                    # Pequeña pausa entre dominios para evitar sobrecarga
-                    if i < len(dominios_validos) - 1:  # No pausar en el último
-                        time.sleep(2)
+                # Realizar crawling individual
+                inicio = timezone.now()
+                base_url = f"https://{dominio}"
+                resultado_crawl = crawl_urls(base_url, max_urls=limite_urls)
 
-                except Exception as e:
-                    # Manejar errores individuales
-                    crawling_progress[batch_key]["results"][dominio] = {
-                        "urls_count": 0,
-                        "status": "error",
-                        "error": str(e)[:100],
-                    }
+                # Manejar resultado
+                if isinstance(resultado_crawl, dict):
+                    urls_encontradas = resultado_crawl["urls"]
+                    crawl_status = resultado_crawl["status"]
+                else:
+                    urls_encontradas = resultado_crawl
+                    crawl_status = "legacy"
+
+                # Crear registro en BD con fecha_fin inmediata
+                busqueda = BusquedaDominio.objects.create(
+                    dominio=dominio,
+                    usuario=usuario,
+                    fecha=inicio,
+                )
+                busqueda.guardar_urls(urls_encontradas)
+                busqueda.finalizar(
+                    crawl_status,
+                    (
+                        resultado_crawl.get("blocked_count", 0)
+                        if isinstance(resultado_crawl, dict)
+                        else 0
+                    ),
+                )
+                resultado = {
+                    "urls_count": len(urls_encontradas),
+                    "status": crawl_status,
+                    "id": busqueda.id,
+                }
+            except Exception as e:
+                # Manejar errores individuales sin afectar al resto del lote
+                resultado = {
+                    "urls_count": 0,
+                    "status": "error",
+                    "error": str(e)[:100],
+                }
+            finally:
+                close_old_connections()
 
-            # Marcar como completado
-            crawling_progress[batch_key]["done"] = True
-            crawling_progress[batch_key]["completed_domains"] = len(dominios_validos)
+            store.set_resultado(batch_key, dominio, resultado)
+            # El último dominio en terminar cierra el lote
+            if store.incr(batch_key, "completed_domains") == len(dominios_validos):
+                store.update(batch_key, done=True, current_domain=None)
 
-        # Iniciar proceso en hilo separado
-        t = threading.Thread(target=crawl_multiple_and_save)
-        t.start()
+        # Cada dominio es un trabajo del planificador: los dominios no comparten
+        # límites de cortesía y se crawlean en paralelo dentro de sus cuotas
+        try:
+            scheduler.enviar_lote(
+                [
+                    (partial(crawl_dominio_lote, dominio), dominio)
+                    for dominio in dominios_validos
+                ],
+                clave_usuario_crawl(request),
+            )
+        except CrawlRechazado as e:
+            store.delete(batch_key)
+            return respuesta_crawl_rechazado(e)
 
         return JsonResponse(
             {
@@ -754,15 +585,67 @@ def iniciar_crawling_multiple_ajax(request):
     return JsonResponse({"error": "Método no permitido"}, status=405)
 
 
+@login_required
+def estado_scheduler_ajax(request):
+    """Devuelve la ocupación del planificador de crawlings"""
+    return JsonResponse(get_scheduler().estadisticas())
+
+
 def progreso_crawling_ajax(request):
-    """Devuelve el progreso actual del crawling"""
+    """Devuelve el progreso actual del crawling.
+
+    Con ``?since=n`` solo incluye las URLs a partir de la posición ``n``;
+    ``next`` es el cursor para la siguiente consulta.
+    """
     key = request.GET.get("progress_key")
-    if not key or key not in crawling_progress:
+    try:
+        desde = cursor_desde(request)
+    except ValueError:
+        return JsonResponse({"error": "Cursor inválido"}, status=400)
+    prog = leer_progreso(get_progress_store(), key, desde=desde) if key else None
+    if prog is None:
         return JsonResponse({"error": "Clave inválida"}, status=404)
-    prog = crawling_progress[key]
+    if "urls" in prog:
+        prog["since"] = desde
+        prog["next"] = desde + len(prog["urls"])
+    if prog.get("type") == "multiple":
+        prog["current_domains"] = [
+            dominio
+            for dominio, resultado in prog["results"].items()
+            if resultado.get("status") == "running"
+        ]
+    else:
+        prog.pop("results", None)
     return JsonResponse(prog)
 
 
+def stream_progreso_crawling(request):
+    """Envía el progreso del crawling por Server-Sent Events (solo cambios).
+
+    Solo bajo ASGI: con WSGI cada conexión ocuparía un hilo del servidor
+    durante minutos, así que se responde 204 y ``EventSource`` no reconecta;
+    la plantilla pasa entonces a consultar ``progreso_crawling_ajax`` con
+    ``?since=``.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    key = request.GET.get("progress_key")
+    store = get_progress_store()
+    if not key or store.get(key) is None:
+        return JsonResponse({"error": "Clave inválida"}, status=404)
+    try:
+        flujo = FlujoProgreso(store, key, desde=cursor_desde(request))
+    except ValueError:
+        return JsonResponse({"error": "Cursor inválido"}, status=400)
+    # Iterador asíncrono: no ocupa un hilo por cliente
+    response = StreamingHttpResponse(
+        flujo.__aiter__(), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 def admin_set_password_view(request, user_id):
     """Vista para que un admin cambie la contraseña de cualquier usuario"""
     try:
@@ -834,236 +717,264 @@ def normalizar_dominio(dominio_raw):
     return dominio
 
 
-def crawl_urls(base_url, max_urls=None):
-    """Función auxiliar mejorada para crawlear URLs de un dominio"""
-    # Normalizar URL base
-    if not base_url.startswith(("http://", "https://")):
-        base_url = f"https://{base_url}"
-
-    visited = set()
-    to_visit = [base_url]
-    urls = []
-    domain = urlparse(base_url).netloc or base_url.replace("https://", "").replace(
-        "http://", ""
-    )
-    blocked_count = 0
-    max_blocks = 3  # Máximo de bloqueos antes de cambiar estrategia
-    crawl_delay = 1  # Delay inicial en segundos
-
-    print(f"[CRAWL] Iniciando crawling mejorado de {base_url}")
-    print(f'[CRAWL] Límite de URLs: {max_urls or "Sin límite"}')
-
-    # Verificar robots.txt para obtener delay recomendado
-    try:
-        robots_url = f"https://{domain}/robots.txt"
-        robots_response = requests.get(
-            robots_url, timeout=10, headers=get_random_headers()
+def crawl_urls(
+    base_url,
+    max_urls=None,
+    concurrency=None,
+    on_url=None,
+    solo_cambios=False,
+    semillas=(),
+    solo_lastmod=False,
+    latido=None,
+):
+    """Crawlea URLs de un dominio con el motor asíncrono concurrente.
+
+    Devuelve el mismo dict de resultado que la versión secuencial
+    (``urls``, ``status``, ``blocked_count``, ``sitemap_urls``, ``message``).
+    ``on_url(url, detalles)`` se invoca tras cada URL encontrada y
+    ``latido()`` periódicamente; si alguno devuelve False el crawling se
+    detiene.
+
+    Guarda la huella (ETag, Last-Modified, hash) de cada página. Con
+    ``solo_cambios`` recrawlea las URLs ya conocidas (huellas del dominio más
+    ``semillas``) con peticiones condicionales y ``cambios`` indica cuántas son
+    nuevas, cambiadas o iguales.
+
+    La frontera se siembra con las entradas guardadas del sitemap del dominio,
+    por ``<priority>``. Con ``solo_lastmod`` se relee el sitemap y solo se
+    visitan sus URLs con ``<lastmod>`` posterior a la última visita (o nunca
+    visitadas), sin seguir enlaces.
+
+    El ritmo de peticiones parte de la tasa aprendida en el crawling anterior
+    del dominio y la tasa final se guarda para el siguiente.
+    """
+    dominio = dominio_de_url(base_url)
+    huellas = HuellasDominio(dominio)
+    robots = obtener_reglas(dominio)
+    limitador = cargar_limitador(dominio)
+    if solo_lastmod:
+        # Relee el sitemap: leer_urls_sitemap actualiza las entradas guardadas
+        try_sitemap_fallback(dominio)
+        entradas = entradas_a_recrawlear(dominio, limite=max_urls)
+        print(f"[CRAWL] {len(entradas)} URLs del sitemap con <lastmod> nuevo")
+    else:
+        entradas = entradas_guardadas(dominio, limite=MAX_COLA)
+    resultado = asyncio.run(
+        crawl_urls_async(
+            base_url,
+            max_urls=max_urls,
+            concurrency=concurrency,
+            on_url=on_url,
+            huellas=huellas,
+            solo_cambios=solo_cambios,
+            semillas=semillas,
+            entradas_sitemap=entradas,
+            seguir_enlaces=not solo_lastmod,
+            robots=robots,
+            limitador=limitador,
+            latido=latido,
         )
-        if robots_response.status_code == 200:
-            for line in robots_response.text.split("\n"):
-                if line.lower().strip().startswith("crawl-delay:"):
-                    try:
-                        recommended_delay = int(line.split(":", 1)[1].strip())
-                        crawl_delay = max(crawl_delay, recommended_delay)
-                        print(
-                            f"[CRAWL] Delay recomendado por robots.txt: {crawl_delay}s"
-                        )
-                    except Exception:
-                        pass
-                elif line.lower().strip().startswith("disallow: /"):
-                    print("[CRAWL] ⚠️ robots.txt prohíbe el crawling completo")
-    except Exception:
-        pass
-
-    while to_visit and len(urls) < (max_urls or float("inf")):
-        url = to_visit.pop(0)
-        if url in visited:
-            continue
-        visited.add(url)
-
-        try:
-            # Aplicar delay inteligente
-            if len(urls) > 0:  # No delay en la primera request
-                delay = crawl_delay * (
-                    1 + blocked_count * 0.5
-                )  # Aumentar delay si hay bloqueos
-                print(
-                    f"[CRAWL] Esperando {delay:.1f}s antes de la siguiente request..."
-                )
-                time.sleep(delay)
-
-            # Request con headers aleatorios
-            headers = get_random_headers()
-            resp = requests.get(url, timeout=15, headers=headers)
+    )
+    huellas.guardar()
+    guardar_limitador(dominio, limitador)
+    return resultado
 
-            print(f"[CRAWL] {url} -> {resp.status_code}")
 
-            # Detectar bloqueos
-            is_blocked, block_reason = detect_blocking(resp, url)
+def dominio_de_url(url):
+    """Host de una URL o dominio (sin esquema)"""
+    return urlparse(url if "://" in url else f"https://{url}").netloc
 
-            if is_blocked:
-                blocked_count += 1
-                print(f"[CRAWL] ⚠️ BLOQUEO DETECTADO: {block_reason}")
 
-                # Para HTTP 403/429 (acceso denegado), intentar sitemap inmediatamente
-                # Para otros bloqueos, esperar max_blocks intentos
-                immediate_fallback = resp.status_code in [403, 429]
-                should_fallback = (blocked_count >= max_blocks) or (
-                    immediate_fallback and len(urls) == 0
-                )
+def mensaje_resultado_crawl(dominio, resultado_crawl):
+    """Devuelve ``(mensaje, clase)`` describiendo el resultado de ``crawl_urls``"""
+    # Manejar tanto formato nuevo (dict) como antiguo (list)
+    if isinstance(resultado_crawl, dict):
+        urls_encontradas = resultado_crawl["urls"]
+        crawl_status = resultado_crawl["status"]
+        blocked_count = resultado_crawl.get("blocked_count", 0)
+    else:
+        # Compatibilidad con formato anterior
+        urls_encontradas = resultado_crawl
+        crawl_status = "legacy"
+        blocked_count = 0
 
-                if should_fallback:
-                    if immediate_fallback:
-                        print(
-                            f"[CRAWL] 🚨 Acceso denegado ({resp.status_code}). Intentando sitemap inmediatamente..."
-                        )
-                    else:
-                        print(
-                            f"[CRAWL] 🚨 Demasiados bloqueos ({blocked_count}). Cambiando a estrategia de sitemap..."
-                        )
+    base_msg = (
+        f"Dominio '{dominio}' analizado: {len(urls_encontradas)} URLs encontradas."
+    )
+    if crawl_status == "blocked_fallback_sitemap":
+        mensaje = f"{base_msg} ⚠️ Se detectó protección anti-bot, se usó sitemap como alternativa."
+        message_class = "warning"
+    elif crawl_status == "timeout_fallback_sitemap":
+        mensaje = f"{base_msg} ⚠️ El servidor no responde (timeouts), se usó sitemap como alternativa."
+        message_class = "warning"
+    elif crawl_status == "connection_error_fallback_sitemap":
+        mensaje = f"{base_msg} ⚠️ Errores de conexión, se usó sitemap como alternativa."
+        message_class = "warning"
+    elif "no_sitemap" in crawl_status:
+        # Mensaje más específico para dominios totalmente bloqueados
+        if len(urls_encontradas) == 0 and blocked_count > 0:
+            mensaje = (
+                f"{base_msg} 🛡️ Dominio completamente protegido - "
+                f"bloquea tanto crawling como sitemap. Esto es normal para sitios como Udemy, Netflix, etc."
+            )
+            message_class = "blocked"
+        else:
+            mensaje = f"{base_msg} ❌ Crawling falló y no hay sitemap disponible."
+            message_class = "warning"
+    elif crawl_status == "stopped":
+        mensaje = f"{base_msg} ⏹️ Crawling detenido por el usuario."
+        message_class = "info"
+    elif blocked_count > 0:
+        mensaje = f"{base_msg} ⚠️ Se detectaron {blocked_count} bloqueos/problemas durante el crawling."
+        message_class = "warning"
+    else:
+        mensaje = f"{base_msg} ✅ Crawling completado exitosamente."
+        message_class = "success"
+    cambios = (
+        resultado_crawl.get("cambios") if isinstance(resultado_crawl, dict) else None
+    )
+    if cambios and cambios.get("sin_cambios"):
+        mensaje += (
+            f" ({cambios['cambiada']} cambiadas, {cambios['nueva']} nuevas y "
+            f"{cambios['sin_cambios']} sin cambios)"
+        )
+    return mensaje, message_class
 
-                    sitemap_urls = try_sitemap_fallback(domain)
-                    if sitemap_urls:
-                        print(
-                            f"[CRAWL] ✅ Sitemap encontrado con "
-                            f"{len(sitemap_urls)} URLs"
-                        )
-                        urls.extend(
-                            sitemap_urls[
-                                : (
-                                    max_urls - len(urls)
-                                    if max_urls
-                                    else len(sitemap_urls)
-                                )
-                            ]
-                        )
-                        return {
-                            "urls": urls,
-                            "status": "blocked_fallback_sitemap",
-                            "message": f"Acceso denegado por protección anti-bot. Se usó sitemap como alternativa ({len(sitemap_urls)} URLs).",
-                            "blocked_count": blocked_count,
-                            "sitemap_urls": len(sitemap_urls),
-                        }
-                    else:
-                        print("[CRAWL] ❌ No se encontró sitemap accesible")
-                        return {
-                            "urls": urls,
-                            "status": "blocked_no_sitemap",
-                            "message": f"Crawling bloqueado y no hay sitemap disponible. Motivo: {block_reason}",
-                            "blocked_count": blocked_count,
-                            "sitemap_urls": 0,
-                        }
 
-                # Aumentar delay y continuar
-                crawl_delay *= 2
-                continue
+def historial_busquedas_queryset():
+    """Búsquedas no guardadas con usuario y progreso anotados en una consulta"""
+    progreso = CrawlingProgress.objects.filter(busqueda_id=OuterRef("pk")).order_by(
+        "-id"
+    )
+    return (
+        BusquedaDominio.objects.filter(guardado=False)
+        .select_related("usuario")
+        .defer("urls")
+        .annotate(
+            progreso_id=Subquery(progreso.values("id")[:1]),
+            progreso_is_done=Subquery(progreso.values("is_done")[:1]),
+            progreso_count=Subquery(progreso.values("count")[:1]),
+        )
+        .order_by("-fecha")
+    )
 
-            if resp.status_code != 200:
-                print(f"[CRAWL] Status no exitoso: {resp.status_code}")
-                continue
 
-            soup = BeautifulSoup(resp.content, "html.parser")
-            urls.append(url)
-            print(f"[CRAWL] ✅ URL agregada. Total: {len(urls)}")
+def fila_historial_dominio(b):
+    """Fila de la tabla de historial para una búsqueda anotada"""
+    dom_norm = normalizar_dominio(b.dominio)
+    fecha_inicio = timezone.localtime(b.fecha)
+    fecha_fin = timezone.localtime(b.fecha_fin) if b.fecha_fin else None
+    duracion = None
+    estado = "En progreso"
+    estado_detalle = ""
+    estado_clase = "secondary"
+    total_urls = b.url_count
+
+    # Progreso asociado, ya anotado en el queryset (sin consulta por fila)
+    hay_progreso = b.progreso_id is not None
+    progreso_en_curso = hay_progreso and not b.progreso_is_done
+
+    # Determinar estado basado en progreso activo y fecha_fin
+    if progreso_en_curso:
+        # Hay progreso activo
+        estado = "En progreso"
+        estado_detalle = f"🔄 {b.progreso_count} URLs encontradas..."
+        estado_clase = "primary"
+        total_urls = b.progreso_count  # Usar el conteo actual
+    elif fecha_fin or hay_progreso:
+        # Está finalizado: clasificación guardada al terminar el crawling
+        estado = "Finalizado"
+        duracion = formatear_duracion(b.duracion_segundos)
+        if b.estado_clase:
+            estado_detalle, estado_clase = b.estado_detalle, b.estado_clase
+        else:
+            estado_detalle, estado_clase = "ℹ️ Finalizado", "info"
+    else:
+        # No hay fecha_fin y no hay progreso activo
+        # Verificar si es un proceso abandonado/colgado
+        hace_10min = timezone.now() - timezone.timedelta(minutes=10)
+        if b.fecha < hace_10min:
+            estado = "Error/Abandonado"
+            estado_detalle = "⚠️ Proceso interrumpido"
+            estado_clase = "warning"
+        else:
+            estado_detalle = "🔄 En curso..."
+            estado_clase = "primary"
 
-            if max_urls and len(urls) >= max_urls:
-                print(f"[CRAWL] 🎯 Límite alcanzado: {max_urls} URLs")
-                break
+    return {
+        "id": b.id,
+        "dominio": dom_norm,
+        "inicio": fecha_inicio.strftime("%Y-%m-%d %H:%M:%S"),
+        "fin": fecha_fin.strftime("%Y-%m-%d %H:%M:%S") if fecha_fin else "",
+        "duracion": duracion or "",
+        "usuario": b.usuario.username if b.usuario else "-",
+        "total_urls": total_urls,
+        "estado": estado,
+        "estado_detalle": estado_detalle,
+        "estado_clase": estado_clase,
+        "url_original": b.dominio,
+        "puede_detener": progreso_en_curso,
+        "progress_id": b.progreso_id,
+        "guardado": b.guardado,
+    }
 
-            # Extraer enlaces
-            links_found = 0
-            for a in soup.find_all("a", href=True):
-                href = a["href"].strip()
-                if (
-                    href.startswith("#")
-                    or href.startswith("mailto:")
-                    or href.startswith("javascript:")
-                    or href.startswith("tel:")
-                    or href.startswith("ftp:")
-                ):
-                    continue
 
-                abs_url = urljoin(url, href)
-                parsed = urlparse(abs_url)
+MENSAJE_COLA_NO_DISPONIBLE = (
+    "No se pudo iniciar el crawling: el servicio de tareas no está disponible. "
+    "Inténtalo de nuevo en unos minutos."
+)
 
-                # Normalizar dominio para comparación
-                def normalize_domain(d):
-                    return d.lower().replace("www.", "")
 
-                if parsed.netloc and normalize_domain(
-                    parsed.netloc
-                ) != normalize_domain(domain):
-                    continue
+def encolar_crawl_dominio(
+    request, dominio, usuario, limite_urls=None, recrawl_de=None, solo_lastmod=False
+):
+    """Crea la búsqueda y su progreso y encola el crawling en Celery.
 
-                if (
-                    abs_url not in visited
-                    and abs_url not in to_visit
-                    and abs_url.startswith("http")
-                    and len(to_visit) < 1000  # Evitar cola infinita
-                ):
-                    to_visit.append(abs_url)
-                    links_found += 1
-
-            print(f"[CRAWL] Enlaces internos encontrados: {links_found}")
-
-        except requests.exceptions.Timeout:
-            print(f"[CRAWL] ⏰ Timeout en {url}")
-            blocked_count += 1
-            if blocked_count >= max_blocks and len(urls) == 0:
-                print("[CRAWL] 🚨 Demasiados timeouts. Intentando sitemap...")
-                sitemap_urls = try_sitemap_fallback(domain)
-                if sitemap_urls:
-                    print(f"[CRAWL] ✅ Sitemap encontrado con {len(sitemap_urls)} URLs")
-                    urls.extend(sitemap_urls[: max_urls or len(sitemap_urls)])
-                return {
-                    "urls": urls,
-                    "status": (
-                        "timeout_fallback_sitemap"
-                        if sitemap_urls
-                        else "timeout_no_sitemap"
-                    ),
-                    "message": f'Timeouts repetidos. {"Se usó sitemap como alternativa." if sitemap_urls else "Sin sitemap disponible."}',
-                    "blocked_count": blocked_count,
-                    "sitemap_urls": len(sitemap_urls) if sitemap_urls else 0,
-                }
-            continue
-        except requests.exceptions.ConnectionError:
-            print(f"[CRAWL] 🔌 Error de conexión en {url}")
-            blocked_count += 1
-            if blocked_count >= max_blocks and len(urls) == 0:
-                print(
-                    "[CRAWL] 🚨 Demasiados errores de conexión. Intentando sitemap..."
-                )
-                sitemap_urls = try_sitemap_fallback(domain)
-                if sitemap_urls:
-                    print(f"[CRAWL] ✅ Sitemap encontrado con {len(sitemap_urls)} URLs")
-                    urls.extend(sitemap_urls[: max_urls or len(sitemap_urls)])
-                return {
-                    "urls": urls,
-                    "status": (
-                        "connection_error_fallback_sitemap"
-                        if sitemap_urls
-                        else "connection_error_no_sitemap"
-                    ),
-                    "message": f'Errores de conexión repetidos. {"Se usó sitemap como alternativa." if sitemap_urls else "Sin sitemap disponible."}',
-                    "blocked_count": blocked_count,
-                    "sitemap_urls": len(sitemap_urls) if sitemap_urls else 0,
-                }
-            continue
-        except Exception as e:
-            print(f"[CRAWL] ❌ Error en {url}: {str(e)[:100]}")
-            continue
-
-    result = {
-        "urls": urls,
-        "status": "success",
-        "message": f"Crawling completado exitosamente. {len(urls)} URLs encontradas.",
-        "blocked_count": blocked_count,
-        "total_visited": len(visited),
-    }
+    Con ``recrawl_de`` (id de una búsqueda anterior) solo se descargan de nuevo
+    las páginas que cambiaron; con ``solo_lastmod`` solo las URLs del sitemap
+    con ``<lastmod>`` posterior a la última visita. Devuelve el
+    ``progress_key``.
 
-    print(f"[CRAWL] 🏁 Finalizado: {len(urls)} URLs, {blocked_count} bloqueos")
-    return result
+    Si no se puede publicar la tarea (broker caído) cierra la búsqueda como
+    error y relanza ``kombu.exceptions.OperationalError``.
+    """
+    busqueda = BusquedaDominio.objects.create(
+        dominio=dominio,
+        usuario=usuario,
+        fecha=timezone.now(),
+    )
+    progress_key = f"{dominio}_{int(time.time())}"
+    progress_obj = CrawlingProgress.objects.create(
+        progress_key=progress_key,
+        usuario=usuario,
+        dominio=dominio,
+        busqueda_id=busqueda.id,
+    )
+    get_progress_store().set(
+        progress_key,
+        {"count": 0, "last": None, "done": False, "busqueda_id": busqueda.id},
+    )
+    try:
+        task = tarea_crawl_dominio.delay(
+            busqueda.id,
+            f"https://{dominio}",
+            limite_urls,
+            progress_key,
+            **({"recrawl_de": recrawl_de} if recrawl_de else {}),
+            **({"solo_lastmod": True} if solo_lastmod else {}),
+        )
+    except OperationalError as e:
+        # Broker caído: no dejar la búsqueda ni el progreso abiertos (el
+        # progreso abierto impediría además eliminar la búsqueda)
+        print(f"[CRAWL] ❌ No se pudo encolar el crawling de {dominio}: {e}")
+        busqueda.finalizar(STATUS_ERROR)
+        CrawlingProgress.objects.filter(pk=progress_obj.pk).update(is_done=True)
+        get_progress_store().update(progress_key, done=True, error=str(e)[:200])
+        raise
+    progress_obj.task_id = task.id
+    progress_obj.save(update_fields=["task_id"])
+    request.session["crawl_task_id"] = task.id
+    return progress_key
 
 
 def analisis_dominio_view(request):
@@ -1089,21 +1000,21 @@ def analisis_dominio_view(request):
                 if progreso.usuario == request.user or (
                     request.user.is_authenticated and request.user.is_staff
                 ):
-                    # Detener el proceso
-                    progreso.is_done = True
-                    progreso.save()
+                    # Detener el proceso (sin reescribir urls_found en curso)
+                    solicitar_detencion(progreso.progress_key)
+                    CrawlingProgress.objects.filter(pk=progreso.pk).update(is_done=True)
 
                     # También actualizar BusquedaDominio si existe
                     try:
 
                         busqueda = BusquedaDominio.objects.get(id=busqueda_id)
                         if not busqueda.fecha_fin:
-                            busqueda.fecha_fin = timezone.now()
                             # Actualizar URLs con el progreso actual
-                            if progreso.count > 0 and not busqueda.urls:
-                                urls_list = progreso.get_urls_list()
-                                busqueda.urls = "\n".join(urls_list[: progreso.count])
-                            busqueda.save()
+                            if progreso.count > 0 and not busqueda.url_count:
+                                busqueda.guardar_urls(
+                                    progreso.get_urls_list()[: progreso.count]
+                                )
+                            busqueda.finalizar(STATUS_DETENIDO)
                     except BusquedaDominio.DoesNotExist:
                         pass
 
@@ -1119,12 +1030,11 @@ def analisis_dominio_view(request):
             eliminar_id = request.POST.get("eliminar_individual")
 
             # Verificar si hay crawling activo para este dominio
-            try:
-                progress_obj = CrawlingProgress.objects.get(
-                    busqueda_id=eliminar_id, is_done=False
-                )
+            if CrawlingProgress.objects.filter(
+                busqueda_id=eliminar_id, is_done=False
+            ).exists():
                 mensaje = "No se puede eliminar el análisis porque hay un proceso de crawling activo. Por favor espera a que termine o detén el proceso antes de eliminar."
-            except CrawlingProgress.DoesNotExist:
+            else:
                 # Si no hay crawling activo, proceder con la eliminación
                 # Obtener el dominio antes de eliminarlo
                 try:
@@ -1156,6 +1066,40 @@ def analisis_dominio_view(request):
                 mensaje = f"Dominio '{busqueda_obj.dominio}' desmarcado como guardado."
             except BusquedaDominio.DoesNotExist:
                 mensaje = "No se encontró el análisis seleccionado."
+        elif "recrawl_cambios" in request.POST:
+            original_id = request.POST.get("recrawl_cambios")
+            try:
+                original = BusquedaDominio.objects.get(id=original_id)
+                usuario = request.user if request.user.is_authenticated else None
+                progress_key = encolar_crawl_dominio(
+                    request, original.dominio, usuario, recrawl_de=original.id
+                )
+                mensaje = mark_safe(
+                    f"<div class=\"crawl-message info\">Recrawl de '{original.dominio}' "
+                    f"(solo páginas cambiadas) iniciado en segundo plano "
+                    f"(progreso: {progress_key}).</div>"
+                )
+            except (BusquedaDominio.DoesNotExist, ValueError):
+                mensaje = "No se encontró el análisis seleccionado."
+            except OperationalError:
+                mensaje = MENSAJE_COLA_NO_DISPONIBLE
+        elif "recrawl_lastmod" in request.POST:
+            original_id = request.POST.get("recrawl_lastmod")
+            try:
+                original = BusquedaDominio.objects.get(id=original_id)
+                usuario = request.user if request.user.is_authenticated else None
+                progress_key = encolar_crawl_dominio(
+                    request, original.dominio, usuario, solo_lastmod=True
+                )
+                mensaje = mark_safe(
+                    f"<div class=\"crawl-message info\">Recrawl de '{original.dominio}' "
+                    f"(URLs del sitemap modificadas) iniciado en segundo plano "
+                    f"(progreso: {progress_key}).</div>"
+                )
+            except (BusquedaDominio.DoesNotExist, ValueError):
+                mensaje = "No se encontró el análisis seleccionado."
+            except OperationalError:
+                mensaje = MENSAJE_COLA_NO_DISPONIBLE
         elif "eliminar_seleccionados" in request.POST or "eliminar_ids" in request.POST:
             ids = request.POST.getlist("eliminar_ids")
             if ids:  # Solo proceder si hay IDs seleccionados
@@ -1209,245 +1153,66 @@ def analisis_dominio_view(request):
                         },
                     )
                 else:
-                    base_url = f"https://{dominio}"
                     limite_urls = request.POST.get("limite_urls")
                     try:
                         limite_urls = int(limite_urls) if limite_urls else None
                     except Exception:
                         limite_urls = None
 
-                    resultado_crawl = crawl_urls(base_url, max_urls=limite_urls)
-
-                    # Manejar tanto formato nuevo (dict) como antiguo (list)
-                    if isinstance(resultado_crawl, dict):
-                        urls_encontradas = resultado_crawl["urls"]
-                        crawl_status = resultado_crawl["status"]
-                        blocked_count = resultado_crawl.get("blocked_count", 0)
-                    else:
-                        # Compatibilidad con formato anterior
-                        urls_encontradas = resultado_crawl
-                        crawl_status = "legacy"
-                        blocked_count = 0
-
-                    # Crear registro en base de datos
-                    busqueda = BusquedaDominio.objects.create(
-                        dominio=dominio,
-                        usuario=(
-                            request.user if request.user.is_authenticated else None
-                        ),
-                        urls="\n".join(urls_encontradas),
-                    )
-
-                    # Actualizar fecha de finalización
-                    busqueda.fecha_fin = timezone.now()
-                    busqueda.save()
+                    usuario = request.user if request.user.is_authenticated else None
+                    try:
+                        progress_key = encolar_crawl_dominio(
+                            request, dominio, usuario, limite_urls
+                        )
+                    except OperationalError:
+                        progress_key = None
+                        mensaje = MENSAJE_COLA_NO_DISPONIBLE
 
-                    if "dominios_buscados" not in request.session:
-                        request.session["dominios_buscados"] = []
+                    if progress_key:
+                        if "dominios_buscados" not in request.session:
+                            request.session["dominios_buscados"] = []
 
-                    if dominio not in request.session["dominios_buscados"]:
-                        request.session["dominios_buscados"].append(dominio)
-                        request.session.modified = True
+                        if dominio not in request.session["dominios_buscados"]:
+                            request.session["dominios_buscados"].append(dominio)
+                            request.session.modified = True
 
-                    # Generar mensaje informativo según el estado del crawling
-                    # from .recommendations import get_domain_recommendations  # Comentado temporalmente
-                    from django.utils.safestring import mark_safe
+                        mensaje = mark_safe(
+                            f"<div class=\"crawl-message info\">Crawling de '{dominio}' "
+                            f"iniciado en segundo plano (progreso: {progress_key}).</div>"
+                        )
 
-                    base_msg = f"Dominio '{dominio}' analizado: {len(urls_encontradas)} URLs encontradas."
-                    # Crear diccionario result si no existe
-                    if "result" not in locals():
-                        result = {
-                            "urls": urls_encontradas,
-                            "status": crawl_status,
-                            "blocked_count": blocked_count,
-                        }
-                        mensaje = f"{base_msg} ⚠️ Se detectó protección anti-bot, se usó sitemap como alternativa."
-                        message_class = "warning"
-                    elif crawl_status == "timeout_fallback_sitemap":
-                        mensaje = f"{base_msg} ⚠️ El servidor no responde (timeouts), se usó sitemap como alternativa."
-                        message_class = "warning"
-                    elif crawl_status == "connection_error_fallback_sitemap":
-                        mensaje = f"{base_msg} ⚠️ Errores de conexión, se usó sitemap como alternativa."
-                        message_class = "warning"
-                    elif "no_sitemap" in crawl_status:
-                        # Mensaje más específico para dominios totalmente bloqueados
-                        if len(urls_encontradas) == 0 and blocked_count > 0:
-                            mensaje = (
-                                f"{base_msg} 🛡️ Dominio completamente protegido - "
-                                f"bloquea tanto crawling como sitemap. Esto es normal para sitios como Udemy, Netflix, etc."
-                            )
-                            message_class = "blocked"
-                        else:
-                            mensaje = f"{base_msg} ❌ Crawling falló y no hay sitemap disponible."
-                            message_class = "warning"
-                    elif blocked_count > 0:
-                        mensaje = f"{base_msg} ⚠️ Se detectaron {blocked_count} bloqueos/problemas durante el crawling."
-                        message_class = "warning"
-                    else:
-                        mensaje = f"{base_msg} ✅ Crawling completado exitosamente."
-                        message_class = "success"
-
-                    # Generar HTML para recomendaciones si existen
-                    # Temporalmente comentado hasta corregir el módulo de recomendaciones
-                    # if recommendations:
-                    #     recommendations_html = f"""
-                    #     <div class="domain-recommendations domain-{message_class}">
-                    #         <div class="recommendation-title">
-                    #             <i class="bi bi-lightbulb-fill recommendation-icon"></i>
-                    #             Recomendaciones para {dominio}
-                    #         </div>
-                    #     """
-
-                    #     for rec in recommendations:
-                    #         recommendations_html += f"""
-                    #         <div class="recommendation-item">
-                    #             <span class="recommendation-icon">{rec[:2]}</span>
-                    #             <span>{rec[2:]}</span>
-                    #         </div>
-                    #         """
-
-                    #     recommendations_html += "</div>"
-                    #     mensaje = mark_safe(
-                    #         f'<div class="crawl-message {message_class}">{mensaje}</div>{recommendations_html}'
-                    #     )
-                    # else:
+    # Mostrar el mensaje del último crawling encolado cuando la tarea termina
+    crawl_task_id = request.session.get("crawl_task_id")
+    if crawl_task_id and not mensaje:
+        try:
+            resultado_tarea = AsyncResult(crawl_task_id)
+            if resultado_tarea.ready():
+                del request.session["crawl_task_id"]
+                datos = resultado_tarea.result
+                if resultado_tarea.successful() and isinstance(datos, dict):
                     mensaje = mark_safe(
-                        f'<div class="crawl-message {message_class}">{mensaje}</div>'
+                        f'<div class="crawl-message {datos["message_class"]}">'
+                        f'{datos["mensaje"]}</div>'
                     )
+        except Exception as e:
+            print(f"[CRAWL] No se pudo consultar la tarea {crawl_task_id}: {e}")
 
     # Filtrar dominios guardados - solo mostrar los no guardados en la vista principal
-    busquedas_qs = BusquedaDominio.objects.filter(guardado=False).order_by("-fecha")[
-        :1000
-    ]
-    dominios_tabla = []
-
-    for b in busquedas_qs:
-        dom_norm = normalizar_dominio(b.dominio)
-        fecha_inicio = timezone.localtime(b.fecha)
-        fecha_fin = timezone.localtime(b.fecha_fin) if b.fecha_fin else None
-        duracion = None
-        estado = "En progreso"
-        estado_detalle = ""
-        estado_clase = "secondary"
-
-        total_urls = len(b.get_urls())
-
-        # Verificar si hay progreso activo para esta búsqueda
-        progreso_activo = None
-        try:
-            progreso_activo = CrawlingProgress.objects.get(busqueda_id=b.id)
-        except CrawlingProgress.DoesNotExist:
-            pass
-
-        # Determinar estado basado en progreso activo y fecha_fin
-        if progreso_activo and not progreso_activo.is_done:
-            # Hay progreso activo
-            estado = "En progreso"
-            estado_detalle = f"🔄 {progreso_activo.count} URLs encontradas..."
-            estado_clase = "primary"
-            total_urls = progreso_activo.count  # Usar el conteo actual
-        elif fecha_fin or (progreso_activo and progreso_activo.is_done):
-            # Está finalizado
-            if fecha_fin:
-                delta = fecha_fin - fecha_inicio
-                total_seconds = int(delta.total_seconds())
-                if total_seconds < 0:
-                    duracion = "-"
-                else:
-                    h = total_seconds // 3600
-                    m = (total_seconds % 3600) // 60
-                    s = total_seconds % 60
-                    duracion = f"{h:02}:{m:02}:{s:02}"
-            estado = "Finalizado"
-
-            # Determinar estado específico basado en resultados
-            if total_urls == 0 and total_seconds <= 2:
-                # Probablemente bloqueado (finaliza muy rápido con 0 URLs)
-                if dom_norm.lower() in [
-                    "udemy.com",
-                    "netflix.com",
-                    "hulu.com",
-                    "disney.com",
-                ]:
-                    estado_detalle = "🛡️ Dominio completamente protegido"
-                    estado_clase = "danger"
-                else:
-                    estado_detalle = "⚠️ Posible bloqueo o error"
-                    estado_clase = "warning"
-            elif total_urls == 0 and total_seconds > 15:
-                estado_detalle = "⏰ Timeout o problemas de conexión"
-                estado_clase = "warning"
-            elif total_urls == 0 and 3 <= total_seconds <= 15:
-                # Casos como jw.org: intenta crawling pero no encuentra sitemap
-                if "jw.org" in dom_norm.lower():
-                    estado_detalle = "🔒 Restricciones de acceso o geobloqueo"
-                    estado_clase = "warning"
-                elif any(keyword in dom_norm.lower() for keyword in ["redlink", "hb."]):
-                    estado_detalle = "🌐 Error de conexión o dominio inaccesible"
-                    estado_clase = "warning"
-                else:
-                    estado_detalle = "🔍 Sin sitemap encontrado"
-                    estado_clase = "info"
-            elif total_urls > 0 and total_seconds <= 5:
-                estado_detalle = "✅ Éxito rápido (sitemap)"
-                estado_clase = "success"
-            elif total_urls > 0:
-                estado_detalle = "✅ Crawling exitoso"
-                estado_clase = "success"
-            else:
-                estado_detalle = "ℹ️ Finalizado"
-                estado_clase = "info"
-        else:
-            # No hay fecha_fin y no hay progreso activo
-            # Verificar si es un proceso abandonado/colgado
-            hace_10min = timezone.now() - timezone.timedelta(minutes=10)
-            if b.fecha < hace_10min:
-                estado = "Error/Abandonado"
-                estado_detalle = "⚠️ Proceso interrumpido"
-                estado_clase = "warning"
-            else:
-                estado_detalle = "🔄 En curso..."
-                estado_clase = "primary"
-
-        dominios_tabla.append(
-            {
-                "id": b.id,
-                "dominio": dom_norm,
-                "inicio": fecha_inicio.strftime("%Y-%m-%d %H:%M:%S"),
-                "fin": fecha_fin.strftime("%Y-%m-%d %H:%M:%S") if fecha_fin else "",
-                "duracion": duracion or "",
-                "usuario": b.usuario.username if b.usuario else "-",
-                "total_urls": total_urls,
-                "estado": estado,
-                "estado_detalle": estado_detalle,
-                "estado_clase": estado_clase,
-                "url_original": b.dominio,
-                "puede_detener": progreso_activo and not progreso_activo.is_done,
-                "progress_id": progreso_activo.id if progreso_activo else None,
-                "guardado": b.guardado,
-            }
-        )
-
-    paginator = Paginator(dominios_tabla, 20)
+    # La paginación se hace en la BD: solo se materializan las filas de la página
+    paginator = Paginator(historial_busquedas_queryset(), 20)
     page_number = request.GET.get("page")
     page_obj = paginator.get_page(page_number)
+    dominios_tabla = [fila_historial_dominio(b) for b in page_obj]
 
-    total_registros = BusquedaDominio.objects.count()
-    print(f"Total registros en BD: {total_registros}")
-    print(f"Registros mostrados (página): {len(page_obj)}")
-
-    for b in page_obj:
-        print(
-            f"  - {b['dominio']} | Inicio: {b['inicio']} | Fin: {b['fin']} | "
-            f"Duración: {b['duracion']} | URLs: {b['total_urls']}"
-        )
+    print(f"Total registros en historial: {paginator.count}")
+    print(f"Registros mostrados (página): {len(dominios_tabla)}")
 
     return render(
         request,
         "analisis_dominio.html",
         {
             "form": form,
-            "dominios_tabla": list(page_obj),
+            "dominios_tabla": dominios_tabla,
             "mensaje": mensaje,
             "error": None,
             "page_obj": page_obj,
@@ -1852,6 +1617,9 @@ def limpiar_procesos_fantasma_ajax(request):
         )
 
         count_progress = procesos_huerfanos.count()
+        store = get_progress_store()
+        for progress_key in procesos_huerfanos.values_list("progress_key", flat=True):
+            store.update(progress_key, done=True)
         procesos_huerfanos.update(is_done=True)
 
         # Limpiar BusquedaDominio sin terminar (más de 1 hora)
@@ -1860,11 +1628,12 @@ def limpiar_procesos_fantasma_ajax(request):
         )
 
         count_busquedas = busquedas_huerfanas.count()
-        busquedas_huerfanas.update(fecha_fin=timezone.now())
-
-        # Limpiar memoria
-        global crawling_progress
-        crawling_progress.clear()
+        busquedas_huerfanas.update(
+            fecha_fin=timezone.now(),
+            crawl_status=STATUS_ABANDONADO,
+            estado_detalle="⚠️ Proceso interrumpido",
+            estado_clase="warning",
+        )
 
         mensaje = f"Limpiados {count_progress} procesos fantasma y {count_busquedas} búsquedas huérfanas"
         print(f"[CLEANUP] {mensaje}")
@@ -1944,9 +1713,9 @@ def detener_crawling_ajax(request):
             f"[STOP] Deteniendo crawling: {progress_obj.progress_key} del dominio {progress_obj.dominio}"
         )
 
-        # Marcar como detenido
-        progress_obj.is_done = True
-        progress_obj.save()
+        # Marcar como detenido (sin reescribir urls_found en curso)
+        solicitar_detencion(progress_obj.progress_key)
+        CrawlingProgress.objects.filter(pk=progress_obj.pk).update(is_done=True)
 
         # También detener en BusquedaDominio si existe
         if progress_obj.busqueda_id:
@@ -1954,12 +1723,12 @@ def detener_crawling_ajax(request):
 
                 busqueda = BusquedaDominio.objects.get(id=progress_obj.busqueda_id)
                 if not busqueda.fecha_fin:  # Solo si no está ya terminado
-                    busqueda.fecha_fin = timezone.now()
                     # Guardar URLs parciales si existen
-                    if progress_obj.count > 0 and not busqueda.urls:
-                        urls_list = progress_obj.get_urls_list()
-                        busqueda.urls = "\n".join(urls_list)
-                    busqueda.save()
+                    if progress_obj.count > 0 and not busqueda.url_count:
+                        busqueda.guardar_urls(
+                            progress_obj.get_urls_list()[: progress_obj.count]
+                        )
+                    busqueda.finalizar(STATUS_DETENIDO)
                     print(f"[STOP] También terminado BusquedaDominio ID: {busqueda.id}")
             except BusquedaDominio.DoesNotExist:
                 print(
@@ -1967,10 +1736,13 @@ def detener_crawling_ajax(request):
                 )
                 pass
 
-        # Limpiar de memoria
-        if progress_obj.progress_key in crawling_progress:
-            crawling_progress[progress_obj.progress_key]["done"] = True
-            print(f"[STOP] Limpiado de memoria: {progress_obj.progress_key}")
+        # Marcar como terminado en el store compartido
+        store = get_progress_store()
+        if store.get(progress_obj.progress_key) is not None:
+            store.update(progress_obj.progress_key, done=True)
+            print(
+                f"[STOP] Progreso marcado como terminado: {progress_obj.progress_key}"
+            )
 
         print(f"[STOP] Crawling detenido exitosamente: {progress_obj.progress_key}")
         return JsonResponse(
@@ -2108,7 +1880,7 @@ def dominios_guardados_view(request):
                 "fecha": b.fecha,
                 "fecha_fin": b.fecha_fin,
                 "usuario": b.usuario,
-                "urls_count": len(b.get_urls()),
+                "urls_count": b.url_count,
                 "guardado": b.guardado,
                 "puede_detener": tiene_progreso_activo,
             }
@@ -2151,22 +1923,17 @@ def urls_guardadas_view(request):
                         if not url.startswith(("http://", "https://")):
                             url = "https://" + url
 
-                        # Parsear URL
-                        from urllib.parse import urlparse
-
-                        parsed = urlparse(url)
-
-                        # Normalizar dominio (quitar www. si existe)
-                        dominio = parsed.netloc.lower()
-                        if dominio.startswith("www."):
-                            dominio = dominio[4:]
-
-                        # Reconstruir URL sin www
-                        url_normalizada = f"{parsed.scheme}://{dominio}{parsed.path}"
-                        if parsed.query:
-                            url_normalizada += f"?{parsed.query}"
-                        if parsed.fragment:
-                            url_normalizada += f"#{parsed.fragment}"
+                        # Forma canónica sin www, barra final, fragmento ni
+                        # parámetros de tracking (la de las URLs ya guardadas)
+                        url_normalizada = canonicalizar_url(
+                            url,
+                            {
+                                "strip_www": True,
+                                "trailing_slash": "strip",
+                                "sort_query": True,
+                            },
+                        )
+                        dominio = urlparse(url_normalizada).hostname or ""
 
                         return url_normalizada, dominio
 
@@ -2189,10 +1956,12 @@ def urls_guardadas_view(request):
                                         "guardado": True,
                                         "fecha": timezone.now(),
                                         "fecha_fin": timezone.now(),
-                                        "urls": nueva_url_normalizada,
                                     },
                                 )
                             )
+                            if created:
+                                # Como los crawlers: fila DiscoveredUrl y url_count
+                                busqueda_dominio.guardar_urls([nueva_url_normalizada])
 
                             # Crear la URL guardada con URL normalizada
                             UrlGuardada.objects.create(
@@ -2258,11 +2027,12 @@ def exportar_dominio_individual(request, dominio_id, formato):
         return HttpResponse("Dominio no encontrado", status=404)
 
     # Preparar datos para exportación
+    urls_list = dominio.get_urls()
     datos = {
         "id": dominio.id,
         "dominio": dominio.dominio,
         "dominio_normalizado": normalizar_dominio(dominio.dominio),
-        "urls_count": len(dominio.get_urls()),
+        "urls_count": len(urls_list),
         "fecha_inicio": (
             dominio.fecha.strftime("%Y-%m-%d %H:%M:%S") if dominio.fecha else ""
         ),
@@ -2270,8 +2040,8 @@ def exportar_dominio_individual(request, dominio_id, formato):
             dominio.fecha_fin.strftime("%Y-%m-%d %H:%M:%S") if dominio.fecha_fin else ""
         ),
         "usuario": dominio.usuario.username if dominio.usuario else "Anónimo",
-        "urls_list": dominio.get_urls(),
-        "urls": "\n".join(dominio.get_urls()),
+        "urls_list": urls_list,
+        "urls": "\n".join(urls_list),
     }
 
     # Generar nombre de archivo con dominio y timestamp
@@ -167,8 +167,112 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
+# Reconciliador de crawlings colgados (ver core/utils/crawl_reaper.py)
+CELERY_BEAT_SCHEDULE = {
+    "reconciliar-crawlings": {
+        "task": "core.tasks.tarea_reconciliar_crawlings",
+        "schedule": config("CRAWL_REAPER_INTERVAL", default=60, cast=int),
+    },
+}
 
 # Redirección tras login/logout
 LOGIN_URL = "/login/"
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/login/"
+
+# Configuración del crawler
+# Descargas simultáneas por dominio en el motor asíncrono
+CRAWL_CONCURRENCY_PER_DOMAIN = config(
+    "CRAWL_CONCURRENCY_PER_DOMAIN", default=4, cast=int
+)
+# Frontera con prioridad: primero URLs poco profundas y las sembradas desde sitemap
+CRAWL_FRONTIER_PRIORIZAR = config("CRAWL_FRONTIER_PRIORIZAR", default=False, cast=bool)
+
+# Planificador de crawlings en segundo plano (ver core/utils/crawl_scheduler.py).
+# Límites POR PROCESO: con N workers de gunicorn el total es N veces estos
+# valores; para límites globales usar la ruta de Celery
+CRAWL_MAX_WORKERS = config("CRAWL_MAX_WORKERS", default=4, cast=int)
+# Cada dominio de un lote ocupa un puesto: la cola admite un lote de staff entero
+CRAWL_MAX_QUEUE = config("CRAWL_MAX_QUEUE", default=50, cast=int)
+CRAWL_MAX_POR_USUARIO = config("CRAWL_MAX_POR_USUARIO", default=2, cast=int)
+CRAWL_MAX_POR_DOMINIO = config("CRAWL_MAX_POR_DOMINIO", default=1, cast=int)
+# Segundos sugeridos en Retry-After cuando se rechaza un crawling
+CRAWL_RETRY_AFTER = config("CRAWL_RETRY_AFTER", default=30, cast=int)
+
+# Análisis múltiple: máximo de dominios por lote (cada uno es un trabajo del planificador)
+CRAWL_BATCH_MAX_DOMINIOS = config("CRAWL_BATCH_MAX_DOMINIOS", default=10, cast=int)
+CRAWL_BATCH_MAX_DOMINIOS_STAFF = config(
+    "CRAWL_BATCH_MAX_DOMINIOS_STAFF", default=50, cast=int
+)
+
+# Almacén del progreso de crawlings AJAX: "db", "redis" o "memory" (un solo proceso)
+CRAWL_PROGRESS_BACKEND = config("CRAWL_PROGRESS_BACKEND", default="db")
+# El progreso se vuelca cada N URLs o cada T milisegundos (lo que ocurra antes)
+CRAWL_PROGRESS_FLUSH_URLS = config("CRAWL_PROGRESS_FLUSH_URLS", default=25, cast=int)
+CRAWL_PROGRESS_FLUSH_MS = config("CRAWL_PROGRESS_FLUSH_MS", default=1000, cast=int)
+# Segundos sin latido tras los que el reconciliador da un crawling por colgado
+CRAWL_HEARTBEAT_TIMEOUT = config("CRAWL_HEARTBEAT_TIMEOUT", default=300, cast=int)
+# Segundos sin actividad tras los que el reconciliador borra un progreso del store
+CRAWL_PROGRESS_RETENCION = config("CRAWL_PROGRESS_RETENCION", default=3600, cast=int)
+# Progreso por Server-Sent Events, solo bajo ASGI (ver core/utils/progress_stream.py):
+# cada cuánto se lee el store, duración máxima de una conexión y latido contra proxies
+CRAWL_SSE_INTERVAL_MS = config("CRAWL_SSE_INTERVAL_MS", default=2000, cast=int)
+CRAWL_SSE_MAX_SEGUNDOS = config("CRAWL_SSE_MAX_SEGUNDOS", default=300, cast=int)
+CRAWL_SSE_KEEPALIVE = config("CRAWL_SSE_KEEPALIVE", default=15, cast=int)
+# Sitemaps en streaming (ver core/utils/sitemap_stream.py): máximo de sitemaps
+# hijos de un índice y cuántos se descargan a la vez
+CRAWL_SITEMAP_MAX_HIJOS = config("CRAWL_SITEMAP_MAX_HIJOS", default=50, cast=int)
+CRAWL_SITEMAP_CONCURRENCIA = config("CRAWL_SITEMAP_CONCURRENCIA", default=4, cast=int)
+# Descubrimiento de sitemaps (ver core/utils/sitemap_resolver.py): timeout de cada
+# sondeo y segundos que se cachea la ubicación (o su ausencia) por dominio
+CRAWL_SITEMAP_TIMEOUT = config("CRAWL_SITEMAP_TIMEOUT", default=10, cast=int)
+CRAWL_SITEMAP_CACHE_TTL = config("CRAWL_SITEMAP_CACHE_TTL", default=86400, cast=int)
+CRAWL_SITEMAP_CACHE_TTL_VACIO = config(
+    "CRAWL_SITEMAP_CACHE_TTL_VACIO", default=3600, cast=int
+)
+# robots.txt (ver core/utils/robots.py): user-agent con el que se eligen las
+# reglas y segundos que se reutilizan las reglas guardadas de cada host
+CRAWL_ROBOTS_USER_AGENT = config("CRAWL_ROBOTS_USER_AGENT", default="PrestaLab")
+CRAWL_ROBOTS_TTL = config("CRAWL_ROBOTS_TTL", default=86400, cast=int)
+# Ritmo adaptativo por host (ver core/utils/rate_limiter.py): peticiones/segundo
+# iniciales, máximas y mínimas, incremento por respuesta sana, ráfaga permitida,
+# factor de latencia que cuenta como pico y tope de Retry-After en segundos
+CRAWL_RATE_INICIAL = config("CRAWL_RATE_INICIAL", default=1.0, cast=float)
+CRAWL_RATE_MAX = config("CRAWL_RATE_MAX", default=10.0, cast=float)
+CRAWL_RATE_MIN = config("CRAWL_RATE_MIN", default=0.2, cast=float)
+CRAWL_RATE_INCREMENTO = config("CRAWL_RATE_INCREMENTO", default=0.25, cast=float)
+CRAWL_RATE_RAFAGA = config("CRAWL_RATE_RAFAGA", default=2, cast=int)
+CRAWL_RATE_PICO_LATENCIA = config("CRAWL_RATE_PICO_LATENCIA", default=3.0, cast=float)
+CRAWL_RETRY_AFTER_MAX = config("CRAWL_RETRY_AFTER_MAX", default=300, cast=int)
+# Presupuesto global por host entre todos los procesos (ver core/utils/host_lease.py):
+# "redis", "memory" (un solo proceso) u "off"; peticiones/segundo y ráfaga
+CRAWL_POLITENESS_BACKEND = config("CRAWL_POLITENESS_BACKEND", default="redis")
+CRAWL_HOST_RATE_GLOBAL = config("CRAWL_HOST_RATE_GLOBAL", default=4.0, cast=float)
+CRAWL_HOST_RAFAGA_GLOBAL = config("CRAWL_HOST_RAFAGA_GLOBAL", default=4, cast=int)
+# Detección de bloqueos (ver core/utils/block_detection.py): KB del cuerpo que
+# se inspeccionan y puntos a partir de los que una respuesta está bloqueada
+CRAWL_BLOQUEO_MAX_KB = config("CRAWL_BLOQUEO_MAX_KB", default=32, cast=int)
+CRAWL_BLOQUEO_UMBRAL = config("CRAWL_BLOQUEO_UMBRAL", default=3, cast=int)
+# Descarga de páginas en streaming (ver core/utils/http_client.py): bytes
+# máximos por página y HEAD previo para URLs con extensión binaria
+CRAWL_MAX_BYTES_PAGINA = config(
+    "CRAWL_MAX_BYTES_PAGINA", default=5 * 1024 * 1024, cast=int
+)
+CRAWL_HEAD_BINARIOS = config("CRAWL_HEAD_BINARIOS", default=True, cast=bool)
+
+# Canonicalización de URLs (ver core/utils/url_canon.py)
+# Reglas por dominio, p. ej. {"tienda.com": {"force_https": True, "strip_www": True}}
+URL_CANONICAL_RULES = {}
+
+# Cliente HTTP con conexiones persistentes (ver core/utils/http_client.py)
+HTTP_POOL_MAXSIZE = config("HTTP_POOL_MAXSIZE", default=10, cast=int)
+HTTP_KEEPALIVE_MAX_REQUESTS = config(
+    "HTTP_KEEPALIVE_MAX_REQUESTS", default=1000, cast=int
+)
+HTTP_KEEPALIVE_SECONDS = config("HTTP_KEEPALIVE_SECONDS", default=60, cast=int)
+HTTP_MAX_SESSIONS = config("HTTP_MAX_SESSIONS", default=100, cast=int)
+# HTTP/2 en el motor asíncrono (requiere el paquete opcional h2)
+HTTP_CLIENT_HTTP2 = config("HTTP_CLIENT_HTTP2", default=False, cast=bool)
+
+# Backend de extracción de enlaces: "lxml" (rápido, por defecto) o "bs4"
+CRAWL_LINK_EXTRACTOR = config("CRAWL_LINK_EXTRACTOR", default="lxml")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de la detección de bloqueos (core/utils/block_detection.py)
+sobre el corpus de core/fixtures/bloqueos/casos.json, comparada con la
+búsqueda anterior de palabras clave en el cuerpo completo.
+
+Uso:
+    python scripts/benchmark_block_detection.py [repeticiones]
+"""
+import json
+import os
+import sys
+import timeit
+from pathlib import Path
+
+import django
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+FIXTURES_DIR = BASE_DIR / "core" / "fixtures" / "bloqueos"
+
+PALABRAS_ANTERIORES = [
+    "blocked",
+    "forbidden",
+    "access denied",
+    "cloudflare",
+    "captcha",
+    "robot",
+    "bot detected",
+    "rate limit",
+    "too many requests",
+    "suspicious activity",
+]
+
+
+def detector_anterior(response):
+    """La detección que había antes en core/views_app.py"""
+    content = response.text.lower()
+    if response.status_code in [403, 429, 503]:
+        return True
+    if any(palabra in content for palabra in PALABRAS_ANTERIORES):
+        return True
+    return len(content) < 100 and response.status_code == 200
+
+
+def main():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "prestaLabs.settings")
+    django.setup()
+    import httpx
+
+    from core.utils.block_detection import detect_blocking
+
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    casos = json.loads((FIXTURES_DIR / "casos.json").read_text())
+    print(f"Repeticiones por caso: {repeticiones}\n")
+    print(
+        f"{'fixture':<32}{'HTTP':>5}{'KB':>8}{'esperado':>10}"
+        f"{'anterior':>20}{'actual':>20}"
+    )
+
+    aciertos = {"anterior": 0, "actual": 0}
+    for caso in casos:
+        content = (FIXTURES_DIR / caso["fixture"]).read_bytes()
+
+        # Respuesta nueva en cada llamada (httpx cachea ``.text``); su coste
+        # se descuenta para medir solo el detector
+        def respuesta():
+            return httpx.Response(
+                caso["status"], headers=caso["headers"], content=content
+            )
+
+        base = timeit.timeit(respuesta, number=repeticiones)
+        fila = ""
+        for nombre, detector in (
+            ("anterior", detector_anterior),
+            ("actual", lambda r: detect_blocking(r)[0]),
+        ):
+            bloqueado = detector(respuesta())
+            aciertos[nombre] += bloqueado == caso["bloqueado"]
+            total = timeit.timeit(lambda: detector(respuesta()), number=repeticiones)
+            marca = "ok" if bloqueado == caso["bloqueado"] else "FALLO"
+            fila += f"{marca:>7}{(total - base) / repeticiones * 1000:>11.3f}ms"
+        print(
+            f"{Path(caso['fixture']).name:<32}{caso['status']:>5}"
+            f"{len(content) / 1024:>8.1f}{str(caso['bloqueado']):>10}{fila}"
+        )
+
+    print(
+        f"\nAciertos: anterior {aciertos['anterior']}/{len(casos)}, "
+        f"actual {aciertos['actual']}/{len(casos)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
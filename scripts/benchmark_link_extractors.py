@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de los backends de extracción de enlaces
+(core/utils/link_extractor.py) sobre los HTML de core/fixtures/html/.
+
+Uso:
+    python scripts/benchmark_link_extractors.py [repeticiones]
+"""
+import os
+import sys
+import timeit
+from pathlib import Path
+
+import django
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+FIXTURES_DIR = BASE_DIR / "core" / "fixtures" / "html"
+
+
+def main():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "prestaLabs.settings")
+    django.setup()
+    from core.utils.link_extractor import BACKENDS
+
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    fixtures = sorted(FIXTURES_DIR.glob("*.html"))
+    print(f"Repeticiones por fixture: {repeticiones}\n")
+    print(
+        f"{'fixture':<28}{'KB':>8}{'enlaces':>9}"
+        + "".join(f"{n:>12}" for n in BACKENDS)
+    )
+
+    for fixture in fixtures:
+        content = fixture.read_bytes()
+        tiempos = []
+        enlaces = None
+        for backend in BACKENDS.values():
+            extractor = backend()
+            enlaces = len(extractor.extraer(content)["links"])
+            total = timeit.timeit(
+                lambda: extractor.extraer(content), number=repeticiones
+            )
+            tiempos.append(total / repeticiones * 1000)
+        print(
+            f"{fixture.name:<28}{len(content) / 1024:>8.1f}{enlaces:>9}"
+            + "".join(f"{t:>10.2f}ms" for t in tiempos)
+        )
+
+
+if __name__ == "__main__":
+    main()